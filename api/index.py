@@ -1,24 +1,13 @@
 import sys
-import os
 from pathlib import Path
-import logging
 
-# 配置日志
-logging.basicConfig(level=logging.INFO)
-logger = logging.getLogger(__name__)
-
-try:
-    # 添加项目根目录到 Python 路径
-    root_path = Path(__file__).resolve().parent.parent
+# 添加项目根目录到 Python 路径
+root_path = Path(__file__).resolve().parent.parent
+if str(root_path) not in sys.path:
     sys.path.append(str(root_path))
-    logger.info(f"Python path: {sys.path}")
-    
-    from src.main import app
-    logger.info("Successfully imported FastAPI app")
-    
-except Exception as e:
-    logger.error(f"Error during import: {str(e)}", exc_info=True)
-    raise
+
+# 导入时不做网络I/O：提供商模块和 Redis 客户端都在首次使用时加载
+from src.main import app
 
 # 导出 FastAPI 应用
-export = app 
\ No newline at end of file
+export = app
@@ -0,0 +1,87 @@
+"""冷启动基准：在全新进程中测量导入 Vercel 入口（api/index.py）的耗时和首个响应的耗时
+
+每次运行启动一个新的 Python 进程（ENVIRONMENT=vercel），直接以 ASGI 方式调用应用，
+不经过 httpx，避免测量工具本身的导入开销混入结果。可设置阈值，超出时以非零状态退出，用于发现冷启动回退。
+
+用法：
+    python -m benchmarks.bench_cold_start --runs 10
+    python -m benchmarks.bench_cold_start --max-import-ms 1500 --max-first-response-ms 200
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHILD = r"""
+import asyncio, json, sys, time
+started = time.perf_counter()
+from api.index import app
+imported = time.perf_counter()
+
+async def call(path):
+    messages = [{"type": "http.request", "body": b"", "more_body": False}]
+    status = []
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": path, "raw_path": path.encode(), "query_string": b"",
+        "root_path": "", "headers": [(b"host", b"bench")], "client": ("127.0.0.1", 1), "server": ("bench", 80),
+    }
+    async def receive():
+        return messages.pop(0) if messages else {"type": "http.disconnect"}
+    async def send(message):
+        if message["type"] == "http.response.start":
+            status.append(message["status"])
+    begin = time.perf_counter()
+    await app(scope, receive, send)
+    return status[0], time.perf_counter() - begin
+
+async def main():
+    results = {"import_ms": (imported - started) * 1000}
+    for name, path in (("health", "/health"), ("models", "/api/v1/models")):
+        status, elapsed = await call(path)
+        assert status == 200, (path, status)
+        results[f"first_{name}_ms"] = elapsed * 1000
+    results["modules"] = len(sys.modules)
+    results["httpx_loaded"] = "httpx" in sys.modules
+    results["redis_loaded"] = "redis" in sys.modules
+    print(json.dumps(results))
+
+asyncio.run(main())
+"""
+
+def run_once() -> dict:
+    env = {**os.environ, "ENVIRONMENT": "vercel", "PYTHONDONTWRITEBYTECODE": "0"}
+    output = subprocess.check_output([sys.executable, "-c", CHILD], cwd=ROOT, env=env, stderr=subprocess.DEVNULL)
+    return json.loads(output.decode().strip().splitlines()[-1])
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--max-import-ms", type=float, help="导入耗时中位数上限")
+    parser.add_argument("--max-first-response-ms", type=float, help="首个响应耗时中位数上限")
+    args = parser.parse_args()
+
+    # 先运行一次生成字节码缓存，之后的结果对应 Vercel 上已打包 .pyc 的情况
+    run_once()
+    runs = [run_once() for _ in range(args.runs)]
+    summary = {
+        key: round(statistics.median(r[key] for r in runs), 1)
+        for key in ("import_ms", "first_health_ms", "first_models_ms")
+    }
+    summary["modules"] = runs[-1]["modules"]
+    summary["httpx_loaded"] = runs[-1]["httpx_loaded"]
+    summary["redis_loaded"] = runs[-1]["redis_loaded"]
+    print(json.dumps(summary, indent=2))
+
+    failed = False
+    if args.max_import_ms and summary["import_ms"] > args.max_import_ms:
+        print(f"import time {summary['import_ms']}ms exceeds {args.max_import_ms}ms", file=sys.stderr)
+        failed = True
+    if args.max_first_response_ms and summary["first_health_ms"] > args.max_first_response_ms:
+        print(f"first response {summary['first_health_ms']}ms exceeds {args.max_first_response_ms}ms", file=sys.stderr)
+        failed = True
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,125 @@
+"""序列化开销基准：对比 orjson 快速路径与标准库回退下 /chat、/chat/stream、/models 每个请求的CPU时间
+
+在进程内通过 ASGI 调用应用，上游由 MockTransport 模拟，测得的是服务自身（含客户端）的CPU开销。
+两种模式分别在子进程中运行（标准库模式在导入前屏蔽 orjson），交替运行多轮，输出各自的中位数和极差（render 为 /chat 响应体单独渲染一次的耗时）；
+单轮结果受调度和频率波动影响较大，只看一轮容易把噪声当成差异。
+
+用法：python -m benchmarks.bench_serialization [--requests 2000] [--tokens 200] [--rounds 5]
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+REPLY = "这是一个用于基准测试的回复。" * 20
+
+def build_upstream(tokens: int):
+    import httpx
+
+    event = {"choices": [{"delta": {"content": "测试"}, "finish_reason": None}]}
+    stream_body = (
+        f"data: {json.dumps(event, ensure_ascii=False)}\n\n" * tokens + "data: [DONE]\n\n"
+    ).encode("utf-8")
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        if json.loads(request.content).get("stream"):
+            return httpx.Response(200, content=stream_body)
+        return httpx.Response(200, json={
+            "output": {"choices": [{"message": {"role": "assistant", "content": REPLY}}]}
+        })
+
+    return httpx.MockTransport(handler)
+
+async def measure(requests: int, tokens: int) -> dict:
+    import httpx
+    from src.main import app
+    from src.providers.factory import ProviderFactory
+    from src.models.chat import ChatResponse
+    from src.utils.json_helper import HAS_ORJSON, FastJSONResponse
+
+    provider = ProviderFactory.create("tongyi")
+    provider._client = httpx.AsyncClient(transport=build_upstream(tokens))
+    payload = {"content": "你好，请介绍一下你自己", "provider_id": "model_001"}
+
+    async def chat(client):
+        response = await client.post("/api/v1/chat", json=payload)
+        response.raise_for_status()
+
+    async def stream(client):
+        async with client.stream("POST", "/api/v1/chat/stream", json=payload) as response:
+            async for _ in response.aiter_bytes():
+                pass
+
+    async def models(client):
+        response = await client.get("/api/v1/models")
+        response.raise_for_status()
+
+    results = {"orjson": HAS_ORJSON}
+    # 单独测量 /chat 响应体的渲染：整个请求约1-2ms，渲染只占几微秒，差异会被请求的波动掩盖
+    body = ChatResponse(response=REPLY, request_id="bench", model="model_001").model_dump(mode="json")
+    cpu = time.process_time()
+    for _ in range(requests * 10):
+        FastJSONResponse(body)
+    results["render"] = round((time.process_time() - cpu) / (requests * 10) * 1e6, 2)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for name, fn in (("chat", chat), ("stream", stream), ("models", models)):
+            for _ in range(min(100, requests)):
+                await fn(client)
+            cpu = time.process_time()
+            for _ in range(requests):
+                await fn(client)
+            results[name] = round((time.process_time() - cpu) / requests * 1e6, 1)
+    return results
+
+def run_child(requests: int, tokens: int, stdlib: bool) -> dict:
+    args = [sys.executable, "-m", "benchmarks.bench_serialization", "--child",
+            "--requests", str(requests), "--tokens", str(tokens)]
+    if stdlib:
+        args.append("--stdlib")
+    env = {
+        **os.environ,
+        "ENVIRONMENT": "vercel",
+        "DASHSCOPE_API_KEY": "bench",
+        "RESPONSE_CACHE_ENABLED": "false",
+        "SINGLE_FLIGHT_ENABLED": "false",
+        "LOG_LEVEL": "WARNING",
+    }
+    output = subprocess.check_output(args, cwd=ROOT, env=env)
+    return json.loads(output.decode().strip().splitlines()[-1])
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--tokens", type=int, default=200, help="每个流的块数")
+    parser.add_argument("--rounds", type=int, default=5, help="两种模式交替运行的轮数")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--stdlib", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        if args.stdlib:
+            sys.modules["orjson"] = None
+        print(json.dumps(asyncio.run(measure(args.requests, args.tokens))))
+        sys.exit(0)
+
+    runs = {"stdlib": [], "fast": []}
+    for _ in range(args.rounds):
+        runs["stdlib"].append(run_child(args.requests, args.tokens, stdlib=True))
+        runs["fast"].append(run_child(args.requests, args.tokens, stdlib=False))
+    if not runs["fast"][0]["orjson"]:
+        print("orjson is not installed; both runs used the stdlib encoder")
+    print(f"{'endpoint':<10}{'stdlib µs/req':>26}{'fast µs/req':>26}{'saved':>10}")
+    for name in ("render", "chat", "stream", "models"):
+        stdlib = [r[name] for r in runs["stdlib"]]
+        fast = [r[name] for r in runs["fast"]]
+        saved = 1 - statistics.median(fast) / statistics.median(stdlib)
+        print(
+            f"{name:<10}{statistics.median(stdlib):>10.1f}{f'({min(stdlib):.1f}-{max(stdlib):.1f})':>16}"
+            f"{statistics.median(fast):>10.1f}{f'({min(fast):.1f}-{max(fast):.1f})':>16}{saved:>10.1%}"
+        )
@@ -0,0 +1,96 @@
+"""SSE 解析微基准：对比逐行 aiter_lines + json.loads + pydantic 与共享的字节级解析器
+
+用法：python -m benchmarks.bench_sse [--events 20000] [--chunk-size 512]
+"""
+import argparse
+import asyncio
+import json
+import time
+import httpx
+from pydantic import BaseModel
+from src.providers.sse import iter_chat_chunks
+from src.utils.json_helper import HAS_ORJSON
+
+class LegacyStreamResponse(BaseModel):
+    content: str
+    done: bool = False
+
+def build_body(events: int) -> bytes:
+    parts = []
+    for i in range(events):
+        event = {
+            "id": "chatcmpl-bench",
+            "object": "chat.completion.chunk",
+            "model": "qwen-plus",
+            "choices": [{"index": 0, "delta": {"content": "你好"}, "finish_reason": None}],
+        }
+        parts.append(f"data: {json.dumps(event, ensure_ascii=False)}\n\n")
+    parts.append("data: [DONE]\n\n")
+    return "".join(parts).encode("utf-8")
+
+def make_client(body: bytes, chunk_size: int) -> httpx.AsyncClient:
+    async def stream():
+        for i in range(0, len(body), chunk_size):
+            yield body[i:i + chunk_size]
+
+    def handler(request):
+        return httpx.Response(200, content=stream())
+
+    return httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+async def legacy_parse(response: httpx.Response) -> int:
+    """改造前 TongyiProvider.stream_chat 的逐行解析逻辑"""
+    count = 0
+    async for line in response.aiter_lines():
+        if line.strip():
+            if line.startswith("data: "):
+                line = line[6:]
+            if line == "[DONE]":
+                continue
+            data = json.loads(line)
+            if "choices" in data and data["choices"]:
+                delta = data["choices"][0].get("delta", {})
+                content = delta.get("content", "")
+                done = data["choices"][0].get("finish_reason") is not None
+                if content:
+                    LegacyStreamResponse(content=content, done=done)
+                    count += 1
+    return count
+
+async def shared_parse(response: httpx.Response) -> int:
+    count = 0
+    async for _ in iter_chat_chunks(response):
+        count += 1
+    return count
+
+async def run(parser, body: bytes, chunk_size: int, rounds: int) -> float:
+    best = float("inf")
+    for _ in range(rounds):
+        async with make_client(body, chunk_size) as client:
+            start = time.perf_counter()
+            async with client.stream("POST", "http://upstream/chat") as response:
+                await parser(response)
+            best = min(best, time.perf_counter() - start)
+    return best
+
+async def main(events: int, chunk_size: int, rounds: int) -> None:
+    body = build_body(events)
+    legacy = await run(legacy_parse, body, chunk_size, rounds)
+    shared = await run(shared_parse, body, chunk_size, rounds)
+    print(json.dumps({
+        "benchmark": "sse_decode",
+        "events": events,
+        "chunk_size": chunk_size,
+        "orjson": HAS_ORJSON,
+        "legacy_us_per_event": round(legacy / events * 1e6, 3),
+        "shared_us_per_event": round(shared / events * 1e6, 3),
+        "speedup": round(legacy / shared, 2),
+    }, indent=2))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--events", type=int, default=20000)
+    parser.add_argument("--chunk-size", type=int, default=512)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+    asyncio.run(main(args.events, args.chunk_size, args.rounds))
@@ -0,0 +1,135 @@
+"""本地模拟的 DashScope 与百川上游服务，用于离线压测
+
+支持配置首包延迟、输出速度（tokens/s）、输出长度和错误率。
+
+用法：python -m benchmarks.fake_upstream --port 9100 --latency 0.2 --tps 50 --tokens 100
+"""
+import argparse
+import asyncio
+import json
+import random
+from dataclasses import dataclass
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Route
+
+@dataclass
+class UpstreamConfig:
+    latency: float = 0.2          # 首个token（或完整响应）前的延迟，秒
+    tokens_per_sec: float = 50.0  # 流式输出速度，<=0 表示不限速
+    tokens: int = 100             # 每次回复的token数
+    error_rate: float = 0.0       # 返回错误的概率
+    error_status: int = 503       # 错误时的状态码
+    token_text: str = "测试"
+
+def create_app(config: UpstreamConfig) -> Starlette:
+    """创建模拟上游应用"""
+
+    def maybe_error():
+        if config.error_rate and random.random() < config.error_rate:
+            return JSONResponse(
+                {"code": "Throttling", "message": "simulated upstream error"},
+                status_code=config.error_status,
+                headers={"Retry-After": "1"} if config.error_status == 429 else None
+            )
+        return None
+
+    def full_text() -> str:
+        return config.token_text * config.tokens
+
+    async def sse_stream(model: str):
+        await asyncio.sleep(config.latency)
+        interval = 1.0 / config.tokens_per_sec if config.tokens_per_sec > 0 else 0
+        for i in range(config.tokens):
+            event = {
+                "id": "chatcmpl-fake",
+                "object": "chat.completion.chunk",
+                "model": model,
+                "choices": [{
+                    "index": 0,
+                    "delta": {"content": config.token_text},
+                    "finish_reason": "stop" if i == config.tokens - 1 else None
+                }]
+            }
+            yield f"data: {json.dumps(event, ensure_ascii=False)}\n\n".encode("utf-8")
+            if interval:
+                await asyncio.sleep(interval)
+        yield b"data: [DONE]\n\n"
+
+    async def generation_time():
+        # 非流式接口：首包延迟 + 完整输出耗时
+        duration = config.latency
+        if config.tokens_per_sec > 0:
+            duration += config.tokens / config.tokens_per_sec
+        await asyncio.sleep(duration)
+
+    async def tongyi_generation(request: Request):
+        body = await request.json()
+        error = maybe_error()
+        if error:
+            return error
+        await generation_time()
+        return JSONResponse({
+            "output": {"choices": [{
+                "finish_reason": "stop",
+                "message": {"role": "assistant", "content": full_text()}
+            }]},
+            "usage": {"output_tokens": config.tokens},
+            "request_id": "fake-" + body.get("model", "")
+        })
+
+    async def chat_completions(request: Request):
+        body = await request.json()
+        error = maybe_error()
+        if error:
+            return error
+        model = body.get("model", "")
+        if body.get("stream"):
+            return StreamingResponse(sse_stream(model), media_type="text/event-stream")
+        await generation_time()
+        # 百川非流式接口的响应格式
+        return JSONResponse({
+            "data": {"messages": [{"role": "assistant", "content": full_text()}]},
+            "usage": {"completion_tokens": config.tokens}
+        })
+
+    async def list_models(request: Request):
+        return JSONResponse({"data": [{"id": "qwen-plus"}, {"id": "Baichuan2-Turbo"}]})
+
+    return Starlette(routes=[
+        # DashScope 原生接口
+        Route("/api/v1/services/aigc/text-generation/generation", tongyi_generation, methods=["POST"]),
+        # DashScope 兼容模式
+        Route("/compatible-mode/v1/chat/completions", chat_completions, methods=["POST"]),
+        Route("/compatible-mode/v1/models", list_models),
+        # 百川
+        Route("/v1/chat/completions", chat_completions, methods=["POST"]),
+        Route("/v1/models", list_models),
+    ])
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--latency", type=float, default=0.2, help="首包延迟（秒）")
+    parser.add_argument("--tps", type=float, default=50.0, help="每秒输出token数")
+    parser.add_argument("--tokens", type=int, default=100, help="每次回复的token数")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="错误率（0~1）")
+    parser.add_argument("--error-status", type=int, default=503, help="错误状态码")
+
+def config_from_args(args: argparse.Namespace) -> UpstreamConfig:
+    return UpstreamConfig(
+        latency=args.latency,
+        tokens_per_sec=args.tps,
+        tokens=args.tokens,
+        error_rate=args.error_rate,
+        error_status=args.error_status
+    )
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    add_arguments(parser)
+    args = parser.parse_args()
+    uvicorn.run(create_app(config_from_args(args)), host=args.host, port=args.port, log_level="warning")
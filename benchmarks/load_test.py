@@ -0,0 +1,298 @@
+"""离线压测：启动模拟上游和服务进程，按固定并发压测 /chat 与 /chat/stream
+
+输出 JSON 结果（RPS、延迟分位数、首token时间、每个流的内存占用），便于跨版本对比。
+
+用法：
+    python -m benchmarks.load_test --concurrency 50 --requests 500 --output bench.json
+    python -m benchmarks.load_test --mode stream --model model_004 --tps 100 --error-rate 0.01
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+import httpx
+from .fake_upstream import add_arguments
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+def summarize(latencies: List[float]) -> Dict[str, Optional[float]]:
+    """延迟统计（毫秒）"""
+    def ms(value: Optional[float]) -> Optional[float]:
+        return round(value * 1000, 2) if value is not None else None
+
+    return {
+        "p50_ms": ms(percentile(latencies, 50)),
+        "p95_ms": ms(percentile(latencies, 95)),
+        "p99_ms": ms(percentile(latencies, 99)),
+        "max_ms": ms(max(latencies) if latencies else None),
+    }
+
+def rss_bytes(pid: int) -> Optional[int]:
+    """读取进程常驻内存（仅Linux）"""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        return None
+    return None
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except Exception:
+        return None
+
+async def wait_ready(url: str, timeout: float = 20.0) -> None:
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            try:
+                await client.get(url)
+                return
+            except httpx.TransportError:
+                await asyncio.sleep(0.1)
+    raise RuntimeError(f"Service at {url} did not start in {timeout}s")
+
+def start_process(args: List[str], env: Optional[Dict[str, str]] = None) -> subprocess.Popen:
+    return subprocess.Popen(
+        [sys.executable, *args],
+        cwd=ROOT,
+        env={**os.environ, **(env or {})},
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL
+    )
+
+async def run_chat(client: httpx.AsyncClient, payload: dict, total: int, concurrency: int) -> dict:
+    latencies: List[float] = []
+    errors: Dict[str, int] = {}
+    queue: asyncio.Queue = asyncio.Queue()
+    for _ in range(total):
+        queue.put_nowait(None)
+
+    async def worker():
+        while not queue.empty():
+            queue.get_nowait()
+            start = time.perf_counter()
+            try:
+                response = await client.post("/api/v1/chat", json=payload)
+                if response.status_code == 200:
+                    latencies.append(time.perf_counter() - start)
+                else:
+                    errors[str(response.status_code)] = errors.get(str(response.status_code), 0) + 1
+            except httpx.HTTPError as e:
+                errors[type(e).__name__] = errors.get(type(e).__name__, 0) + 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    elapsed = time.perf_counter() - start
+    return {
+        "requests": total,
+        "succeeded": len(latencies),
+        "errors": errors,
+        "elapsed_s": round(elapsed, 3),
+        "rps": round(len(latencies) / elapsed, 2) if elapsed else None,
+        "latency": summarize(latencies),
+    }
+
+async def run_stream(client: httpx.AsyncClient, payload: dict, total: int, concurrency: int, app_pid: int) -> dict:
+    latencies: List[float] = []
+    ttfts: List[float] = []
+    chunk_rates: List[float] = []
+    errors: Dict[str, int] = {}
+    active = 0
+    peak_active = 0
+    queue: asyncio.Queue = asyncio.Queue()
+    for _ in range(total):
+        queue.put_nowait(None)
+
+    async def worker():
+        nonlocal active, peak_active
+        while not queue.empty():
+            queue.get_nowait()
+            start = time.perf_counter()
+            first = None
+            chunks = 0
+            failed = None
+            active += 1
+            peak_active = max(peak_active, active)
+            try:
+                async with client.stream("POST", "/api/v1/chat/stream", json=payload) as response:
+                    if response.status_code != 200:
+                        failed = str(response.status_code)
+                    else:
+                        async for line in response.aiter_lines():
+                            if not line.startswith("data: ") or line == "data: [DONE]":
+                                continue
+                            event = json.loads(line[6:])
+                            if "error" in event:
+                                failed = event.get("type", "stream_error")
+                            elif event.get("content"):
+                                chunks += 1
+                                if first is None:
+                                    first = time.perf_counter()
+            except httpx.HTTPError as e:
+                failed = type(e).__name__
+            finally:
+                active -= 1
+
+            end = time.perf_counter()
+            if failed:
+                errors[failed] = errors.get(failed, 0) + 1
+                continue
+            latencies.append(end - start)
+            if first is not None:
+                ttfts.append(first - start)
+                if end > first and chunks > 1:
+                    chunk_rates.append((chunks - 1) / (end - first))
+
+    # 压测期间采样服务进程内存，估算每个并发流的内存开销
+    baseline_rss = rss_bytes(app_pid)
+    peak_rss = baseline_rss
+    done = asyncio.Event()
+
+    async def sample_memory():
+        nonlocal peak_rss
+        while not done.is_set():
+            current = rss_bytes(app_pid)
+            if current and (peak_rss is None or current > peak_rss):
+                peak_rss = current
+            await asyncio.sleep(0.05)
+
+    sampler = asyncio.create_task(sample_memory())
+    start = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    elapsed = time.perf_counter() - start
+    done.set()
+    await sampler
+
+    memory_per_stream = None
+    if baseline_rss and peak_rss and peak_active:
+        memory_per_stream = max(0, peak_rss - baseline_rss) // peak_active
+
+    return {
+        "requests": total,
+        "succeeded": len(latencies),
+        "errors": errors,
+        "elapsed_s": round(elapsed, 3),
+        "rps": round(len(latencies) / elapsed, 2) if elapsed else None,
+        "latency": summarize(latencies),
+        "ttft": summarize(ttfts),
+        "chunks_per_sec_p50": round(percentile(chunk_rates, 50), 2) if chunk_rates else None,
+        "peak_active_streams": peak_active,
+        "rss_baseline_bytes": baseline_rss,
+        "rss_peak_bytes": peak_rss,
+        "memory_per_stream_bytes": memory_per_stream,
+    }
+
+async def main(args: argparse.Namespace) -> dict:
+    upstream_port = free_port()
+    app_port = free_port()
+    upstream_url = f"http://127.0.0.1:{upstream_port}"
+
+    upstream = start_process([
+        "-m", "benchmarks.fake_upstream",
+        "--port", str(upstream_port),
+        "--latency", str(args.latency),
+        "--tps", str(args.tps),
+        "--tokens", str(args.tokens),
+        "--error-rate", str(args.error_rate),
+        "--error-status", str(args.error_status),
+    ])
+    app = start_process(
+        ["-m", "uvicorn", "src.main:app", "--port", str(app_port), "--log-level", "warning",
+         "--workers", str(args.workers)],
+        env={
+            # vercel 档位：关闭 Redis 和逐块日志，只测服务本身
+            "ENVIRONMENT": args.env,
+            "DASHSCOPE_API_KEY": "bench",
+            "BAICHUAN_API_KEY": "bench",
+            "BAICHUAN_SECRET_KEY": "bench",
+            "TONGYI_BASE_URL": f"{upstream_url}/api/v1",
+            "TONGYI_COMPATIBLE_URL": f"{upstream_url}/compatible-mode/v1",
+            "BAICHUAN_BASE_URL": f"{upstream_url}/v1",
+            "RESPONSE_CACHE_ENABLED": "false",
+            "SINGLE_FLIGHT_ENABLED": "false",
+        }
+    )
+
+    try:
+        await wait_ready(f"{upstream_url}/v1/models")
+        await wait_ready(f"http://127.0.0.1:{app_port}/health")
+
+        limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+        timeout = httpx.Timeout(120.0)
+        results = {}
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{app_port}", limits=limits, timeout=timeout) as client:
+            payload = {"content": "你好，请介绍一下你自己", "provider_id": args.model}
+            if args.mode in ("chat", "both"):
+                results["chat"] = await run_chat(client, payload, args.requests, args.concurrency)
+            if args.mode in ("stream", "both"):
+                results["stream"] = await run_stream(client, payload, args.requests, args.concurrency, app.pid)
+
+        return {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "git_revision": git_revision(),
+            "python": platform.python_version(),
+            "config": {
+                "model": args.model,
+                "concurrency": args.concurrency,
+                "requests": args.requests,
+                "workers": args.workers,
+                "upstream": {
+                    "latency_s": args.latency,
+                    "tokens_per_sec": args.tps,
+                    "tokens": args.tokens,
+                    "error_rate": args.error_rate,
+                },
+            },
+            "results": results,
+        }
+    finally:
+        for process in (app, upstream):
+            process.terminate()
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mode", choices=["chat", "stream", "both"], default="both")
+    parser.add_argument("--model", default="model_001", help="内部模型ID")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--workers", type=int, default=1, help="服务进程数")
+    parser.add_argument("--env", default="vercel", help="服务的 ENVIRONMENT（默认 vercel：不连接 Redis）")
+    parser.add_argument("--output", help="结果写入的JSON文件，默认输出到标准输出")
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    result = asyncio.run(main(args))
+    text = json.dumps(result, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    print(text)
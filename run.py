@@ -1,7 +1,14 @@
 import os
+import importlib.util
+import tempfile
 import uvicorn
 from typing import Optional
 
+APP = "src.main:app"
+
+# 这些环境以多进程生产模式启动，其余环境使用单进程热重载的开发模式
+PRODUCTION_ENVS = ("production",)
+
 def load_env_file(env: str) -> None:
     """加载环境配置文件"""
     env_file = f".env.{env}"
@@ -12,19 +19,97 @@ def load_env_file(env: str) -> None:
     else:
         print(f"Warning: {env_file} not found")
 
-def main(env: Optional[str] = None):
+def has_module(name: str) -> bool:
+    return importlib.util.find_spec(name) is not None
+
+def prepare_multiprocess_metrics(workers: int) -> None:
+    """多进程时让各 worker 的 Prometheus 指标写入共享目录，由 /metrics 汇总"""
+    if workers > 1 and not os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        os.environ["PROMETHEUS_MULTIPROC_DIR"] = tempfile.mkdtemp(prefix="prometheus_")
+
+def run_gunicorn(args) -> None:
+    """使用 gunicorn 管理 uvicorn worker：支持预加载和按请求数平滑回收"""
+    from gunicorn.app.base import BaseApplication
+
+    def child_exit(server, worker):
+        if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+            from prometheus_client import multiprocess
+            multiprocess.mark_process_dead(worker.pid)
+
+    class Application(BaseApplication):
+        def load_config(self):
+            options = {
+                "bind": f"{args.host}:{args.port}",
+                "workers": args.workers,
+                "worker_class": "uvicorn.workers.UvicornWorker",
+                "backlog": args.backlog,
+                "keepalive": args.keep_alive,
+                "max_requests": args.max_requests,
+                "max_requests_jitter": args.max_requests_jitter,
+                "graceful_timeout": args.graceful_timeout,
+                "preload_app": args.preload,
+                "loglevel": args.log_level,
+                "child_exit": child_exit,
+            }
+            for key, value in options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            from src.main import app
+            return app
+
+    Application().run()
+
+def run_uvicorn(args) -> None:
+    """没有 gunicorn 时直接用 uvicorn 的多进程模式"""
+    if args.max_requests:
+        # uvicorn 不会重启达到请求上限后退出的 worker，回收会让服务逐渐停掉
+        print("Warning: worker recycling requires gunicorn, --max-requests is ignored")
+        args.max_requests = 0
+    if args.preload:
+        print("Warning: --preload requires gunicorn, ignored")
+
+    uvicorn.run(
+        APP,
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        loop="uvloop" if has_module("uvloop") else "asyncio",
+        http="httptools" if has_module("httptools") else "h11",
+        backlog=args.backlog,
+        timeout_keep_alive=args.keep_alive,
+        timeout_graceful_shutdown=args.graceful_timeout,
+        log_level=args.log_level,
+    )
+
+def main(env: Optional[str] = None, args=None):
     """启动服务"""
     # 如果指定了环境，加载对应的配置
     if env:
         load_env_file(env)
-    
-    uvicorn.run(
-        "src.main:app",
-        host="127.0.0.1",
-        port=8000,
-        reload=True,
-        log_level="info"
+        # 配置文件未指定时以 --env 为准
+        os.environ.setdefault("ENVIRONMENT", env)
+
+    if args is None or env not in PRODUCTION_ENVS:
+        uvicorn.run(
+            APP,
+            host=args.host if args else "127.0.0.1",
+            port=args.port if args else 8000,
+            reload=True,
+            log_level="info"
+        )
+        return
+
+    prepare_multiprocess_metrics(args.workers)
+    use_gunicorn = args.server == "gunicorn" or (args.server == "auto" and has_module("gunicorn"))
+    print(
+        f"Starting production server: {'gunicorn' if use_gunicorn else 'uvicorn'} "
+        f"workers={args.workers} bind={args.host}:{args.port}"
     )
+    if use_gunicorn:
+        run_gunicorn(args)
+    else:
+        run_uvicorn(args)
 
 if __name__ == "__main__":
     import argparse
@@ -35,5 +120,23 @@ if __name__ == "__main__":
         default="local",
         help="指定运行环境"
     )
+    parser.add_argument("--host", default=os.environ.get("HOST"), help="监听地址（生产默认 0.0.0.0）")
+    parser.add_argument("--port", type=int, default=int(os.environ.get("PORT", 8000)))
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=int(os.environ.get("WEB_CONCURRENCY", 0)) or os.cpu_count() or 1,
+        help="生产模式的 worker 数，默认等于CPU核数"
+    )
+    parser.add_argument("--backlog", type=int, default=2048, help="监听队列长度")
+    parser.add_argument("--keep-alive", type=int, default=5, help="空闲 keep-alive 连接保持秒数")
+    parser.add_argument("--max-requests", type=int, default=10000, help="worker 处理多少请求后平滑重启，0 表示不回收")
+    parser.add_argument("--max-requests-jitter", type=int, default=1000, help="回收阈值的随机抖动，避免 worker 同时重启")
+    parser.add_argument("--graceful-timeout", type=int, default=30, help="重启或关闭时等待进行中请求的秒数")
+    parser.add_argument("--preload", action="store_true", help="fork 前预加载应用（需要 gunicorn）")
+    parser.add_argument("--server", choices=["auto", "gunicorn", "uvicorn"], default="auto")
+    parser.add_argument("--log-level", default="info")
     args = parser.parse_args()
-    main(args.env) 
\ No newline at end of file
+    if args.host is None:
+        args.host = "0.0.0.0" if args.env in PRODUCTION_ENVS else "127.0.0.1"
+    main(args.env, args)
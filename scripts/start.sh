@@ -4,5 +4,5 @@
 # 激活虚拟环境（如果使用）
 # source /path/to/venv/bin/activate
 
-# 启动服务
-uvicorn src.main:app --host 0.0.0.0 --port 8000 --workers 4 
\ No newline at end of file
+# 启动服务（worker 数默认等于CPU核数，可用 --workers 或 WEB_CONCURRENCY 覆盖）
+python run.py --env production "$@" 
\ No newline at end of file
@@ -9,6 +9,7 @@ setup(
         "pydantic==2.6.0",
         "pydantic-settings==2.1.0",
         "httpx==0.26.0",
+        "prometheus-client==0.19.0",
         "pytest==7.4.4",
         "pytest-asyncio==0.23.4",
     ],
@@ -1,15 +1,30 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Response, WebSocket, WebSocketDisconnect
 from fastapi.responses import StreamingResponse
-from typing import AsyncGenerator
+from starlette.background import BackgroundTask
+from typing import AsyncGenerator, Dict, List, Optional
+import asyncio
 import logging
+import time
 import uuid
-import json
-from ..models.chat import ChatRequest, ChatResponse
+from ..models.chat import BatchChatRequest, ChatRequest, ChatResponse
+from ..core.config import settings
 from ..core.model_config import ModelMapping
 from ..providers.factory import ProviderFactory
 from ..utils.redis_helper import redis_client
+from ..utils.context_manager import context_manager
+from ..utils.response_cache import response_cache
+from ..utils.semantic_cache import semantic_cache
+from ..utils.single_flight import single_flight, stream_flight
+from ..utils.concurrency import (
+    OverloadedError, Permit, background_queue_timeout, background_queueing, limiters
+)
+from ..utils import fallback
+from ..utils.circuit_breaker import CircuitOpenError, breakers
+from ..utils import metrics
+from ..utils.log_helper import configure_logging, LazyJson, payload_logging, chunk_logging
+from ..utils.json_helper import SSE_DONE, dumps, loads, sse_frame
 
-logging.basicConfig(level=logging.INFO)
+configure_logging()
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
@@ -21,108 +36,378 @@ def format_message(content: str, role: str = "user") -> dict:
         "content": content
     }
 
-async def stream_chat_response(provider, messages: list, model_id: str) -> AsyncGenerator[str, None]:
+class StreamTranscript:
+    """累积流式输出的内容片段，流结束后由后台任务写入历史"""
+
+    __slots__ = ("request_id", "user_message", "parts", "completed", "abandoned")
+
+    def __init__(self, request_id: str, user_message: dict):
+        self.request_id = request_id
+        self.user_message = user_message
+        self.parts: List[str] = []
+        self.completed = False
+        # 客户端中途断开，parts 中是已生成的部分回复
+        self.abandoned = False
+
+    async def save(self) -> None:
+        """流正常结束或客户端中途断开后追加本轮对话（断开时保存已生成的部分）"""
+        if not (self.completed or self.abandoned) or not self.parts:
+            return
+        if self.abandoned:
+            logger.info("[%s] Saving partial reply chunks=%d", self.request_id, len(self.parts))
+        await redis_client.append_chat_history(self.request_id, [
+            self.user_message,
+            format_message("".join(self.parts), "assistant")
+        ])
+
+async def limited_stream(internal_id: str, messages: list, permit: Optional[Permit] = None):
+    """在熔断器和并发名额内驱动上游流，上游结束时归还名额"""
+    model_info = ModelMapping.get_model_info(internal_id)
+    breaker = breakers.get(model_info["provider"])
+    try:
+        # 先排队再检查熔断器：排队期间熔断器可能已打开，half_open 的试探名额也不会被排队中的请求占住
+        if permit is None:
+            permit = await limiters.acquire(model_info["provider"], internal_id)
+        breaker.allow()
+        provider = ProviderFactory.create(model_info["provider"])
+        started = time.perf_counter()
+        first_token = None
+        chunks = provider.stream_chat(messages, model_info["model_id"])
+        try:
+            async for chunk in chunks:
+                if first_token is None:
+                    first_token = time.perf_counter() - started
+                yield chunk
+        except (asyncio.CancelledError, GeneratorExit):
+            # 客户端断开或对冲落败，调用没有结果
+            breaker.release_trial()
+            raise
+        except Exception as e:
+            breaker.record_error(e)
+            raise
+        finally:
+            # 被提前关闭时逐层关闭到 httpx 响应，上游立即停止生成
+            await chunks.aclose()
+        # 流式调用按首token时间判断是否为慢调用
+        breaker.record_success(first_token if first_token is not None else time.perf_counter() - started)
+    finally:
+        if permit is not None:
+            permit.release()
+
+async def stream_chat_response(
+    messages: list,
+    internal_id: str,
+    request_id: str,
+    transcript: StreamTranscript,
+    model_metrics: metrics.ModelMetrics,
+    flight_key: Optional[str] = None,
+    permit: Optional[Permit] = None
+) -> AsyncGenerator[bytes, None]:
     """流式返回聊天响应"""
+    # 开关和指标子对象在流开始时准备好，逐块路径上只剩布尔判断和 inc()
+    log_chunks = chunk_logging(logger)
+    chunk_counter = model_metrics.stream_chunks
+    chunks = 0
+    parts = transcript.parts
+    started = time.perf_counter()
+    first_at = None
+    served_by = None
+    source = None
+    abandoned = False
+    metrics.ACTIVE_STREAMS.inc()
     try:
-        logger.info(f"Starting stream chat with model: {model_id}")
-        logger.info(f"Messages: {json.dumps(messages, ensure_ascii=False, indent=2)}")
+        # 首个事件携带对话ID，客户端可仅靠流式接口继续对话
+        yield sse_frame({"request_id": request_id})
+        logger.info("[%s] Starting stream chat model=%s messages=%d", request_id, internal_id, len(messages))
+        if payload_logging(logger, request_id):
+            logger.info("[%s] Messages: %s", request_id, LazyJson(messages))
         
-        async for chunk in provider.stream_chat(messages, model_id):
+        # 主模型复用请求入口占用的名额；名额随上游一起转交，合并流中由驱动上游的任务持有
+        def candidate(candidate_id: str):
+            owned = None
+            if candidate_id == internal_id and permit is not None:
+                owned = permit.detach()
+            return limited_stream(candidate_id, messages, owned)
+
+        def upstream():
+            chain, hedge_after = fallback.plan(internal_id)
+            return fallback.hedged_stream(chain, candidate, hedge_after)
+
+        # 相同的并发流共享一个上游，后加入者会先收到已缓冲的块
+        if flight_key:
+            source = stream_flight.subscribe(flight_key, upstream)
+        else:
+            source = upstream()
+
+        async for served, chunk in source:
+            if served != served_by:
+                # 告知客户端实际提供服务的模型（可能是降级或对冲后的备用模型）
+                served_by = served
+                yield sse_frame({"model": served})
             if chunk.content:
+                if first_at is None:
+                    first_at = time.perf_counter()
+                    model_metrics.upstream_ttft.observe(first_at - started)
+                chunks += 1
+                chunk_counter.inc()
+                parts.append(chunk.content)
                 response_data = {
                     "content": chunk.content,
                     "done": chunk.done
                 }
-                logger.info(f"Streaming chunk: {json.dumps(response_data, ensure_ascii=False)}")
-                yield f"data: {json.dumps(response_data, ensure_ascii=False)}\n\n"
+                if log_chunks:
+                    logger.debug("[%s] Streaming chunk: %s", request_id, LazyJson(response_data))
+                yield sse_frame(response_data)
             else:
-                logger.warning("Received empty chunk")
-                
+                logger.debug("[%s] Received empty chunk", request_id)
+        model_metrics.upstream_latency.observe(time.perf_counter() - started)
+        transcript.completed = True
+
+    except (asyncio.CancelledError, GeneratorExit):
+        # 客户端断开：starlette 在等待上游时取消了本生成器，或在停在 yield 时由 finish() 关闭
+        abandoned = True
+        raise
     except Exception as e:
-        logger.error(f"Error in stream chat: {str(e)}", exc_info=True)
+        metrics.record_error(e)
+        logger.error("[%s] Error in stream chat: %s", request_id, e, exc_info=True)
         error_data = {
             "error": str(e),
             "type": type(e).__name__
         }
-        yield f"data: {json.dumps(error_data, ensure_ascii=False)}\n\n"
+        yield sse_frame(error_data)
     finally:
-        logger.info("Stream completed")
-        yield "data: [DONE]\n\n"
+        if abandoned:
+            transcript.abandoned = True
+            model_metrics.streams_abandoned.inc()
+            if source is not None:
+                # 停在 yield 上被关闭时上游迭代器仍处于挂起状态，需要显式关闭
+                await source.aclose()
+        if permit is not None:
+            permit.release()
+        finished = time.perf_counter()
+        metrics.ACTIVE_STREAMS.dec()
+        model_metrics.stream_latency.observe(finished - started)
+        if first_at is not None and chunks > 1 and finished > first_at:
+            model_metrics.stream_chunk_rate.observe((chunks - 1) / (finished - first_at))
+        logger.info(
+            "[%s] Stream %s chunks=%d served_by=%s",
+            request_id, "abandoned by client" if abandoned else "completed", chunks, served_by
+        )
+    # 不能在 finally 中 yield：生成器被关闭时再产出会触发 "async generator ignored GeneratorExit"
+    yield SSE_DONE
+
+async def timed_chat(internal_id: str, messages: list):
+    """在熔断器和并发名额内调用上游并记录耗时"""
+    model_info = ModelMapping.get_model_info(internal_id)
+    breaker = breakers.get(model_info["provider"])
+    async with await limiters.acquire(model_info["provider"], internal_id):
+        breaker.allow()
+        provider = ProviderFactory.create(model_info["provider"])
+        started = time.perf_counter()
+        try:
+            response = await provider.chat(messages, model_info["model_id"])
+        except asyncio.CancelledError:
+            breaker.release_trial()
+            raise
+        except Exception as e:
+            breaker.record_error(e)
+            raise
+        finally:
+            metrics.for_model(internal_id).upstream_latency.observe(time.perf_counter() - started)
+        # 总耗时随回复长度增长，不按慢调用判断
+        breaker.record_success()
+        return response
+
+async def chat_with_fallback(internal_id: str, messages: list):
+    """按降级链调用上游，返回 (实际服务的模型, 响应)"""
+    chain, hedge_after = fallback.plan(internal_id, streaming=False)
+    return await fallback.hedged_call(chain, lambda candidate: timed_chat(candidate, messages), hedge_after)
 
 @router.post("/chat", response_model=ChatResponse)
-async def create_chat(chat_request: ChatRequest):
+async def create_chat(chat_request: ChatRequest, http_response: Response):
     request_id = chat_request.request_id or str(uuid.uuid4())
+    model_metrics = metrics.for_model(chat_request.provider_id)
+    model_metrics.chat_requests.inc()
+    started = time.perf_counter()
     
     try:
-        # 记录请求数据
-        logger.info(f"[{request_id}] ====== Chat Request Start ======")
-        logger.info(f"[{request_id}] Request data: {json.dumps(chat_request.dict(), ensure_ascii=False, indent=2)}")
+        # 记录请求数据（完整载荷受档位和采样控制）
+        log_payloads = payload_logging(logger, request_id)
+        logger.info(
+            "[%s] Chat request model=%s content_chars=%d",
+            request_id, chat_request.provider_id, len(chat_request.content)
+        )
+        if log_payloads:
+            logger.info("[%s] Request data: %s", request_id, LazyJson(chat_request.dict()))
         
         # 获取模型信息
         model_info = ModelMapping.get_model_info(chat_request.provider_id)
-        logger.info(f"[{request_id}] Model info: {json.dumps(model_info, ensure_ascii=False, indent=2)}")
         
         if not model_info:
-            logger.error(f"[{request_id}] Invalid model ID: {chat_request.provider_id}")
+            logger.error("[%s] Invalid model ID: %s", request_id, chat_request.provider_id)
             raise HTTPException(status_code=400, detail="Invalid model ID")
 
         # 创建对应的提供商实例
         provider = ProviderFactory.create(model_info["provider"])
-        logger.info(f"[{request_id}] Created provider: {model_info['provider']}")
         
-        # 处理对话历史
-        messages = []
+        # 按上下文预算构建消息（系统提示语 + 摘要 + 最近对话 + 新消息）
+        messages = await context_manager.build_messages(
+            chat_request.provider_id,
+            chat_request.request_id,
+            chat_request.content
+        )
+        if log_payloads:
+            logger.info("[%s] Final messages to provider: %s", request_id, LazyJson(messages))
         
-        # 添加系统提示语
-        system_prompt = ModelMapping.get_system_prompt(chat_request.provider_id)
-        if system_prompt:
-            messages.append(format_message(system_prompt, "system"))
-            logger.info(f"[{request_id}] Added system prompt: {system_prompt}")
-
-        if chat_request.request_id:
-            history = await redis_client.get_chat_history(chat_request.request_id)
-            if history:
-                messages.extend(history)
-                logger.info(f"[{request_id}] Loaded chat history: {json.dumps(history, ensure_ascii=False, indent=2)}")
+        # 请求指纹：响应缓存和并发合并共用
+        request_key = response_cache.make_key(
+            chat_request.provider_id,
+            provider.get_model_params(model_info["model_id"]),
+            messages
+        )
+
+        # 查询响应缓存
+        cache_key = None
+        if not response_cache.enabled_for(chat_request.provider_id):
+            http_response.headers["X-Cache"] = "DISABLED"
+        elif chat_request.no_cache:
+            http_response.headers["X-Cache"] = "BYPASS"
+        else:
+            cache_key = request_key
+        content = await response_cache.get(cache_key) if cache_key else None
+
+        # 精确缓存未命中时，单轮请求再查近似重复问题的语义缓存
+        semantic = None
+        if (
+            content is None
+            and not chat_request.no_cache
+            and semantic_cache.enabled_for(chat_request.provider_id)
+            and semantic_cache.is_single_turn(messages)
+        ):
+            semantic = semantic_cache.lookup(chat_request.provider_id, messages[-1]["content"])
+            content = semantic.value
+            if content is not None:
+                http_response.headers["X-Cache"] = "SEMANTIC-HIT"
+                logger.info("[%s] Semantic cache hit", request_id)
+
+        served_by = chat_request.provider_id
+        if content is not None:
+            if semantic is None:
+                http_response.headers["X-Cache"] = "HIT"
+                logger.info("[%s] Response cache hit", request_id)
+        else:
+            # 调用AI服务（按降级链），相同的并发请求合并为一次上游调用
+            if settings.SINGLE_FLIGHT_ENABLED:
+                served_by, response = await single_flight.do(
+                    request_key,
+                    lambda: chat_with_fallback(chat_request.provider_id, messages),
+                    # 批量条目的等待时间还包括在限流器中排队的时间
+                    timeout=settings.SINGLE_FLIGHT_TIMEOUT + (background_queue_timeout() or 0)
+                )
             else:
-                logger.warning(f"[{request_id}] No history found for request_id: {chat_request.request_id}")
+                served_by, response = await chat_with_fallback(chat_request.provider_id, messages)
+            if log_payloads:
+                logger.info("[%s] Raw provider response: %s", request_id, LazyJson(response.raw_response))
+            content = response.content
+            if cache_key:
+                http_response.headers["X-Cache"] = "MISS"
+                # 备用模型的回复不写入主模型的缓存
+                if served_by == chat_request.provider_id:
+                    await response_cache.set(cache_key, content)
+            if semantic is not None and served_by == chat_request.provider_id:
+                semantic_cache.store(semantic, content)
         
-        # 添加新消息
-        messages.append(format_message(chat_request.content))
-        logger.info(f"[{request_id}] Final messages to provider: {json.dumps(messages, ensure_ascii=False, indent=2)}")
-        
-        # 调用AI服务
-        logger.info(f"[{request_id}] Calling AI provider with model_id: {model_info['model_id']}")
-        response = await provider.chat(messages, model_info["model_id"])
-        logger.info(f"[{request_id}] Raw provider response: {json.dumps(response.raw_response, ensure_ascii=False, indent=2)}")
-        
-        # 保存对话历史
-        messages.append(format_message(response.content, "assistant"))
-        save_result = await redis_client.save_chat_history(request_id, messages)
-        logger.info(f"[{request_id}] Save history result: {save_result}")
+        # 追加本轮对话到历史
+        save_result = await redis_client.append_chat_history(request_id, [
+            messages[-1],
+            format_message(content, "assistant")
+        ])
+        if not save_result:
+            logger.debug("[%s] History not saved", request_id)
         
         # 构造响应
         response_data = ChatResponse(
             code=200,
-            response=response.content,
-            request_id=request_id
+            response=content,
+            request_id=request_id,
+            model=served_by
+        )
+        logger.info(
+            "[%s] Chat response model=%s served_by=%s response_chars=%d",
+            request_id, chat_request.provider_id, served_by, len(content)
         )
-        logger.info(f"[{request_id}] Final response: {json.dumps(response_data.dict(), ensure_ascii=False, indent=2)}")
-        logger.info(f"[{request_id}] ====== Chat Request End ======")
         
         return response_data
 
+    except (HTTPException, OverloadedError, CircuitOpenError) as e:
+        metrics.record_error(e)
+        raise
+    except asyncio.TimeoutError as e:
+        metrics.record_error(e)
+        logger.error("[%s] Timed out waiting for upstream response", request_id)
+        raise HTTPException(status_code=504, detail="Upstream response timed out")
     except Exception as e:
-        logger.error(f"[{request_id}] ====== Error ======")
-        logger.error(f"[{request_id}] Error type: {type(e).__name__}")
-        logger.error(f"[{request_id}] Error message: {str(e)}")
-        logger.error(f"[{request_id}] Stack trace:", exc_info=True)
+        metrics.record_error(e)
+        logger.error("[%s] Chat request failed: %s: %s", request_id, type(e).__name__, e, exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        model_metrics.chat_latency.observe(time.perf_counter() - started)
+
+async def run_batch_item(index: int, item: ChatRequest, semaphores: Dict[str, asyncio.Semaphore]) -> bytes:
+    """处理批量请求中的一条，错误只影响该条结果"""
+    model_info = ModelMapping.get_model_info(item.provider_id)
+    provider_type = model_info["provider"] if model_info else None
+    semaphore = semaphores.get(provider_type)
+    if semaphore is None:
+        semaphore = semaphores[provider_type] = asyncio.Semaphore(settings.BATCH_PROVIDER_CONCURRENCY)
+
+    # 多个批量请求同时进行时总并行度会超过提供商上限，条目在限流器中排队等待，而不是立即返回429
+    with background_queueing(settings.BATCH_QUEUE_TIMEOUT):
+        async with semaphore:
+            try:
+                result = {"index": index, **(await create_chat(item, Response())).dict()}
+            except OverloadedError as e:
+                result = {"index": index, "code": 429, "error": str(e), "retry_after": e.retry_after}
+            except CircuitOpenError as e:
+                result = {"index": index, "code": 503, "error": str(e), "retry_after": e.retry_after}
+            except HTTPException as e:
+                result = {"index": index, "code": e.status_code, "error": e.detail}
+            except Exception as e:
+                logger.error("Batch item %d failed: %s", index, e, exc_info=True)
+                result = {"index": index, "code": 500, "error": str(e)}
+    return dumps(result) + b"\n"
+
+async def batch_chat_results(items: List[ChatRequest]) -> AsyncGenerator[bytes, None]:
+    """并发处理所有条目，每完成一条立即输出一行"""
+    semaphores: Dict[str, asyncio.Semaphore] = {}
+    tasks = [asyncio.create_task(run_batch_item(i, item, semaphores)) for i, item in enumerate(items)]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        # 客户端断开时取消尚未完成的条目
+        for task in tasks:
+            task.cancel()
+
+@router.post("/chat/batch")
+async def create_batch_chat(batch_request: BatchChatRequest):
+    """批量聊天接口：按提供商限制并行度，结果以 NDJSON 按完成顺序返回并带上原始下标"""
+    if len(batch_request.items) > settings.BATCH_MAX_ITEMS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Too many items, at most {settings.BATCH_MAX_ITEMS} per batch"
+        )
+    return StreamingResponse(
+        batch_chat_results(batch_request.items),
+        media_type="application/x-ndjson"
+    )
 
 @router.post("/chat/stream")
 async def create_stream_chat(chat_request: ChatRequest):
     """流式聊天接口"""
     request_id = chat_request.request_id or str(uuid.uuid4())
+    model_metrics = metrics.for_model(chat_request.provider_id)
+    model_metrics.stream_requests.inc()
     
     try:
         # 获取模型信息
@@ -133,34 +418,225 @@ async def create_stream_chat(chat_request: ChatRequest):
         # 创建提供商实例
         provider = ProviderFactory.create(model_info["provider"])
         
-        # 构建消息
-        messages = []
-        system_prompt = ModelMapping.get_system_prompt(chat_request.provider_id)
-        if system_prompt:
-            messages.append({"role": "system", "content": system_prompt})
+        # 按上下文预算构建消息
+        messages = await context_manager.build_messages(
+            chat_request.provider_id,
+            chat_request.request_id,
+            chat_request.content
+        )
+
+        # 最后一块发出后再在后台保存本轮对话，不占用流的时间
+        transcript = StreamTranscript(request_id, messages[-1])
+        flight_key = None
+        if settings.SINGLE_FLIGHT_ENABLED:
+            flight_key = response_cache.make_key(
+                chat_request.provider_id,
+                provider.get_model_params(model_info["model_id"]),
+                messages
+            )
 
-        if chat_request.request_id:
-            history = await redis_client.get_chat_history(chat_request.request_id)
-            if history:
-                messages.extend(history)
+        # 在返回响应前占用并发名额，过载时直接返回429；加入已有合并流时不需要新名额
+        permit = None
+        if not (flight_key and stream_flight.in_flight(flight_key)):
+            permit = await limiters.acquire(model_info["provider"], chat_request.provider_id)
+
+        body = stream_chat_response(
+            messages, chat_request.provider_id, request_id, transcript,
+            model_metrics, flight_key, permit
+        )
 
-        messages.append({"role": "user", "content": chat_request.content})
+        async def finish() -> None:
+            # 客户端断开时 starlette 不会关闭停在 yield 上的生成器，这里关闭以立即取消上游
+            await body.aclose()
+            # 流未开始就断开时生成器的 finally 不会执行，这里兜底归还名额
+            if permit is not None:
+                permit.release()
+            await transcript.save()
 
         return StreamingResponse(
-            stream_chat_response(provider, messages, model_info["model_id"]),
-            media_type="text/event-stream"
+            body,
+            media_type="text/event-stream",
+            background=BackgroundTask(finish)
         )
         
+    except (HTTPException, OverloadedError, CircuitOpenError) as e:
+        metrics.record_error(e)
+        raise
     except Exception as e:
-        logger.error(f"[{request_id}] Error in stream chat endpoint: {str(e)}", exc_info=True)
+        metrics.record_error(e)
+        logger.error("[%s] Error in stream chat endpoint: %s", request_id, e, exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
 
+class ChatSession:
+    """WebSocket 对话会话：历史在连接期间保存在内存中，定期和断开时把新增的对话写入Redis"""
+
+    def __init__(self, websocket: WebSocket, internal_id: str, request_id: str):
+        self.websocket = websocket
+        self.internal_id = internal_id
+        self.request_id = request_id
+        self.history: List[Dict[str, str]] = []
+        self.summary: Optional[Dict] = None
+        # 尚未写入Redis的消息
+        self.unflushed: List[Dict[str, str]] = []
+        self.generation: Optional[asyncio.Task] = None
+        self._send_lock = asyncio.Lock()
+
+    async def load(self) -> None:
+        """连接建立时加载一次历史和摘要"""
+        history, self.summary = await redis_client.get_conversation(self.request_id)
+        self.history = history or []
+
+    async def send(self, data: dict) -> None:
+        # 生成任务和接收循环都会发送消息，逐条串行写出
+        async with self._send_lock:
+            await self.websocket.send_text(dumps(data).decode("utf-8"))
+
+    def _set_summary(self, summary: Dict) -> None:
+        self.summary = summary
+
+    def record_turn(self, user_message: dict, reply: str) -> None:
+        turn = [user_message, format_message(reply, "assistant")]
+        self.history.extend(turn)
+        self.unflushed.extend(turn)
+        max_messages = settings.CHAT_HISTORY_MAX_TURNS * 2
+        if len(self.history) > max_messages:
+            del self.history[:-max_messages]
+
+    async def flush(self) -> None:
+        """把新增的对话追加到Redis，失败时保留到下次写入"""
+        if not self.unflushed:
+            return
+        pending, self.unflushed = self.unflushed, []
+        if not await redis_client.append_chat_history(self.request_id, pending) and settings.REDIS_ENABLED:
+            self.unflushed[:0] = pending
+            del self.unflushed[:-settings.CHAT_HISTORY_MAX_TURNS * 2]
+
+    async def flush_periodically(self) -> None:
+        while True:
+            await asyncio.sleep(settings.WS_HISTORY_FLUSH_INTERVAL)
+            await self.flush()
+
+    async def generate(self, content: str) -> None:
+        """流式生成一轮回复，逐token发送；被取消时保留已生成的部分"""
+        metrics.CHAT_REQUESTS.labels(self.internal_id, "ws").inc()
+        messages = context_manager.assemble(
+            self.internal_id, self.request_id, content, self.history, self.summary, self._set_summary
+        )
+        parts: List[str] = []
+        served_by = None
+        try:
+            model_info = ModelMapping.get_model_info(self.internal_id)
+            permit = await limiters.acquire(model_info["provider"], self.internal_id)
+
+            def candidate(candidate_id: str):
+                owned = permit.detach() if candidate_id == self.internal_id else None
+                return limited_stream(candidate_id, messages, owned)
+
+            chain, hedge_after = fallback.plan(self.internal_id)
+            try:
+                async for served, chunk in fallback.hedged_stream(chain, candidate, hedge_after):
+                    if served != served_by:
+                        served_by = served
+                        await self.send({"type": "model", "model": served})
+                    if chunk.content:
+                        parts.append(chunk.content)
+                        await self.send({"type": "token", "content": chunk.content})
+            finally:
+                permit.release()
+            self.record_turn(messages[-1], "".join(parts))
+            await self.send({"type": "done", "model": served_by})
+        except asyncio.CancelledError:
+            if parts:
+                self.record_turn(messages[-1], "".join(parts))
+            raise
+        except OverloadedError as e:
+            metrics.record_error(e)
+            await self.send({"type": "error", "code": 429, "error": str(e), "retry_after": e.retry_after})
+        except CircuitOpenError as e:
+            metrics.record_error(e)
+            await self.send({"type": "error", "code": 503, "error": str(e), "retry_after": e.retry_after})
+        except Exception as e:
+            metrics.record_error(e)
+            logger.error("[%s] Error in websocket chat: %s", self.request_id, e, exc_info=True)
+            await self.send({"type": "error", "code": 500, "error": str(e)})
+
+    async def cancel(self) -> bool:
+        """取消正在进行的生成，返回是否确实取消了"""
+        task = self.generation
+        if task is None:
+            return False
+        if task.done():
+            # 取出异常（如客户端断开导致发送失败），避免"异常未读取"告警
+            if not task.cancelled():
+                task.exception()
+            return False
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+        return True
+
+@router.websocket("/chat/ws")
+async def chat_websocket(websocket: WebSocket, provider_id: str, request_id: Optional[str] = None):
+    """WebSocket 聊天接口：一个连接承载整段对话
+
+    客户端发送 {"type": "message", "content": ...} 开始一轮生成，{"type": "cancel"} 取消正在进行的生成；
+    服务端依次返回 session、model、token、done（或 cancelled / error）事件。
+    """
+    await websocket.accept()
+    if not ModelMapping.get_model_info(provider_id):
+        await websocket.send_text(dumps({"type": "error", "code": 400, "error": "Invalid model ID"}).decode("utf-8"))
+        await websocket.close(code=1008)
+        return
+
+    session = ChatSession(websocket, provider_id, request_id or str(uuid.uuid4()))
+    if request_id:
+        await session.load()
+    await session.send({"type": "session", "request_id": session.request_id})
+    logger.info("[%s] WebSocket session opened model=%s history=%d", session.request_id, provider_id, len(session.history))
+
+    metrics.ACTIVE_WEBSOCKETS.inc()
+    flusher = asyncio.create_task(session.flush_periodically())
+    try:
+        while True:
+            try:
+                data = loads(await websocket.receive_text())
+                kind = data.get("type")
+            except (ValueError, AttributeError):
+                await session.send({"type": "error", "code": 400, "error": "Invalid message"})
+                continue
+
+            if kind == "message":
+                if session.generation is not None and not session.generation.done():
+                    await session.send({"type": "error", "code": 409, "error": "A generation is already running"})
+                elif not isinstance(data.get("content"), str) or not data["content"]:
+                    await session.send({"type": "error", "code": 400, "error": "Missing content"})
+                else:
+                    session.generation = asyncio.create_task(session.generate(data["content"]))
+            elif kind == "cancel":
+                if await session.cancel():
+                    await session.send({"type": "cancelled"})
+            else:
+                await session.send({"type": "error", "code": 400, "error": f"Unknown message type: {kind}"})
+    except WebSocketDisconnect:
+        pass
+    finally:
+        metrics.ACTIVE_WEBSOCKETS.dec()
+        flusher.cancel()
+        try:
+            await flusher
+        except asyncio.CancelledError:
+            pass
+        await session.cancel()
+        await session.flush()
+        logger.info("[%s] WebSocket session closed", session.request_id)
+
 @router.get("/models")
 async def list_models():
     """列出支持的模型"""
     try:
         models = ModelMapping.list_models()
-        logger.info(f"Listing models: {json.dumps(models, ensure_ascii=False)}")
         return {"models": models}
     except Exception as e:
         logger.error(f"Error listing models: {str(e)}", exc_info=True)
@@ -1,6 +1,6 @@
 from pydantic import BaseModel, Field
 from pydantic_settings import BaseSettings, SettingsConfigDict
-from typing import Optional
+from typing import Dict, Optional
 from enum import Enum
 import os
 
@@ -26,6 +26,26 @@ class Settings(BaseSettings):
     TONGYI_BASE_URL: str = "https://dashscope.aliyuncs.com/api/v1"
     TONGYI_COMPATIBLE_URL: str = "https://dashscope.aliyuncs.com/compatible-mode/v1"
     
+    # 日志配置
+    LOG_LEVEL: str = "INFO"
+    LOG_PROFILE: Optional[str] = Field(
+        default=None,
+        description="日志档位：debug 或 production，未设置时按运行环境推断"
+    )
+    LOG_PAYLOADS: Optional[bool] = Field(
+        default=None,
+        description="是否记录完整请求/响应载荷，未设置时由档位决定"
+    )
+    LOG_STREAM_CHUNKS: Optional[bool] = Field(
+        default=None,
+        description="是否逐块记录流式输出，未设置时由档位决定"
+    )
+    LOG_PAYLOAD_MAX_CHARS: int = 2000
+    LOG_SAMPLE_RATE: float = Field(
+        default=1.0,
+        description="按请求采样记录载荷的比例（0~1）"
+    )
+    
     # 安全配置
     SECRET_KEY: str = "your-secret-key-here"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60
@@ -40,12 +60,171 @@ class Settings(BaseSettings):
     REDIS_DB: int = 0
     REDIS_PASSWORD: Optional[str] = None
     CHAT_HISTORY_EXPIRE: int = 3600
+    CHAT_HISTORY_MAX_TURNS: int = Field(
+        default=50,
+        description="每个对话保留的最大轮数（一问一答为一轮）"
+    )
+    HISTORY_CACHE_ENABLED: bool = Field(
+        default=True,
+        description="在进程内缓存热点对话历史，每次读取只校验Redis中的版本号"
+    )
+    HISTORY_CACHE_TTL: float = 300.0
+    HISTORY_CACHE_MAX_ENTRIES: int = 10000
+    HISTORY_CACHE_MAX_BYTES: int = Field(
+        default=64 * 1024 * 1024,
+        description="历史缓存的估算内存上限（字节），超出后淘汰最久未用的对话"
+    )
+    WS_HISTORY_FLUSH_INTERVAL: float = Field(
+        default=10.0,
+        description="WebSocket 会话把内存中的新对话写入Redis的间隔（秒），断开时也会写入"
+    )
+    HISTORY_COMPRESSION: str = Field(
+        default="zlib",
+        description="历史记录压缩方式：zstd（需安装zstandard）、zlib 或 none"
+    )
+    HISTORY_COMPRESS_MIN_BYTES: int = Field(
+        default=512,
+        description="编码后超过该字节数的历史值才压缩"
+    )
+    REDIS_MAX_CONNECTIONS: int = 50
+    REDIS_SOCKET_TIMEOUT: float = 2.0
+    REDIS_CONNECT_TIMEOUT: float = 2.0
+    REDIS_RETRY_INTERVAL: float = Field(
+        default=30.0,
+        description="Redis连接失败后暂停重试的秒数"
+    )
+    
+    # 上下文窗口配置
+    CONTEXT_SUMMARY_ENABLED: bool = Field(
+        default=True,
+        description="是否在后台把超出预算的旧对话压缩为摘要"
+    )
+    CONTEXT_SUMMARY_MAX_INPUT_TOKENS: int = 4000
+    
+    # 响应缓存配置（默认关闭，按模型的 cacheable 标记生效）
+    RESPONSE_CACHE_ENABLED: bool = False
+    RESPONSE_CACHE_MAX_ENTRIES: int = 1024
+    RESPONSE_CACHE_TTL: int = 300
+    
+    # 单轮请求的语义缓存（近似重复的问题直接返回缓存回复，需要 numpy）
+    SEMANTIC_CACHE_ENABLED: bool = False
+    SEMANTIC_CACHE_THRESHOLD: float = Field(
+        default=0.92,
+        description="余弦相似度达到该值视为命中"
+    )
+    SEMANTIC_CACHE_DIM: int = 256
+    SEMANTIC_CACHE_MAX_ENTRIES: int = Field(
+        default=20000,
+        description="每个模型的最大条目数，超出后淘汰过期或最久未命中的条目"
+    )
+    SEMANTIC_CACHE_TTL: int = 86400
+    SEMANTIC_CACHE_PERSIST: str = Field(
+        default="",
+        description="快照方式：空（不持久化）、disk 或 redis，启动时载入、关闭时写出"
+    )
+    SEMANTIC_CACHE_PERSIST_PATH: str = "data/semantic_cache"
+    
+    # 合并相同的并发请求
+    SINGLE_FLIGHT_ENABLED: bool = True
+    SINGLE_FLIGHT_TIMEOUT: float = Field(
+        default=60.0,
+        description="等待共享上游调用的超时时间（秒）"
+    )
+    
+    # 上游并发限制与过载保护
+    PROVIDER_MAX_CONCURRENCY: Dict[str, int] = Field(
+        default={"tongyi": 64, "baichuan": 32},
+        description="每个提供商同时进行的上游调用上限"
+    )
+    UPSTREAM_MAX_QUEUE: int = Field(
+        default=128,
+        description="每个限流器的最大排队数，超出后直接返回429"
+    )
+    UPSTREAM_QUEUE_TIMEOUT: float = Field(
+        default=5.0,
+        description="排队等待上游并发名额的最长时间（秒）"
+    )
+    OVERLOAD_RETRY_AFTER: int = 2
+    
+    # 上游重试
+    RETRY_MAX_ATTEMPTS: int = Field(
+        default=3,
+        description="每次上游调用的最大尝试次数（含首次）"
+    )
+    RETRY_BASE_DELAY: float = 0.2
+    RETRY_MAX_DELAY: float = Field(
+        default=5.0,
+        description="单次退避的最长等待（秒），Retry-After 超过该值时不再重试"
+    )
+    RETRY_BUDGET_RATIO: float = Field(
+        default=0.1,
+        description="重试预算：重试次数不超过请求数的该比例"
+    )
+    RETRY_BUDGET_MIN_PER_SECOND: float = 1.0
+    RETRY_BUDGET_BURST: float = 10.0
+    
+    # 批量接口
+    BATCH_MAX_ITEMS: int = 1000
+    BATCH_PROVIDER_CONCURRENCY: int = Field(
+        default=8,
+        description="单个批量请求内每个提供商同时处理的条目数"
+    )
+    BATCH_QUEUE_TIMEOUT: float = Field(
+        default=300.0,
+        description="批量条目排队等待上游并发名额的最长时间（秒），超过后该条返回429"
+    )
+    
+    # 模型降级与对冲请求
+    FALLBACK_ENABLED: bool = True
+    HEDGING_ENABLED: bool = Field(
+        default=True,
+        description="主模型超过 hedge_after 仍未响应时并行请求备用模型"
+    )
+    
+    # 上游健康探测与熔断
+    HEALTH_PROBE_ENABLED: bool = True
+    HEALTH_PROBE_INTERVAL: float = Field(
+        default=30.0,
+        description="后台健康探测间隔（秒）"
+    )
+    HEALTH_PROBE_TIMEOUT: float = 5.0
+    CIRCUIT_WINDOW: int = Field(
+        default=20,
+        description="熔断器统计的最近调用数"
+    )
+    CIRCUIT_MIN_CALLS: int = 10
+    CIRCUIT_FAILURE_RATE: float = Field(
+        default=0.5,
+        description="窗口内失败（含慢调用）比例达到该值时熔断"
+    )
+    CIRCUIT_SLOW_CALL_SECONDS: float = Field(
+        default=20.0,
+        description="流式调用首token时间超过该值时计为失败（非流式调用只由超时判断）"
+    )
+    CIRCUIT_OPEN_SECONDS: float = Field(
+        default=30.0,
+        description="熔断后多久放行试探请求（秒）"
+    )
     
     # 百川配置
     BAICHUAN_API_KEY: Optional[str] = None
     BAICHUAN_SECRET_KEY: Optional[str] = None
     BAICHUAN_BASE_URL: str = "https://api.baichuan-ai.com/v1"
     
+    # 启动时导入并创建所有提供商（预热连接池）
+    PROVIDERS_PRELOAD: bool = True
+    
+    # 上游HTTP连接池配置
+    HTTP_TIMEOUT: float = 30.0
+    HTTP_CONNECT_TIMEOUT: float = 5.0
+    HTTP_MAX_CONNECTIONS: int = 100
+    HTTP_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    HTTP_KEEPALIVE_EXPIRY: float = 30.0
+    HTTP2_ENABLED: bool = Field(
+        default=False,
+        description="是否启用HTTP/2（需要安装h2）"
+    )
+    
     # 使用新的配置方式
     model_config = SettingsConfigDict(
         env_file=".env",
@@ -75,6 +254,8 @@ class Settings(BaseSettings):
             },
             EnvironmentType.VERCEL: {
                 "REDIS_ENABLED": False,  # Vercel 环境禁用 Redis
+                "HEALTH_PROBE_ENABLED": False,  # 无常驻进程，不做后台探测
+                "PROVIDERS_PRELOAD": False,  # 冷启动时不加载提供商模块
             }
         }
         
@@ -1,4 +1,4 @@
-from typing import Dict, Optional
+from typing import Dict, List, Optional
 
 class ModelMapping:
     # 内部模型ID到实际模型信息的映射
@@ -7,33 +7,89 @@ class ModelMapping:
             "provider": "tongyi",
             "model_id": "qwen-plus",
             "name": "通义千问Plus",
-            "description": "通义千问大模型"
+            "description": "通义千问大模型",
+            "context_tokens": 8000,
+            "cacheable": True
         },
         "model_002": {
             "provider": "tongyi",
             "model_id": "qwen-max",
             "name": "通义千问Max",
-            "description": "通义千问大模型"
+            "description": "通义千问大模型",
+            "context_tokens": 6000,
+            "cacheable": False,
+            "max_concurrency": 16,
+            # 暂时性错误、过载或熔断时依次降级；流式超过 hedge_after 秒未出首token时并行请求下一个。
+            # 非流式的总耗时随回复长度增长，需要对冲时另配 hedge_after_chat（未配置则不对冲）
+            "fallbacks": ["model_001", "model_004"],
+            "hedge_after": 3.0
         },
         "model_003": {
             "provider": "baichuan",
             "model_id": "Baichuan2-53B",
             "name": "百川大模型",
-            "description": "百川智能开发的大语言模型"
+            "description": "百川智能开发的大语言模型",
+            "context_tokens": 3000,
+            "cacheable": False,
+            "max_concurrency": 16,
+            "fallbacks": ["model_004"],
+            "hedge_after": 3.0
         },
         "model_004": {
             "provider": "baichuan",
             "model_id": "Baichuan2-Turbo",
             "name": "百川Turbo",
-            "description": "百川智能开发的对话模型"
+            "description": "百川智能开发的对话模型",
+            "context_tokens": 3000,
+            "cacheable": True
         }
     }
 
+    # 未配置 context_tokens 时的默认上下文预算（估算token数）
+    DEFAULT_CONTEXT_TOKENS = 4000
+
+    # 用于压缩旧对话生成滚动摘要的低成本模型
+    SUMMARY_MODEL = "model_004"
+
     @classmethod
     def get_model_info(cls, internal_id: str) -> Optional[Dict]:
         """获取模型信息"""
         return cls.MODEL_MAP.get(internal_id)
 
+    @classmethod
+    def get_context_budget(cls, internal_id: str) -> int:
+        """获取模型的上下文token预算"""
+        info = cls.MODEL_MAP.get(internal_id) or {}
+        return info.get("context_tokens", cls.DEFAULT_CONTEXT_TOKENS)
+
+    @classmethod
+    def is_cacheable(cls, internal_id: str) -> bool:
+        """模型的响应是否允许缓存（偏创作类的模型不缓存）"""
+        info = cls.MODEL_MAP.get(internal_id) or {}
+        return info.get("cacheable", False)
+
+    @classmethod
+    def get_max_concurrency(cls, internal_id: str) -> Optional[int]:
+        """模型级并发上限，未配置时只受提供商上限约束"""
+        info = cls.MODEL_MAP.get(internal_id) or {}
+        return info.get("max_concurrency")
+
+    @classmethod
+    def get_fallback_chain(cls, internal_id: str) -> List[str]:
+        """获取降级链：首项为请求的模型，其后为按顺序尝试的备用模型"""
+        info = cls.MODEL_MAP.get(internal_id) or {}
+        chain = [internal_id]
+        for fallback in info.get("fallbacks", []):
+            if fallback in cls.MODEL_MAP and fallback not in chain:
+                chain.append(fallback)
+        return chain
+
+    @classmethod
+    def get_hedge_after(cls, internal_id: str, streaming: bool = True) -> Optional[float]:
+        """对冲阈值（秒）：流式为首token时间，非流式为整个回复的耗时；未配置时只在出错后降级"""
+        info = cls.MODEL_MAP.get(internal_id) or {}
+        return info.get("hedge_after" if streaming else "hedge_after_chat")
+
     @classmethod
     def get_system_prompt(cls, internal_id: str) -> Optional[str]:
         """获取模型特定的系统提示语"""
@@ -1,23 +1,50 @@
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
-from fastapi.openapi.docs import get_swagger_ui_html
-from fastapi.openapi.utils import get_openapi
+from fastapi.responses import JSONResponse, Response
 import logging
+import time
 from .core.config import settings
 from .api.chat import router as chat_router
+from .providers.factory import ProviderFactory
+from .utils.redis_helper import redis_client
+from .utils.context_manager import context_manager
+from .utils.semantic_cache import semantic_cache
+from .utils.log_helper import configure_logging
+from .utils.json_helper import FastJSONResponse
+from .utils.concurrency import OverloadedError
+from .utils.circuit_breaker import CircuitOpenError
+from .utils.health import health_prober
+from .utils import metrics
 
 # 配置日志
-logging.basicConfig(level=logging.INFO)
+configure_logging()
 logger = logging.getLogger(__name__)
 
 app = FastAPI(
     title=settings.PROJECT_NAME,
     openapi_url=f"{settings.API_V1_STR}/openapi.json",
+    default_response_class=FastJSONResponse,  # 安装 orjson 时使用更快的序列化
     docs_url=None,  # 禁用默认的文档路由
     redoc_url=None  # 禁用默认的 redoc 路由
 )
 
+# 生命周期：启动时打开上游连接池，关闭时释放
+@app.on_event("startup")
+async def startup_event():
+    # Serverless 环境不预热提供商，首次使用时再导入和创建
+    if settings.PROVIDERS_PRELOAD:
+        await ProviderFactory.startup()
+    health_prober.start()
+    await semantic_cache.load()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await health_prober.stop()
+    await context_manager.shutdown()
+    await semantic_cache.save()
+    await ProviderFactory.shutdown()
+    await redis_client.close()
+
 # 配置CORS
 app.add_middleware(
     CORSMiddleware,
@@ -37,6 +64,8 @@ app.include_router(
 # 自定义文档路由
 @app.get(f"{settings.API_V1_STR}/docs", include_in_schema=False)
 async def custom_swagger_ui_html():
+    # 文档相关模块只在访问文档时导入，不计入冷启动
+    from fastapi.openapi.docs import get_swagger_ui_html
     return get_swagger_ui_html(
         openapi_url=f"{settings.API_V1_STR}/openapi.json",
         title=f"{settings.PROJECT_NAME} - Swagger UI"
@@ -46,6 +75,8 @@ async def custom_swagger_ui_html():
 async def get_custom_openapi():
     if app.openapi_schema:
         return app.openapi_schema
+    # 首次请求时才生成 schema
+    from fastapi.openapi.utils import get_openapi
     openapi_schema = get_openapi(
         title=settings.PROJECT_NAME,
         version="1.0.0",
@@ -55,9 +86,30 @@ async def get_custom_openapi():
     app.openapi_schema = openapi_schema
     return app.openapi_schema
 
+# 上游过载：快速失败并提示客户端稍后重试
+@app.exception_handler(OverloadedError)
+async def overloaded_exception_handler(request: Request, exc: OverloadedError):
+    logger.warning(f"Load shed: {str(exc)}")
+    return JSONResponse(
+        status_code=429,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(exc.retry_after)}
+    )
+
+# 上游已熔断：不再转发请求，提示客户端稍后重试
+@app.exception_handler(CircuitOpenError)
+async def circuit_open_exception_handler(request: Request, exc: CircuitOpenError):
+    logger.warning(f"Circuit open: {str(exc)}")
+    return JSONResponse(
+        status_code=503,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(exc.retry_after)}
+    )
+
 # 全局错误处理
 @app.exception_handler(Exception)
 async def global_exception_handler(request: Request, exc: Exception):
+    metrics.record_error(exc)
     logger.error(f"Global error handler caught: {str(exc)}", exc_info=True)
     return JSONResponse(
         status_code=500,
@@ -67,13 +119,25 @@ async def global_exception_handler(request: Request, exc: Exception):
 # 请求日志中间件
 @app.middleware("http")
 async def log_requests(request: Request, call_next):
-    logger.info(f"Request path: {request.url.path}")
+    logger.debug("Request path: %s", request.url.path)
+    started = time.perf_counter()
+    status = 500
     try:
         response = await call_next(request)
+        status = response.status_code
         return response
     except Exception as e:
         logger.error(f"Request failed: {str(e)}", exc_info=True)
         raise
+    finally:
+        # 按路由模板而不是原始路径统计，避免标签基数膨胀
+        route = request.scope.get("route")
+        metrics.observe_http(
+            getattr(route, "path", "unmatched"),
+            request.method,
+            status,
+            time.perf_counter() - started
+        )
 
 @app.get("/health")
 async def health_check():
@@ -82,3 +146,20 @@ async def health_check():
         "environment": settings.ENVIRONMENT,
         "version": "1.0.0"
     }
+
+@app.get("/health/providers")
+async def provider_health():
+    """各提供商的缓存探测结果和熔断器状态（由后台探测器更新，不访问上游）"""
+    providers = health_prober.snapshot()
+    healthy = all(p["healthy"] is not False and p["circuit"] != "open" for p in providers.values())
+    return {
+        "status": "ok" if healthy else "degraded",
+        "providers": providers
+    }
+
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    """Prometheus 指标"""
+    body, content_type = metrics.render_metrics()
+    # CONTENT_TYPE_LATEST 已带 charset，用 media_type 会再追加一次
+    return Response(content=body, headers={"Content-Type": content_type})
@@ -5,8 +5,13 @@ class ChatRequest(BaseModel):
     content: str = Field(..., description="用户输入的内容")
     provider_id: str = Field(..., description="内部模型ID")
     request_id: Optional[str] = Field(None, description="对话ID，用于继续对话")
+    no_cache: bool = Field(False, description="是否跳过响应缓存")
+
+class BatchChatRequest(BaseModel):
+    items: List[ChatRequest] = Field(..., min_length=1, description="批量对话请求，结果按完成顺序以NDJSON返回")
 
 class ChatResponse(BaseModel):
     code: int = Field(200, description="状态码")
     response: str = Field(..., description="AI回复内容")
-    request_id: str = Field(..., description="对话ID") 
\ No newline at end of file
+    request_id: str = Field(..., description="对话ID")
+    model: Optional[str] = Field(None, description="实际提供服务的内部模型ID（降级时与请求的模型不同）") 
\ No newline at end of file
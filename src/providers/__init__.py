@@ -1,2 +1,16 @@
-from .base import BaseProvider
-from .tongyi import TongyiProvider 
\ No newline at end of file
+import importlib
+
+# 按需导入，避免 import src.providers 时加载 httpx 和全部适配器
+_EXPORTS = {
+    "BaseProvider": ".base",
+    "TongyiProvider": ".tongyi",
+    "BaichuanProvider": ".baichuan",
+}
+
+__all__ = list(_EXPORTS)
+
+def __getattr__(name: str):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    return getattr(importlib.import_module(module, __name__), name)
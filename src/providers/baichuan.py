@@ -1,12 +1,14 @@
-from typing import List, Dict, Any
+from typing import List, Dict, Any, AsyncGenerator
 import httpx
-import json
 import time
 import hmac
 import hashlib
 import base64
-from .base import BaseProvider, ProviderResponse
+from .base import BaseProvider, ProviderResponse, StreamResponse
+from .sse import iter_chat_chunks
 from ..core.config import settings
+from ..utils.log_helper import LazyJson
+from ..utils.retry import call_with_retry, stream_with_retry
 import logging
 from fastapi import HTTPException
 
@@ -39,58 +41,108 @@ class BaichuanProvider(BaseProvider):
             hashlib.sha256
         ).digest()
         return base64.b64encode(signature).decode('utf-8')
+
+    def _build_headers(self) -> Dict[str, str]:
+        """构造带签名的请求头"""
+        timestamp = int(time.time())
+        return {
+            "Authorization": f"Bearer {self.api_key}",
+            "X-BC-Timestamp": str(timestamp),
+            "X-BC-Signature": self._generate_signature(timestamp),
+            "X-BC-Sign-Algo": "hmac_sha256",
+            "Content-Type": "application/json"
+        }
     
     async def chat(self, messages: List[Dict[str, str]], model_id: str) -> ProviderResponse:
         """实现对话功能"""
         try:
-            timestamp = int(time.time())
-            signature = self._generate_signature(timestamp)
-            
             request_data = {
                 "model": model_id,
                 "messages": messages,
                 "parameters": self.get_model_params(model_id)
             }
             
-            logger.debug(f"Request to Baichuan API: {json.dumps(request_data, ensure_ascii=False, indent=2)}")
+            logger.debug("Request to Baichuan API: %s", LazyJson(request_data))
             
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                response = await client.post(
+            async def send() -> httpx.Response:
+                # 每次尝试重新签名，避免时间戳过期
+                response = await self.client.post(
                     f"{self.base_url}/chat/completions",
-                    headers={
-                        "Authorization": f"Bearer {self.api_key}",
-                        "X-BC-Timestamp": str(timestamp),
-                        "X-BC-Signature": signature,
-                        "X-BC-Sign-Algo": "hmac_sha256",
-                        "Content-Type": "application/json"
-                    },
+                    headers=self._build_headers(),
                     json=request_data
                 )
                 response.raise_for_status()
-                result = response.json()
-                
-                logger.debug(f"Response from Baichuan API: {json.dumps(result, ensure_ascii=False, indent=2)}")
-                
-                if "data" not in result or "messages" not in result["data"]:
-                    raise ValueError("Invalid response format")
-                
-                content = result["data"]["messages"][0]["content"]
-                return ProviderResponse(content=content, raw_response=result)
-                
+                return response
+
+            # 网络错误、429 和 5xx 在重试预算内退避重试
+            response = await call_with_retry(send)
+            result = response.json()
+            
+            logger.debug("Response from Baichuan API: %s", LazyJson(result))
+            
+            if "data" not in result or "messages" not in result["data"]:
+                raise ValueError("Invalid response format")
+            
+            content = result["data"]["messages"][0]["content"]
+            return ProviderResponse(content=content, raw_response=result)
+            
         except httpx.HTTPError as e:
             logger.error(f"HTTP error occurred: {str(e)}", exc_info=True)
-            raise HTTPException(status_code=500, detail=f"API request failed: {str(e)}")
+            raise HTTPException(status_code=500, detail=f"API request failed: {str(e)}") from e
         except Exception as e:
             logger.error(f"Unexpected error: {str(e)}", exc_info=True)
-            raise HTTPException(status_code=500, detail=f"Unexpected error: {str(e)}")
+            raise HTTPException(status_code=500, detail=f"Unexpected error: {str(e)}") from e
     
     async def check_health(self) -> bool:
-        """健康检查"""
+        """健康检查：请求模型列表，不产生对话费用"""
         try:
-            result = await self.chat([{
-                "role": "user",
-                "content": "你好"
-            }], "Baichuan2-53B")
-            return bool(result.content)
-        except Exception:
-            return False 
\ No newline at end of file
+            response = await self.client.get(
+                f"{self.base_url}/models",
+                headers=self._build_headers(),
+                timeout=settings.HEALTH_PROBE_TIMEOUT
+            )
+            return response.is_success
+        except httpx.HTTPError as e:
+            logger.warning(f"Health check failed: {str(e)}")
+            return False
+
+    async def _open_stream(self, request_data: Dict[str, Any]) -> AsyncGenerator[StreamResponse, None]:
+        """发起一次流式请求并逐块解析"""
+        async with self.client.stream(
+            "POST",
+            f"{self.base_url}/chat/completions",
+            headers=self._build_headers(),
+            json=request_data
+        ) as response:
+            response.raise_for_status()
+            async for chunk in iter_chat_chunks(response):
+                yield chunk
+
+    async def stream_chat(
+        self,
+        messages: List[Dict[str, str]],
+        model_id: str
+    ) -> AsyncGenerator[StreamResponse, None]:
+        """实现流式对话（SSE）"""
+        try:
+            request_data = {
+                "model": model_id,
+                "messages": messages,
+                "stream": True,
+                **self.get_model_params(model_id)
+            }
+
+            logger.debug("Stream request data: %s", LazyJson(request_data))
+
+            # 只在首块之前重试，已输出的内容不会重复
+            stream = stream_with_retry(lambda: self._open_stream(request_data))
+            try:
+                async for chunk in stream:
+                    yield chunk
+            finally:
+                # 调用方提前关闭时（如客户端断开）立即关闭上游响应
+                await stream.aclose()
+
+        except Exception as e:
+            logger.error(f"Error in stream chat: {str(e)}", exc_info=True)
+            raise
@@ -1,29 +1,86 @@
 from abc import ABC, abstractmethod
 from typing import List, Dict, Any, Optional, AsyncGenerator
+import importlib.util
+import logging
+import httpx
 from pydantic import BaseModel
+from ..core.config import settings
+
+logger = logging.getLogger(__name__)
 
 class ProviderResponse(BaseModel):
     """统一的提供商响应格式"""
     content: str
     raw_response: Dict[str, Any]
 
-class StreamResponse(BaseModel):
-    """流式响应格式"""
-    content: str
-    done: bool = False
+class StreamResponse:
+    """流式响应格式
+
+    逐token创建，使用 __slots__ 的轻量对象而不是 pydantic 模型，避免每块的校验开销。
+    """
+
+    __slots__ = ("content", "done")
+
+    def __init__(self, content: str, done: bool = False):
+        self.content = content
+        self.done = done
+
+    def __repr__(self) -> str:
+        return f"StreamResponse(content={self.content!r}, done={self.done!r})"
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, StreamResponse):
+            return NotImplemented
+        return self.content == other.content and self.done == other.done
+
+def create_http_client() -> httpx.AsyncClient:
+    """创建带连接池和keep-alive的共享HTTP客户端"""
+    http2 = settings.HTTP2_ENABLED
+    if http2 and importlib.util.find_spec("h2") is None:
+        logger.warning("HTTP2_ENABLED is set but h2 is not installed, falling back to HTTP/1.1")
+        http2 = False
+
+    return httpx.AsyncClient(
+        timeout=httpx.Timeout(settings.HTTP_TIMEOUT, connect=settings.HTTP_CONNECT_TIMEOUT),
+        limits=httpx.Limits(
+            max_connections=settings.HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=settings.HTTP_KEEPALIVE_EXPIRY,
+        ),
+        http2=http2,
+    )
 
 class BaseProvider(ABC):
     """AI提供商基础接口类"""
-    
+
+    _client: Optional[httpx.AsyncClient] = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """获取共享HTTP客户端，未启动时懒加载"""
+        if self._client is None or self._client.is_closed:
+            self._client = create_http_client()
+        return self._client
+
+    async def startup(self) -> None:
+        """打开共享HTTP客户端"""
+        _ = self.client
+
+    async def aclose(self) -> None:
+        """关闭共享HTTP客户端"""
+        if self._client is not None and not self._client.is_closed:
+            await self._client.aclose()
+        self._client = None
+
     @abstractmethod
     async def chat(self, messages: List[Dict[str, str]], model_id: str) -> ProviderResponse:
         """聊天接口"""
         pass
-    
+
     @abstractmethod
     async def check_health(self) -> bool:
         """健康检查"""
-        pass 
+        pass
 
     @abstractmethod
     def get_model_params(self, model_id: str) -> Dict[str, Any]:
@@ -32,8 +89,8 @@ class BaseProvider(ABC):
 
     @abstractmethod
     async def stream_chat(
-        self, 
-        messages: List[Dict[str, str]], 
+        self,
+        messages: List[Dict[str, str]],
         model_id: str
     ) -> AsyncGenerator[StreamResponse, None]:
         """流式聊天接口"""
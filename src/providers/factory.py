@@ -1,27 +1,68 @@
-from typing import Dict, Type
-from .base import BaseProvider
-from .tongyi import TongyiProvider
-from .baichuan import BaichuanProvider
+from typing import TYPE_CHECKING, Dict, Type
+import importlib
+import logging
+
+if TYPE_CHECKING:
+    from .base import BaseProvider
+
+logger = logging.getLogger(__name__)
 
 class ProviderFactory:
     """AI提供商工厂"""
-    
-    _providers: Dict[str, Type[BaseProvider]] = {
-        "tongyi": TongyiProvider,
-        "baichuan": BaichuanProvider,
+
+    # 提供商模块在首次使用时才导入（"模块:类名"），冷启动不加载 httpx 和各适配器
+    _providers: Dict[str, str] = {
+        "tongyi": ".tongyi:TongyiProvider",
+        "baichuan": ".baichuan:BaichuanProvider",
         # 后续可以添加其他提供商
-        # "openai": OpenAIProvider,
+        # "openai": ".openai:OpenAIProvider",
     }
-    
+
+    # 进程内共享的提供商单例
+    _instances: Dict[str, "BaseProvider"] = {}
+
     @classmethod
-    def create(cls, provider_type: str) -> BaseProvider:
-        """创建提供商实例"""
-        provider_class = cls._providers.get(provider_type)
-        if not provider_class:
+    def _load_class(cls, provider_type: str) -> Type["BaseProvider"]:
+        path = cls._providers.get(provider_type)
+        if not path:
             raise ValueError(f"Unknown provider type: {provider_type}")
-        return provider_class()
+        module_name, class_name = path.split(":")
+        module = importlib.import_module(module_name, __package__)
+        return getattr(module, class_name)
+
+    @classmethod
+    def create(cls, provider_type: str) -> "BaseProvider":
+        """获取提供商实例（进程内单例）"""
+        instance = cls._instances.get(provider_type)
+        if instance is not None:
+            return instance
+
+        instance = cls._load_class(provider_type)()
+        cls._instances[provider_type] = instance
+        return instance
+
+    @classmethod
+    async def startup(cls) -> None:
+        """应用启动时创建提供商并打开连接池"""
+        for provider_type in cls._providers:
+            try:
+                await cls.create(provider_type).startup()
+                logger.info(f"Provider {provider_type} started")
+            except ValueError as e:
+                # 未配置密钥的提供商跳过，首次使用时再报错
+                logger.warning(f"Provider {provider_type} not started: {str(e)}")
+
+    @classmethod
+    async def shutdown(cls) -> None:
+        """应用关闭时释放所有连接池"""
+        for provider_type, instance in list(cls._instances.items()):
+            try:
+                await instance.aclose()
+            except Exception as e:
+                logger.warning(f"Error closing provider {provider_type}: {str(e)}")
+        cls._instances.clear()
 
     @classmethod
     def get_available_providers(cls) -> list:
         """获取可用的提供商列表"""
-        return list(cls._providers.keys()) 
\ No newline at end of file
+        return list(cls._providers.keys())
@@ -0,0 +1,96 @@
+import logging
+from typing import AsyncIterator, List, Optional
+import httpx
+from .base import StreamResponse
+from ..utils.json_helper import loads, JSONDecodeError
+from ..utils.log_helper import LazyJson, chunk_logging
+
+logger = logging.getLogger(__name__)
+
+DONE_MARKER = b"[DONE]"
+
+class SSEDecoder:
+    """字节级增量SSE解析器
+
+    直接处理 aiter_bytes() 的原始分块：跨分块的半帧留在缓冲区，
+    多行 data 字段按规范用换行拼接，注释行和其他字段忽略。
+    """
+
+    __slots__ = ("_buffer",)
+
+    def __init__(self):
+        self._buffer = b""
+
+    def feed(self, chunk: bytes) -> List[bytes]:
+        """输入一个分块，返回其中完整事件的 data 内容"""
+        buffer = self._buffer + chunk if self._buffer else chunk
+        if b"\r" in buffer:
+            buffer = buffer.replace(b"\r\n", b"\n")
+
+        events = []
+        start = 0
+        while True:
+            end = buffer.find(b"\n\n", start)
+            if end < 0:
+                break
+            data = self._parse_event(buffer[start:end])
+            if data is not None:
+                events.append(data)
+            start = end + 2
+
+        self._buffer = buffer[start:]
+        return events
+
+    def flush(self) -> List[bytes]:
+        """流结束时处理缓冲区里没有以空行结尾的最后一个事件"""
+        buffer, self._buffer = self._buffer, b""
+        data = self._parse_event(buffer.strip(b"\n")) if buffer.strip() else None
+        return [data] if data is not None else []
+
+    @staticmethod
+    def _parse_event(block: bytes) -> Optional[bytes]:
+        # 快速路径：最常见的单行 data 事件
+        if block.startswith(b"data:") and b"\n" not in block:
+            value = block[5:]
+            return value[1:] if value.startswith(b" ") else value
+
+        lines = []
+        for line in block.split(b"\n"):
+            if line.startswith(b"data:"):
+                value = line[5:]
+                lines.append(value[1:] if value.startswith(b" ") else value)
+        return b"\n".join(lines) if lines else None
+
+async def iter_sse_data(response: httpx.Response) -> AsyncIterator[bytes]:
+    """逐个产出SSE事件的 data 内容"""
+    decoder = SSEDecoder()
+    async for chunk in response.aiter_bytes():
+        for data in decoder.feed(chunk):
+            yield data
+    for data in decoder.flush():
+        yield data
+
+async def iter_chat_chunks(response: httpx.Response) -> AsyncIterator[StreamResponse]:
+    """解析 OpenAI 兼容格式的流式响应（choices[0].delta），供各提供商共用"""
+    log_chunks = chunk_logging(logger)
+    async for data in iter_sse_data(response):
+        if data == DONE_MARKER:
+            break
+        if not data:
+            continue
+        try:
+            event = loads(data)
+        except JSONDecodeError as e:
+            logger.error("Failed to parse stream data: %.200s, error: %s", data, e)
+            continue
+        if log_chunks:
+            logger.debug("Received stream data: %s", LazyJson(event))
+
+        choices = event.get("choices")
+        if not choices:
+            continue
+        choice = choices[0]
+        delta = choice.get("delta")
+        content = delta.get("content") if delta else None
+        if content:
+            yield StreamResponse(content, choice.get("finish_reason") is not None)
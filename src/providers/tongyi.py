@@ -1,8 +1,10 @@
 from typing import List, Dict, Any, AsyncGenerator
 import httpx
-import json
 from .base import BaseProvider, ProviderResponse, StreamResponse
+from .sse import iter_chat_chunks
 from ..core.config import settings
+from ..utils.log_helper import LazyJson
+from ..utils.retry import call_with_retry, stream_with_retry
 import logging
 from fastapi import HTTPException
 
@@ -37,10 +39,10 @@ class TongyiProvider(BaseProvider):
                 "parameters": self.get_model_params(model_id)
             }
             
-            logger.debug(f"Request to Tongyi API: {json.dumps(request_data, ensure_ascii=False, indent=2)}")
+            logger.debug("Request to Tongyi API: %s", LazyJson(request_data))
             
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                response = await client.post(
+            async def send() -> httpx.Response:
+                response = await self.client.post(
                     f"{self.base_url}/services/aigc/text-generation/generation",
                     headers={
                         "Authorization": f"Bearer {self.api_key}",
@@ -49,34 +51,55 @@ class TongyiProvider(BaseProvider):
                     json=request_data
                 )
                 response.raise_for_status()
-                result = response.json()
-                
-                logger.debug(f"Response from Tongyi API: {json.dumps(result, ensure_ascii=False, indent=2)}")
-                
-                if "output" not in result or "choices" not in result["output"]:
-                    raise ValueError("Invalid response format")
-                
-                content = result["output"]["choices"][0]["message"]["content"]
-                return ProviderResponse(content=content, raw_response=result)
-                
+                return response
+
+            # 网络错误、429 和 5xx 在重试预算内退避重试
+            response = await call_with_retry(send)
+            result = response.json()
+            
+            logger.debug("Response from Tongyi API: %s", LazyJson(result))
+            
+            if "output" not in result or "choices" not in result["output"]:
+                raise ValueError("Invalid response format")
+            
+            content = result["output"]["choices"][0]["message"]["content"]
+            return ProviderResponse(content=content, raw_response=result)
+            
         except httpx.HTTPError as e:
             logger.error(f"HTTP error occurred: {str(e)}", exc_info=True)
-            raise HTTPException(status_code=500, detail=f"API request failed: {str(e)}")
+            raise HTTPException(status_code=500, detail=f"API request failed: {str(e)}") from e
         except Exception as e:
             logger.error(f"Unexpected error: {str(e)}", exc_info=True)
-            raise HTTPException(status_code=500, detail=f"Unexpected error: {str(e)}")
+            raise HTTPException(status_code=500, detail=f"Unexpected error: {str(e)}") from e
     
     async def check_health(self) -> bool:
-        """健康检查"""
+        """健康检查：请求模型列表，不产生对话费用"""
         try:
-            result = await self.chat([{
-                "role": "user",
-                "content": "你好"
-            }], "qwen-plus")
-            return bool(result.content)
-        except Exception:
-            return False 
-    
+            response = await self.client.get(
+                f"{settings.TONGYI_COMPATIBLE_URL}/models",
+                headers={"Authorization": f"Bearer {self.api_key}"},
+                timeout=settings.HEALTH_PROBE_TIMEOUT
+            )
+            return response.is_success
+        except httpx.HTTPError as e:
+            logger.warning(f"Health check failed: {str(e)}")
+            return False
+
+    async def _open_stream(self, request_data: Dict[str, Any]) -> AsyncGenerator[StreamResponse, None]:
+        """发起一次流式请求并逐块解析"""
+        async with self.client.stream(
+            "POST",
+            self.compatible_url,
+            headers={
+                "Authorization": f"Bearer {self.api_key}",
+                "Content-Type": "application/json",
+            },
+            json=request_data
+        ) as response:
+            response.raise_for_status()
+            async for chunk in iter_chat_chunks(response):
+                yield chunk
+
     async def stream_chat(
         self, 
         messages: List[Dict[str, str]], 
@@ -93,46 +116,17 @@ class TongyiProvider(BaseProvider):
                 }
             }
             
-            logger.info(f"Stream request data: {json.dumps(request_data, ensure_ascii=False, indent=2)}")
+            logger.debug("Stream request data: %s", LazyJson(request_data))
             
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                async with client.stream(
-                    "POST",
-                    self.compatible_url,
-                    headers={
-                        "Authorization": f"Bearer {self.api_key}",
-                        "Content-Type": "application/json",
-                    },
-                    json=request_data
-                ) as response:
-                    response.raise_for_status()
-                    async for line in response.aiter_lines():
-                        if line.strip():
-                            try:
-                                # 处理 SSE 格式数据
-                                if line.startswith('data: '):
-                                    line = line[6:]  # 移除 'data: ' 前缀
-                                if line == '[DONE]':
-                                    continue
-                                    
-                                data = json.loads(line)
-                                logger.debug(f"Received stream data: {json.dumps(data, ensure_ascii=False)}")
-                                
-                                if "choices" in data and data["choices"]:
-                                    delta = data["choices"][0].get("delta", {})
-                                    content = delta.get("content", "")
-                                    done = data["choices"][0].get("finish_reason") is not None
-                                    
-                                    if content:  # 只在有内容时才yield
-                                        yield StreamResponse(
-                                            content=content,
-                                            done=done
-                                        )
-                                    
-                            except json.JSONDecodeError as e:
-                                logger.error(f"Failed to parse stream data: {line}, error: {str(e)}")
-                                continue
-                                
+            # 只在首块之前重试，已输出的内容不会重复
+            stream = stream_with_retry(lambda: self._open_stream(request_data))
+            try:
+                async for chunk in stream:
+                    yield chunk
+            finally:
+                # 调用方提前关闭时（如客户端断开）立即关闭上游响应
+                await stream.aclose()
+
         except Exception as e:
             logger.error(f"Error in stream chat: {str(e)}", exc_info=True)
             raise 
\ No newline at end of file
@@ -0,0 +1,141 @@
+import logging
+import math
+import time
+from collections import deque
+from typing import Deque, Dict, Optional
+from ..core.config import settings
+from .metrics import CIRCUIT_STATE
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+HALF_OPEN = "half_open"
+OPEN = "open"
+
+_STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+class CircuitOpenError(Exception):
+    """提供商已熔断，请求被直接拒绝"""
+
+    def __init__(self, provider: str, retry_after: int):
+        super().__init__(f"Provider {provider} is temporarily unavailable")
+        self.provider = provider
+        self.retry_after = retry_after
+
+class CircuitBreaker:
+    """按真实流量的失败率和慢调用比例熔断
+
+    closed：正常放行并统计最近 window 次调用；失败比例达到阈值后进入 open。
+    open：直接拒绝，open_seconds 后（或健康探测恢复后）进入 half_open。
+    half_open：只放行一个试探请求，成功则恢复 closed，失败则重新 open。
+    """
+
+    def __init__(
+        self,
+        name: str,
+        window: int,
+        min_calls: int,
+        failure_rate: float,
+        slow_call_seconds: float,
+        open_seconds: float
+    ):
+        self.name = name
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.open_seconds = open_seconds
+        self.state = CLOSED
+        self._outcomes: Deque[bool] = deque(maxlen=window)
+        self._opened_at = 0.0
+        self._trial_started: Optional[float] = None
+        self._gauge = CIRCUIT_STATE.labels(name)
+        self._gauge.set(0)
+
+    def _transition(self, state: str) -> None:
+        if state == self.state:
+            return
+        logger.warning("Circuit breaker %s: %s -> %s", self.name, self.state, state)
+        self.state = state
+        self._gauge.set(_STATE_VALUES[state])
+        self._trial_started = None
+        if state == OPEN:
+            self._opened_at = time.monotonic()
+        else:
+            self._outcomes.clear()
+
+    def allow(self) -> None:
+        """检查是否放行请求，不放行时抛出 CircuitOpenError"""
+        if self.state == CLOSED:
+            return
+        now = time.monotonic()
+        if self.state == OPEN:
+            remaining = self._opened_at + self.open_seconds - now
+            if remaining > 0:
+                raise CircuitOpenError(self.name, max(1, math.ceil(remaining)))
+            self._transition(HALF_OPEN)
+        # 试探请求被取消（例如对冲落败）时不会有结果，超时后允许新的试探
+        if self._trial_started is not None and now - self._trial_started < self.open_seconds:
+            raise CircuitOpenError(self.name, 1)
+        self._trial_started = now
+
+    def release_trial(self) -> None:
+        """放行后的调用被取消、没有结果时调用：half_open 下立即允许新的试探，不必等待超时"""
+        self._trial_started = None
+
+    def record_success(self, latency: Optional[float] = None) -> None:
+        """latency 为流式调用的首token时间；非流式调用的总耗时随回复长度增长，不参与慢调用判断"""
+        if latency is not None and latency >= self.slow_call_seconds:
+            self.record_failure()
+            return
+        if self.state == HALF_OPEN:
+            self._transition(CLOSED)
+        elif self.state == CLOSED:
+            self._outcomes.append(False)
+
+    def record_failure(self) -> None:
+        if self.state == HALF_OPEN:
+            self._transition(OPEN)
+            return
+        if self.state != CLOSED:
+            return
+        self._outcomes.append(True)
+        if len(self._outcomes) >= self.min_calls:
+            if sum(self._outcomes) / len(self._outcomes) >= self.failure_rate:
+                self._transition(OPEN)
+
+    def record_error(self, exc: BaseException) -> None:
+        """按异常类型记录：上游 4xx（429 除外）由请求本身导致，说明提供商仍在正常响应，计为成功；
+        网络错误、超时、429、5xx 以及无法解析的响应体等其他错误计为失败"""
+        # retry 依赖 httpx，到出错时才导入，不计入冷启动
+        from .retry import is_client_error
+        if is_client_error(exc):
+            self.record_success()
+        else:
+            self.record_failure()
+
+    def record_probe(self, healthy: bool) -> None:
+        """健康探测恢复时提前进入 half_open，由真实请求确认是否恢复"""
+        if healthy and self.state == OPEN:
+            self._transition(HALF_OPEN)
+
+class BreakerRegistry:
+    """按提供商管理熔断器"""
+
+    def __init__(self):
+        self._breakers: Dict[str, CircuitBreaker] = {}
+
+    def get(self, provider_type: str) -> CircuitBreaker:
+        breaker = self._breakers.get(provider_type)
+        if breaker is None:
+            breaker = self._breakers[provider_type] = CircuitBreaker(
+                provider_type,
+                window=settings.CIRCUIT_WINDOW,
+                min_calls=settings.CIRCUIT_MIN_CALLS,
+                failure_rate=settings.CIRCUIT_FAILURE_RATE,
+                slow_call_seconds=settings.CIRCUIT_SLOW_CALL_SECONDS,
+                open_seconds=settings.CIRCUIT_OPEN_SECONDS
+            )
+        return breaker
+
+# 全局熔断器
+breakers = BreakerRegistry()
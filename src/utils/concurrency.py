@@ -0,0 +1,153 @@
+import asyncio
+import contextlib
+import logging
+from contextvars import ContextVar
+from typing import Dict, Iterator, List, Optional
+from ..core.config import settings
+from ..core.model_config import ModelMapping
+
+logger = logging.getLogger(__name__)
+
+# 后台任务（批量请求）排队的最长时间；为 None 时按交互请求处理
+_background_timeout: ContextVar[Optional[float]] = ContextVar("background_queue_timeout", default=None)
+
+def background_queue_timeout() -> Optional[float]:
+    """当前上下文的后台排队时间，交互请求返回 None"""
+    return _background_timeout.get()
+
+@contextlib.contextmanager
+def background_queueing(timeout: float) -> Iterator[None]:
+    """在该上下文内（含其中创建的任务）获取名额时按后台任务排队：
+    不受排队长度限制，最多等待 timeout 秒，与交互请求按先后顺序共用并发名额"""
+    token = _background_timeout.set(timeout)
+    try:
+        yield
+    finally:
+        _background_timeout.reset(token)
+
+class OverloadedError(Exception):
+    """上游并发已满且排队已满或等待超时，应返回429"""
+
+    def __init__(self, scope: str, retry_after: int):
+        super().__init__(f"Too many concurrent requests for {scope}")
+        self.scope = scope
+        self.retry_after = retry_after
+
+class ConcurrencyLimiter:
+    """并发上限 + 有界等待队列 + 排队截止时间"""
+
+    def __init__(self, name: str, limit: int, max_queue: int, queue_timeout: float):
+        self.name = name
+        self.limit = limit
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._semaphore = asyncio.Semaphore(limit)
+        self._waiting = 0
+        self._background_waiting = 0
+
+    @property
+    def active(self) -> int:
+        return self.limit - self._semaphore._value
+
+    @property
+    def waiting(self) -> int:
+        return self._waiting + self._background_waiting
+
+    async def acquire(self) -> None:
+        if not self._semaphore.locked():
+            await self._semaphore.acquire()
+            return
+        background_timeout = _background_timeout.get()
+        if background_timeout is not None:
+            await self._acquire_background(background_timeout)
+            return
+        # 队列已满时立即拒绝，避免事件循环里堆积大量挂起的上游调用
+        if self._waiting >= self.max_queue:
+            raise OverloadedError(self.name, settings.OVERLOAD_RETRY_AFTER)
+
+        self._waiting += 1
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            raise OverloadedError(self.name, settings.OVERLOAD_RETRY_AFTER)
+        finally:
+            self._waiting -= 1
+
+    async def _acquire_background(self, timeout: float) -> None:
+        # 后台任务的排队数由调用方自己限制（例如批量请求的每提供商并行度），不占用交互请求的队列
+        self._background_waiting += 1
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), timeout)
+        except asyncio.TimeoutError:
+            raise OverloadedError(self.name, settings.OVERLOAD_RETRY_AFTER)
+        finally:
+            self._background_waiting -= 1
+
+    def release(self) -> None:
+        self._semaphore.release()
+
+class Permit:
+    """一次上游调用持有的并发名额，release 可重复调用"""
+
+    __slots__ = ("_limiters",)
+
+    def __init__(self, limiters: List[ConcurrencyLimiter]):
+        self._limiters = limiters
+
+    def __bool__(self) -> bool:
+        return bool(self._limiters)
+
+    def detach(self) -> "Permit":
+        """把名额转交给新的持有者（例如后台驱动上游的任务），原对象随即失效"""
+        limiters, self._limiters = self._limiters, []
+        return Permit(limiters)
+
+    def release(self) -> None:
+        limiters, self._limiters = self._limiters, []
+        for limiter in reversed(limiters):
+            limiter.release()
+
+    async def __aenter__(self) -> "Permit":
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        self.release()
+
+class LimiterRegistry:
+    """按提供商和模型管理限流器"""
+
+    def __init__(self):
+        self._limiters: Dict[str, Optional[ConcurrencyLimiter]] = {}
+
+    def _get(self, key: str, limit: Optional[int]) -> Optional[ConcurrencyLimiter]:
+        if key not in self._limiters:
+            self._limiters[key] = ConcurrencyLimiter(
+                key, limit, settings.UPSTREAM_MAX_QUEUE, settings.UPSTREAM_QUEUE_TIMEOUT
+            ) if limit else None
+        return self._limiters[key]
+
+    async def acquire(self, provider_type: str, internal_id: str) -> Permit:
+        """依次获取模型级和提供商级名额"""
+        limiters = [
+            self._get(f"model:{internal_id}", ModelMapping.get_max_concurrency(internal_id)),
+            self._get(f"provider:{provider_type}", settings.PROVIDER_MAX_CONCURRENCY.get(provider_type)),
+        ]
+        acquired: List[ConcurrencyLimiter] = []
+        try:
+            for limiter in limiters:
+                if limiter is not None:
+                    await limiter.acquire()
+                    acquired.append(limiter)
+        except BaseException:
+            Permit(acquired).release()
+            raise
+        return Permit(acquired)
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        return {
+            key: {"active": limiter.active, "waiting": limiter.waiting, "limit": limiter.limit}
+            for key, limiter in self._limiters.items() if limiter is not None
+        }
+
+# 全局限流器
+limiters = LimiterRegistry()
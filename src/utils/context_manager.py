@@ -0,0 +1,196 @@
+import asyncio
+import hashlib
+import logging
+from typing import Callable, Dict, List, Optional, Set
+from ..core.config import settings
+from ..core.model_config import ModelMapping
+from ..providers.factory import ProviderFactory
+from .circuit_breaker import breakers
+from .concurrency import limiters
+from .redis_helper import redis_client
+
+logger = logging.getLogger(__name__)
+
+# 每条消息的固定开销（角色、分隔符等）
+MESSAGE_OVERHEAD_TOKENS = 4
+
+SUMMARY_PREFIX = "\n\n以下是之前对话的摘要，请结合摘要继续对话：\n"
+SUMMARY_INSTRUCTION = (
+    "你是对话摘要助手。请把已有摘要和新增对话合并为一段简洁的摘要，"
+    "保留关键事实、用户偏好和尚未解决的问题，不要添加新的内容。"
+)
+ROLE_NAMES = {"user": "用户", "assistant": "助手"}
+
+def estimate_tokens(text: str) -> int:
+    """不依赖分词器估算token数：中日韩字符约1个token，其余约4个字符1个token"""
+    if not text:
+        return 0
+    chars = len(text)
+    # 非ASCII字符在UTF-8中多为3字节，据此估算宽字符数量，避免逐字符扫描
+    wide = (len(text.encode("utf-8")) - chars) // 2
+    return wide + (chars - wide + 3) // 4
+
+def estimate_message_tokens(message: Dict[str, str]) -> int:
+    """估算单条消息的token数"""
+    return estimate_tokens(message.get("content", "")) + MESSAGE_OVERHEAD_TOKENS
+
+def select_window(history: List[Dict[str, str]], budget: int) -> int:
+    """从最新消息向前选取预算内的消息，返回窗口起始下标"""
+    used = 0
+    start = len(history)
+    for i in range(len(history) - 1, -1, -1):
+        cost = estimate_message_tokens(history[i])
+        if used + cost > budget:
+            break
+        used += cost
+        start = i
+    # 窗口从用户消息开始，避免出现孤立的助手回复
+    while start < len(history) and history[start].get("role") != "user":
+        start += 1
+    return start
+
+def message_fingerprint(message: Dict[str, str]) -> str:
+    """消息指纹，用于标记摘要覆盖到的位置"""
+    payload = f"{message.get('role', '')}\x00{message.get('content', '')}"
+    return hashlib.blake2b(payload.encode("utf-8"), digest_size=8).hexdigest()
+
+class ContextManager:
+    """按模型token预算裁剪上下文，并在后台把旧对话压缩为滚动摘要"""
+
+    def __init__(self):
+        self._compacting: Set[str] = set()
+        self._tasks: Set[asyncio.Task] = set()
+
+    async def build_messages(
+        self,
+        internal_id: str,
+        conversation_id: Optional[str],
+        content: str
+    ) -> List[Dict[str, str]]:
+        """构建发送给提供商的消息列表"""
+        history, summary = None, None
+        if conversation_id:
+            history, summary = await redis_client.get_conversation(conversation_id)
+        return self.assemble(internal_id, conversation_id, content, history or [], summary)
+
+    def assemble(
+        self,
+        internal_id: str,
+        conversation_id: Optional[str],
+        content: str,
+        history: List[Dict[str, str]],
+        summary: Optional[Dict],
+        on_summary: Optional[Callable[[Dict], None]] = None
+    ) -> List[Dict[str, str]]:
+        """用已加载的历史和摘要构建消息列表；on_summary 在后台生成新摘要后被调用"""
+        system_prompt = ModelMapping.get_system_prompt(internal_id) or ""
+        user_message = {"role": "user", "content": content}
+
+        budget = (
+            ModelMapping.get_context_budget(internal_id)
+            - estimate_tokens(system_prompt)
+            - estimate_message_tokens(user_message)
+        )
+        start = select_window(history, max(budget, 0))
+
+        if start > 0:
+            # 有旧对话被裁掉：拼接已有摘要，并在后台补充压缩未覆盖的部分
+            if summary and summary.get("text"):
+                system_prompt += SUMMARY_PREFIX + summary["text"]
+                budget -= estimate_tokens(SUMMARY_PREFIX + summary["text"])
+                start = max(start, select_window(history, max(budget, 0)))
+            self._schedule_compaction(conversation_id, history, start, summary, on_summary)
+
+        messages = []
+        if system_prompt:
+            messages.append({"role": "system", "content": system_prompt})
+        messages.extend(history[start:])
+        messages.append(user_message)
+        return messages
+
+    def _uncovered(self, history: List[Dict[str, str]], start: int, summary: Optional[Dict]) -> List[Dict[str, str]]:
+        """返回被裁掉且尚未进入摘要的消息"""
+        last = summary.get("last") if summary else None
+        if last:
+            # 只在被裁掉的部分中查找：窗口内出现相同内容的消息（例如重复提问）不代表摘要已覆盖到那里
+            for i in range(start - 1, -1, -1):
+                if message_fingerprint(history[i]) == last:
+                    return history[i + 1:start]
+        # 摘要覆盖的消息已被裁剪出列表时，剩余被裁掉的消息都未覆盖
+        return history[:start]
+
+    def _schedule_compaction(
+        self,
+        conversation_id: str,
+        history: List[Dict[str, str]],
+        start: int,
+        summary: Optional[Dict],
+        on_summary: Optional[Callable[[Dict], None]] = None
+    ) -> None:
+        if not settings.CONTEXT_SUMMARY_ENABLED or not conversation_id or conversation_id in self._compacting:
+            return
+        uncovered = self._uncovered(history, start, summary)
+        if not uncovered:
+            return
+
+        self._compacting.add(conversation_id)
+        task = asyncio.create_task(self._compact(conversation_id, uncovered, summary, on_summary))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _compact(
+        self,
+        conversation_id: str,
+        uncovered: List[Dict[str, str]],
+        summary: Optional[Dict],
+        on_summary: Optional[Callable[[Dict], None]] = None
+    ) -> None:
+        """调用低成本模型生成新的滚动摘要，与聊天请求共用并发名额和熔断器"""
+        try:
+            model_info = ModelMapping.get_model_info(ModelMapping.SUMMARY_MODEL)
+            provider = ProviderFactory.create(model_info["provider"])
+            breaker = breakers.get(model_info["provider"])
+
+            recent = uncovered[select_window(uncovered, settings.CONTEXT_SUMMARY_MAX_INPUT_TOKENS):] or uncovered[-1:]
+            transcript = "\n".join(
+                f"{ROLE_NAMES.get(m.get('role'), m.get('role'))}: {m.get('content', '')}"
+                for m in recent
+            )
+            previous = summary.get("text", "") if summary else ""
+            async with await limiters.acquire(model_info["provider"], ModelMapping.SUMMARY_MODEL):
+                breaker.allow()
+                try:
+                    response = await provider.chat([
+                        {"role": "system", "content": SUMMARY_INSTRUCTION},
+                        {"role": "user", "content": f"已有摘要：\n{previous or '无'}\n\n新增对话：\n{transcript}"}
+                    ], model_info["model_id"])
+                except asyncio.CancelledError:
+                    breaker.release_trial()
+                    raise
+                except Exception as e:
+                    breaker.record_error(e)
+                    raise
+            breaker.record_success()
+
+            new_summary = {
+                "text": response.content.strip(),
+                "last": message_fingerprint(uncovered[-1])
+            }
+            await redis_client.save_summary(conversation_id, new_summary)
+            if on_summary is not None:
+                on_summary(new_summary)
+            logger.info(f"[{conversation_id}] Compacted {len(uncovered)} messages into summary")
+        except Exception as e:
+            logger.warning(f"[{conversation_id}] Context compaction failed: {str(e)}")
+        finally:
+            self._compacting.discard(conversation_id)
+
+    async def shutdown(self) -> None:
+        """取消尚未完成的压缩任务"""
+        for task in list(self._tasks):
+            task.cancel()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+# 全局上下文管理器实例
+context_manager = ContextManager()
@@ -0,0 +1,170 @@
+import asyncio
+import logging
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple, TypeVar
+from ..core.config import settings
+from ..core.model_config import ModelMapping
+from .circuit_breaker import CircuitOpenError
+from .concurrency import OverloadedError
+from .metrics import UPSTREAM_FALLBACKS
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+_NOTHING = object()
+
+def plan(internal_id: str, streaming: bool = True) -> Tuple[List[str], Optional[float]]:
+    """按配置返回候选模型链和对冲阈值
+
+    流式按首token时间对冲（hedge_after）；非流式的耗时随回复长度增长，只在配置了 hedge_after_chat 时对冲。
+    """
+    chain = ModelMapping.get_fallback_chain(internal_id) if settings.FALLBACK_ENABLED else [internal_id]
+    hedge_after = None
+    if settings.HEDGING_ENABLED:
+        hedge_after = ModelMapping.get_hedge_after(internal_id, streaming)
+    return chain, hedge_after
+
+def can_fall_back(error: BaseException) -> bool:
+    """只有暂时性错误（网络、超时、429、5xx）、过载和熔断才降级；上游 4xx 换模型重发也会被拒绝"""
+    if isinstance(error, (OverloadedError, CircuitOpenError)):
+        return True
+    # retry 依赖 httpx，到出错时才导入，不计入冷启动
+    from .retry import is_retryable
+    return is_retryable(error)
+
+class _Chain:
+    """按顺序启动候选模型，记录降级原因和最后一次错误"""
+
+    __slots__ = ("primary", "remaining", "last_error")
+
+    def __init__(self, candidates: List[str]):
+        self.primary = candidates[0]
+        self.remaining = list(candidates)
+        self.last_error: Optional[BaseException] = None
+
+    def next(self, reason: Optional[str]) -> str:
+        internal_id = self.remaining.pop(0)
+        if reason:
+            UPSTREAM_FALLBACKS.labels(self.primary, reason).inc()
+            logger.warning("Starting fallback model %s for %s (%s)", internal_id, self.primary, reason)
+        return internal_id
+
+    def failed(self, internal_id: str, error: BaseException) -> None:
+        self.last_error = error
+        logger.warning("Model %s failed: %s: %s", internal_id, type(error).__name__, error)
+
+    def hedge_timeout(self, hedge_after: Optional[float]) -> Optional[float]:
+        return hedge_after if hedge_after and self.remaining else None
+
+async def hedged_call(
+    candidates: List[str],
+    call: Callable[[str], Awaitable[T]],
+    hedge_after: Optional[float] = None
+) -> Tuple[str, T]:
+    """依次或并行调用候选模型，返回 (实际服务的模型, 结果)
+
+    可降级的错误（见 can_fall_back）立即启动下一个候选；主模型超过 hedge_after 秒仍未返回时并行启动下一个，
+    先成功者胜出，其余调用被取消。
+    """
+    chain = _Chain(candidates)
+    pending: Dict[asyncio.Task, str] = {}
+
+    def launch(reason: Optional[str]) -> None:
+        internal_id = chain.next(reason)
+        pending[asyncio.create_task(call(internal_id))] = internal_id
+
+    launch(None)
+    try:
+        while pending:
+            done, _ = await asyncio.wait(
+                pending, timeout=chain.hedge_timeout(hedge_after), return_when=asyncio.FIRST_COMPLETED
+            )
+            if not done:
+                launch("slow")
+                continue
+            for task in done:
+                internal_id = pending.pop(task)
+                error = task.exception()
+                if error is None:
+                    return internal_id, task.result()
+                chain.failed(internal_id, error)
+                if not can_fall_back(error):
+                    raise error
+            if chain.remaining:
+                launch("error")
+        raise chain.last_error
+    finally:
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+
+async def _discard(streams: Dict[asyncio.Future, Tuple[str, AsyncIterator]]) -> None:
+    """取消落败的流并关闭其上游连接"""
+    for task in streams:
+        task.cancel()
+    await asyncio.gather(*streams, return_exceptions=True)
+    for _, iterator in streams.values():
+        try:
+            await iterator.aclose()
+        except Exception as e:
+            logger.debug("Error closing discarded stream: %s", e)
+
+async def hedged_stream(
+    candidates: List[str],
+    factory: Callable[[str], AsyncIterator[Any]],
+    hedge_after: Optional[float] = None
+) -> AsyncIterator[Tuple[str, Any]]:
+    """流式版本的 hedged_call，逐块产出 (实际服务的模型, 块)
+
+    以首个块作为成功的标志：首块之前出现可降级的错误会换下一个候选，首块之后的错误直接抛出。
+    """
+    chain = _Chain(candidates)
+    streams: Dict[asyncio.Future, Tuple[str, AsyncIterator]] = {}
+    winner: Optional[Tuple[str, AsyncIterator]] = None
+    first: Any = _NOTHING
+
+    def launch(reason: Optional[str]) -> None:
+        internal_id = chain.next(reason)
+        iterator = factory(internal_id)
+        streams[asyncio.ensure_future(iterator.__anext__())] = (internal_id, iterator)
+
+    try:
+        launch(None)
+        while streams and winner is None:
+            done, _ = await asyncio.wait(
+                streams, timeout=chain.hedge_timeout(hedge_after), return_when=asyncio.FIRST_COMPLETED
+            )
+            if not done:
+                launch("slow")
+                continue
+            for task in done:
+                internal_id, iterator = streams.pop(task)
+                try:
+                    first = task.result()
+                except StopAsyncIteration:
+                    pass
+                except Exception as e:
+                    chain.failed(internal_id, e)
+                    if not can_fall_back(e):
+                        raise
+                    continue
+                winner = (internal_id, iterator)
+                break
+            if winner is None and chain.remaining:
+                launch("error")
+    finally:
+        if streams:
+            await _discard(streams)
+
+    if winner is None:
+        raise chain.last_error
+
+    internal_id, iterator = winner
+    try:
+        if first is not _NOTHING:
+            yield internal_id, first
+        async for chunk in iterator:
+            yield internal_id, chunk
+    finally:
+        await iterator.aclose()
@@ -0,0 +1,79 @@
+import asyncio
+import logging
+import time
+from typing import Any, Dict, Optional
+from ..core.config import settings
+from ..providers.factory import ProviderFactory
+from .circuit_breaker import breakers
+
+logger = logging.getLogger(__name__)
+
+class HealthProber:
+    """后台定时探测各提供商，缓存结果供健康检查接口直接返回"""
+
+    def __init__(self):
+        self._results: Dict[str, Dict[str, Any]] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    async def probe(self, provider_type: str) -> Dict[str, Any]:
+        """探测单个提供商并更新缓存"""
+        started = time.perf_counter()
+        error = None
+        try:
+            provider = ProviderFactory.create(provider_type)
+            healthy = await asyncio.wait_for(provider.check_health(), settings.HEALTH_PROBE_TIMEOUT)
+        except asyncio.TimeoutError:
+            healthy, error = False, "timeout"
+        except Exception as e:
+            # 未配置密钥等情况
+            healthy, error = False, str(e)
+
+        result = {
+            "healthy": healthy,
+            "latency_ms": round((time.perf_counter() - started) * 1000, 1),
+            "checked_at": time.time(),
+            "error": error,
+        }
+        self._results[provider_type] = result
+        breakers.get(provider_type).record_probe(healthy)
+        return result
+
+    async def probe_all(self) -> None:
+        await asyncio.gather(*[
+            self.probe(provider_type) for provider_type in ProviderFactory.get_available_providers()
+        ])
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.probe_all()
+            except Exception as e:
+                logger.error(f"Health probe failed: {str(e)}", exc_info=True)
+            await asyncio.sleep(settings.HEALTH_PROBE_INTERVAL)
+
+    def start(self) -> None:
+        """启动后台探测（应用启动时调用）"""
+        if settings.HEALTH_PROBE_ENABLED and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """返回缓存的探测结果和熔断器状态，不触发任何上游请求"""
+        return {
+            provider_type: {
+                **self._results.get(provider_type, {"healthy": None}),
+                "circuit": breakers.get(provider_type).state,
+            }
+            for provider_type in ProviderFactory.get_available_providers()
+        }
+
+# 全局探测器
+health_prober = HealthProber()
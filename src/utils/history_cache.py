@@ -0,0 +1,109 @@
+"""热点对话历史的进程内L1缓存
+
+Redis 中每个对话有一个版本号，每次追加历史或更新摘要时在同一事务里 INCR。
+读取时只需一次 GET 版本号：与缓存的版本一致即使用本地副本，不一致说明其他 worker 写过，重新加载。
+本进程写入时在确认版本连续后直接更新本地副本（写穿），否则丢弃。
+"""
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+from ..core.config import settings
+from .metrics import HISTORY_CACHE_LOOKUPS
+
+# 每条消息除内容外的估算开销（字典、键名等）
+MESSAGE_OVERHEAD_BYTES = 200
+
+def estimate_size(history: List[Dict], summary: Optional[Dict]) -> int:
+    size = sum(len(m.get("content") or "") * 2 + MESSAGE_OVERHEAD_BYTES for m in history)
+    if summary:
+        size += len(summary.get("text") or "") * 2 + MESSAGE_OVERHEAD_BYTES
+    return size
+
+class CachedConversation:
+    __slots__ = ("history", "summary", "version", "expires_at", "size")
+
+    def __init__(self, history: List[Dict], summary: Optional[Dict], version: Optional[int]):
+        self.history = history
+        self.summary = summary
+        self.version = version
+        self.expires_at = time.monotonic() + settings.HISTORY_CACHE_TTL
+        self.size = estimate_size(history, summary)
+
+class HistoryCache:
+    """按条数和估算内存双重限制的LRU，条目带TTL"""
+
+    def __init__(self, max_entries: int, max_bytes: int):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._data: "OrderedDict[str, CachedConversation]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def peek(self, request_id: str) -> Optional[CachedConversation]:
+        """返回未过期的条目（尚未校验版本）"""
+        entry = self._data.get(request_id)
+        if entry is None:
+            return None
+        if entry.expires_at < time.monotonic():
+            self.discard(request_id)
+            return None
+        return entry
+
+    def get(self, request_id: str, version: Optional[int]) -> Optional[Tuple[List[Dict], Optional[Dict]]]:
+        """版本一致时返回 (历史副本, 摘要)，并记录命中情况"""
+        entry = self.peek(request_id)
+        if entry is None:
+            HISTORY_CACHE_LOOKUPS.labels("miss").inc()
+            return None
+        if entry.version != version:
+            self.discard(request_id)
+            HISTORY_CACHE_LOOKUPS.labels("stale").inc()
+            return None
+        self._data.move_to_end(request_id)
+        HISTORY_CACHE_LOOKUPS.labels("hit").inc()
+        return list(entry.history), entry.summary
+
+    def put(self, request_id: str, history: List[Dict], summary: Optional[Dict], version: Optional[int]) -> None:
+        entry = CachedConversation(list(history), summary, version)
+        if entry.size > self.max_bytes:
+            self.discard(request_id)
+            return
+        self.discard(request_id)
+        self._data[request_id] = entry
+        self.size += entry.size
+        while len(self._data) > self.max_entries or self.size > self.max_bytes:
+            _, evicted = self._data.popitem(last=False)
+            self.size -= evicted.size
+
+    def append(self, request_id: str, messages: List[Dict], version: int, max_messages: int) -> None:
+        """写穿：本地副本恰好落后一个版本时追加，否则说明错过了其他写入，丢弃"""
+        entry = self._data.get(request_id)
+        if entry is None:
+            return
+        if entry.version is None or entry.version + 1 != version:
+            self.discard(request_id)
+            return
+        self.put(request_id, (entry.history + messages)[-max_messages:], entry.summary, version)
+
+    def update_summary(self, request_id: str, summary: Dict, version: int) -> None:
+        entry = self._data.get(request_id)
+        if entry is None:
+            return
+        if entry.version is None or entry.version + 1 != version:
+            self.discard(request_id)
+            return
+        self.put(request_id, entry.history, summary, version)
+
+    def discard(self, request_id: str) -> None:
+        entry = self._data.pop(request_id, None)
+        if entry is not None:
+            self.size -= entry.size
+
+    def clear(self) -> None:
+        self._data.clear()
+        self.size = 0
+
+# 全局历史缓存实例
+history_cache = HistoryCache(settings.HISTORY_CACHE_MAX_ENTRIES, settings.HISTORY_CACHE_MAX_BYTES)
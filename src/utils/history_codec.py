@@ -0,0 +1,101 @@
+"""对话历史的存储编码
+
+格式（版本1）：1字节版本号 + 1字节压缩方式 + 负载。负载为紧凑JSON，
+超过阈值时用 zstd（已安装时）或 zlib 压缩，压缩后不变小则保留原文。
+首字节不是版本号的值按旧版明文JSON读取，迁移期间新旧数据可以共存。
+"""
+import functools
+import logging
+import zlib
+from typing import Any, Dict, Union
+from ..core.config import settings
+from .json_helper import dumps, loads
+from .metrics import HISTORY_RAW_BYTES, HISTORY_STORED_BYTES
+
+# zstd 为可选依赖
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - 取决于运行环境
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+FORMAT_VERSION = 1
+
+CODEC_NONE = 0
+CODEC_ZLIB = 1
+CODEC_ZSTD = 2
+CODEC_NAMES = {CODEC_NONE: "none", CODEC_ZLIB: "zlib", CODEC_ZSTD: "zstd"}
+
+# 常见消息编码为 [角色代码, 内容]，省去重复的键名
+ROLE_CODES = {"system": 0, "user": 1, "assistant": 2}
+ROLES = {code: role for role, code in ROLE_CODES.items()}
+
+@functools.lru_cache(maxsize=None)
+def _codec_for(name: str) -> int:
+    """按配置值解析压缩方式，结果按值缓存，缺少依赖的警告只输出一次"""
+    if name == "zstd":
+        if zstandard is not None:
+            return CODEC_ZSTD
+        logger.warning("HISTORY_COMPRESSION=zstd but zstandard is not installed, using zlib")
+        return CODEC_ZLIB
+    if name == "zlib":
+        return CODEC_ZLIB
+    return CODEC_NONE
+
+def _preferred_codec() -> int:
+    return _codec_for(settings.HISTORY_COMPRESSION)
+
+def _compress(codec: int, payload: bytes) -> bytes:
+    if codec == CODEC_ZSTD:
+        return zstandard.ZstdCompressor().compress(payload)
+    return zlib.compress(payload)
+
+def _decompress(codec: int, payload: bytes) -> bytes:
+    if codec == CODEC_NONE:
+        return payload
+    if codec == CODEC_ZLIB:
+        return zlib.decompress(payload)
+    if codec == CODEC_ZSTD:
+        if zstandard is None:
+            raise ValueError("zstd-compressed history requires the zstandard package")
+        return zstandard.ZstdDecompressor().decompress(payload)
+    raise ValueError(f"Unknown history codec: {codec}")
+
+def encode(obj: Any) -> bytes:
+    """编码为带版本头的字节"""
+    payload = dumps(obj)
+    raw_size = len(payload)
+    codec = CODEC_NONE
+    if raw_size >= settings.HISTORY_COMPRESS_MIN_BYTES:
+        preferred = _preferred_codec()
+        if preferred != CODEC_NONE:
+            compressed = _compress(preferred, payload)
+            if len(compressed) < raw_size:
+                payload, codec = compressed, preferred
+
+    data = bytes((FORMAT_VERSION, codec)) + payload
+    name = CODEC_NAMES[codec]
+    HISTORY_RAW_BYTES.labels(name).inc(raw_size)
+    HISTORY_STORED_BYTES.labels(name).inc(len(data))
+    return data
+
+def decode(data: Union[bytes, str]) -> Any:
+    """解码存储的值，兼容旧版明文JSON"""
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    if not data or data[0] != FORMAT_VERSION:
+        return loads(data)
+    return loads(_decompress(data[1], data[2:]))
+
+def encode_message(message: Dict[str, Any]) -> bytes:
+    role = message.get("role")
+    if role in ROLE_CODES and len(message) == 2 and "content" in message:
+        return encode([ROLE_CODES[role], message["content"]])
+    return encode(message)
+
+def decode_message(data: Union[bytes, str]) -> Dict[str, Any]:
+    obj = decode(data)
+    if isinstance(obj, list):
+        return {"role": ROLES[obj[0]], "content": obj[1]}
+    return obj
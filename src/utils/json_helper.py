@@ -0,0 +1,46 @@
+import json
+from typing import Any, Union
+from starlette.responses import JSONResponse
+
+# 优先使用 orjson，未安装时回退到标准库
+try:
+    import orjson
+except ImportError:  # pragma: no cover - 取决于运行环境
+    orjson = None
+
+HAS_ORJSON = orjson is not None
+
+if HAS_ORJSON:
+    def loads(data: Union[bytes, bytearray, memoryview, str]) -> Any:
+        """解析JSON"""
+        return orjson.loads(data)
+
+    def dumps(obj: Any) -> bytes:
+        """序列化为紧凑的UTF-8 JSON字节"""
+        return orjson.dumps(obj)
+
+    JSONDecodeError = orjson.JSONDecodeError
+else:
+    _encoder = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"))
+
+    def loads(data: Union[bytes, bytearray, memoryview, str]) -> Any:
+        """解析JSON"""
+        return json.loads(data)
+
+    def dumps(obj: Any) -> bytes:
+        """序列化为紧凑的UTF-8 JSON字节"""
+        return _encoder.encode(obj).encode("utf-8")
+
+    JSONDecodeError = json.JSONDecodeError
+
+SSE_DONE = b"data: [DONE]\n\n"
+
+def sse_frame(obj: Any) -> bytes:
+    """构造一个 SSE data 帧（字节），StreamingResponse 无需再编码"""
+    return b"data: " + dumps(obj) + b"\n\n"
+
+class FastJSONResponse(JSONResponse):
+    """默认响应类：用 dumps 渲染，避免标准库 JSONResponse 的缩进检查和 ensure_ascii 转义"""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
@@ -0,0 +1,68 @@
+import json
+import logging
+import zlib
+from typing import Any, Optional
+from ..core.config import settings, EnvironmentType
+
+# 生产档位默认关闭完整载荷和逐块日志
+PRODUCTION_ENVIRONMENTS = {EnvironmentType.PRODUCTION, EnvironmentType.VERCEL}
+
+_configured = False
+
+def get_log_profile() -> str:
+    """获取当前日志档位"""
+    if settings.LOG_PROFILE:
+        return settings.LOG_PROFILE.lower()
+    return "production" if settings.ENVIRONMENT in PRODUCTION_ENVIRONMENTS else "debug"
+
+def _resolve(flag: Optional[bool]) -> bool:
+    if flag is not None:
+        return flag
+    return get_log_profile() != "production"
+
+def configure_logging() -> None:
+    """按配置初始化根日志（只执行一次）"""
+    global _configured
+    if _configured:
+        return
+    logging.basicConfig(
+        level=settings.LOG_LEVEL.upper(),
+        format="%(asctime)s %(levelname)s %(name)s %(message)s"
+    )
+    _configured = True
+
+class LazyJson:
+    """延迟序列化的日志参数：只有日志真正输出时才执行 json.dumps，并截断到上限"""
+
+    __slots__ = ("obj", "limit")
+
+    def __init__(self, obj: Any, limit: Optional[int] = None):
+        self.obj = obj
+        self.limit = settings.LOG_PAYLOAD_MAX_CHARS if limit is None else limit
+
+    def __str__(self) -> str:
+        text = json.dumps(self.obj, ensure_ascii=False, default=str)
+        if self.limit and len(text) > self.limit:
+            return f"{text[:self.limit]}...<truncated {len(text) - self.limit} chars>"
+        return text
+
+def is_sampled(request_id: str) -> bool:
+    """按请求ID确定性采样，同一请求的日志要么全记要么全不记"""
+    rate = settings.LOG_SAMPLE_RATE
+    if rate >= 1:
+        return True
+    if rate <= 0:
+        return False
+    return zlib.crc32(request_id.encode("utf-8")) % 10000 < rate * 10000
+
+def payload_logging(logger: logging.Logger, request_id: str) -> bool:
+    """是否记录完整载荷：级别检查 + 档位开关 + 请求采样"""
+    return (
+        logger.isEnabledFor(logging.INFO)
+        and _resolve(settings.LOG_PAYLOADS)
+        and is_sampled(request_id)
+    )
+
+def chunk_logging(logger: logging.Logger) -> bool:
+    """是否逐块记录流式输出（DEBUG级别）"""
+    return logger.isEnabledFor(logging.DEBUG) and _resolve(settings.LOG_STREAM_CHUNKS)
@@ -0,0 +1,159 @@
+import os
+import time
+from typing import Dict, Tuple
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    REGISTRY,
+    generate_latest,
+)
+from ..core.model_config import ModelMapping
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+REDIS_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1)
+LOOKUP_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01)
+CHUNK_RATE_BUCKETS = (1, 5, 10, 20, 40, 60, 80, 100, 150, 200, 400)
+
+HTTP_REQUESTS = Counter(
+    "http_requests_total", "HTTP请求数", ["route", "method", "status"]
+)
+HTTP_LATENCY = Histogram(
+    "http_request_duration_seconds", "HTTP请求耗时", ["route", "method"], buckets=LATENCY_BUCKETS
+)
+CHAT_REQUESTS = Counter(
+    "chat_requests_total", "按内部模型统计的对话请求数", ["model", "endpoint"]
+)
+CHAT_LATENCY = Histogram(
+    "chat_request_duration_seconds", "按内部模型统计的对话请求耗时", ["model", "endpoint"], buckets=LATENCY_BUCKETS
+)
+UPSTREAM_LATENCY = Histogram(
+    "upstream_request_duration_seconds", "上游提供商调用耗时", ["provider", "model"], buckets=LATENCY_BUCKETS
+)
+UPSTREAM_TTFT = Histogram(
+    "upstream_time_to_first_token_seconds", "上游流式首token时间", ["provider", "model"], buckets=LATENCY_BUCKETS
+)
+STREAM_CHUNKS = Counter(
+    "stream_chunks_total", "流式输出的块数", ["model"]
+)
+STREAM_CHUNK_RATE = Histogram(
+    "stream_chunks_per_second", "每个流的输出速度（块/秒）", ["model"], buckets=CHUNK_RATE_BUCKETS
+)
+ACTIVE_STREAMS = Gauge(
+    "active_streams", "正在进行的流式响应数", multiprocess_mode="livesum"
+)
+ACTIVE_WEBSOCKETS = Gauge(
+    "active_websocket_sessions", "正在进行的WebSocket对话会话数", multiprocess_mode="livesum"
+)
+STREAMS_ABANDONED = Counter(
+    "streams_abandoned_total", "客户端在结束前断开、已取消上游生成的流", ["model"]
+)
+UPSTREAM_FALLBACKS = Counter(
+    "upstream_fallbacks_total", "启动备用模型的次数（slow：对冲，error：出错降级）", ["model", "reason"]
+)
+UPSTREAM_RETRIES = Counter(
+    "upstream_retries_total", "上游重试次数（retried：已重试，budget_exhausted：预算耗尽放弃）", ["result"]
+)
+CIRCUIT_STATE = Gauge(
+    "circuit_breaker_state", "熔断器状态（0=closed，1=half_open，2=open）", ["provider"], multiprocess_mode="max"
+)
+HISTORY_RAW_BYTES = Counter(
+    "history_raw_bytes_total", "写入的历史记录编码前字节数", ["codec"]
+)
+HISTORY_STORED_BYTES = Counter(
+    "history_stored_bytes_total", "写入的历史记录实际存储字节数（压缩比 = raw / stored）", ["codec"]
+)
+SEMANTIC_CACHE_LOOKUPS = Counter(
+    "semantic_cache_lookups_total", "语义缓存查询次数（命中率 = hit / 全部）", ["model", "result"]
+)
+SEMANTIC_CACHE_LATENCY = Histogram(
+    "semantic_cache_lookup_duration_seconds", "语义缓存查询耗时（含向量化）", ["model"], buckets=LOOKUP_BUCKETS
+)
+HISTORY_CACHE_LOOKUPS = Counter(
+    "history_cache_lookups_total", "进程内历史缓存查询（hit：命中，stale：版本已变，miss：未缓存）", ["result"]
+)
+REDIS_LATENCY = Histogram(
+    "redis_operation_duration_seconds", "Redis操作耗时", ["operation"], buckets=REDIS_BUCKETS
+)
+ERRORS = Counter(
+    "errors_total", "按异常类型统计的错误数", ["type"]
+)
+
+class ModelMetrics:
+    """预先绑定标签的子指标，逐块路径上只做属性访问和 inc/observe"""
+
+    __slots__ = (
+        "chat_requests", "chat_latency", "stream_requests", "stream_latency",
+        "upstream_latency", "upstream_ttft", "stream_chunks", "stream_chunk_rate",
+        "streams_abandoned",
+    )
+
+    def __init__(self, internal_id: str, provider: str):
+        self.chat_requests = CHAT_REQUESTS.labels(internal_id, "chat")
+        self.chat_latency = CHAT_LATENCY.labels(internal_id, "chat")
+        self.stream_requests = CHAT_REQUESTS.labels(internal_id, "stream")
+        self.stream_latency = CHAT_LATENCY.labels(internal_id, "stream")
+        self.upstream_latency = UPSTREAM_LATENCY.labels(provider, internal_id)
+        self.upstream_ttft = UPSTREAM_TTFT.labels(provider, internal_id)
+        self.stream_chunks = STREAM_CHUNKS.labels(internal_id)
+        self.stream_chunk_rate = STREAM_CHUNK_RATE.labels(internal_id)
+        self.streams_abandoned = STREAMS_ABANDONED.labels(internal_id)
+
+_model_metrics: Dict[str, ModelMetrics] = {
+    internal_id: ModelMetrics(internal_id, info["provider"])
+    for internal_id, info in ModelMapping.MODEL_MAP.items()
+}
+_unknown_model = ModelMetrics("unknown", "unknown")
+_http_children: Dict[Tuple[str, str], Tuple[Histogram, Dict[int, Counter]]] = {}
+_redis_children: Dict[str, Histogram] = {}
+
+def for_model(internal_id: str) -> ModelMetrics:
+    """获取模型的预绑定指标；未知模型归入 unknown，避免标签基数膨胀"""
+    return _model_metrics.get(internal_id, _unknown_model)
+
+def observe_http(route: str, method: str, status: int, duration: float) -> None:
+    children = _http_children.get((route, method))
+    if children is None:
+        children = _http_children[(route, method)] = (HTTP_LATENCY.labels(route, method), {})
+    latency, counters = children
+    latency.observe(duration)
+    counter = counters.get(status)
+    if counter is None:
+        counter = counters[status] = HTTP_REQUESTS.labels(route, method, str(status))
+    counter.inc()
+
+def observe_redis(operation: str, duration: float) -> None:
+    child = _redis_children.get(operation)
+    if child is None:
+        child = _redis_children[operation] = REDIS_LATENCY.labels(operation)
+    child.observe(duration)
+
+class redis_timer:
+    """Redis操作计时上下文"""
+
+    __slots__ = ("operation", "start")
+
+    def __init__(self, operation: str):
+        self.operation = operation
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        observe_redis(self.operation, time.perf_counter() - self.start)
+        return False
+
+def record_error(exc: BaseException) -> None:
+    ERRORS.labels(type(exc).__name__).inc()
+
+def render_metrics() -> Tuple[bytes, str]:
+    """生成 Prometheus 文本格式；多进程部署时汇总各 worker 的数据"""
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
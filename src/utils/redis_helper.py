@@ -1,81 +1,264 @@
 import json
-import redis
-from typing import List, Dict, Optional
+import time
+from typing import TYPE_CHECKING, List, Dict, Optional, Tuple, Union
 from ..core.config import settings
+from .metrics import redis_timer
+from . import history_codec
+from .history_cache import history_cache
 import logging
 
+if TYPE_CHECKING:
+    import redis.asyncio as aioredis
+
 logger = logging.getLogger(__name__)
 
+def _connection_errors() -> tuple:
+    """连接类异常；redis 在首次建立连接池时才导入（Vercel 等禁用 Redis 的环境完全不加载）"""
+    from redis.exceptions import ConnectionError, TimeoutError
+    return ConnectionError, TimeoutError
+
 class RedisClient:
     _instance = None
     _redis = None
+    # 连接失败后在该时间点之前不再尝试连接
+    _unavailable_until = 0.0
 
     def __new__(cls):
         if cls._instance is None:
             cls._instance = super().__new__(cls)
-            try:
-                if settings.REDIS_ENABLED:
-                    cls._redis = redis.Redis(
-                        host=settings.REDIS_HOST,
-                        port=settings.REDIS_PORT,
-                        db=settings.REDIS_DB,
-                        password=settings.REDIS_PASSWORD,
-                        decode_responses=True
-                    )
-                    cls._redis.ping()
-                else:
-                    logger.info("Redis is disabled by configuration")
-            except Exception as e:
-                logger.warning(f"Redis connection failed: {str(e)}")
-                cls._redis = None
+            if not settings.REDIS_ENABLED:
+                logger.info("Redis is disabled by configuration")
         return cls._instance
 
     @property
-    def redis(self) -> Optional[redis.Redis]:
-        """获取 Redis 连接"""
+    def redis(self) -> Optional["aioredis.Redis"]:
+        """获取 Redis 连接（首次使用时懒加载，不做网络I/O）"""
+        if not settings.REDIS_ENABLED:
+            return None
+        if time.monotonic() < self._unavailable_until:
+            return None
+        if self._redis is None:
+            import redis.asyncio as aioredis
+            pool = aioredis.ConnectionPool(
+                host=settings.REDIS_HOST,
+                port=settings.REDIS_PORT,
+                db=settings.REDIS_DB,
+                password=settings.REDIS_PASSWORD,
+                max_connections=settings.REDIS_MAX_CONNECTIONS,
+                socket_timeout=settings.REDIS_SOCKET_TIMEOUT,
+                socket_connect_timeout=settings.REDIS_CONNECT_TIMEOUT,
+                # 历史记录以二进制编码存储，字符串值在读取处自行解码
+                decode_responses=False
+            )
+            RedisClient._redis = aioredis.Redis(connection_pool=pool)
         return self._redis
 
-    async def save_chat_history(self, request_id: str, messages: List[Dict]) -> bool:
-        """保存对话历史"""
+    def _mark_unavailable(self, e: Exception) -> None:
+        """连接失败时暂停使用 Redis，避免每个请求都等待超时"""
+        logger.warning(
+            f"Redis connection failed: {str(e)}, "
+            f"retrying in {settings.REDIS_RETRY_INTERVAL}s"
+        )
+        RedisClient._unavailable_until = time.monotonic() + settings.REDIS_RETRY_INTERVAL
+
+    async def close(self) -> None:
+        """关闭连接池"""
+        if self._redis is not None:
+            try:
+                await self._redis.aclose(close_connection_pool=True)
+            except Exception as e:
+                logger.warning(f"Error closing Redis: {str(e)}")
+            RedisClient._redis = None
+
+    @staticmethod
+    def _history_key(request_id: str) -> str:
+        return f"chat:turns:{request_id}"
+
+    @staticmethod
+    def _legacy_history_key(request_id: str) -> str:
+        # 旧版整段JSON存储的键，仅用于迁移期读取
+        return f"chat:history:{request_id}"
+
+    @staticmethod
+    def _summary_key(request_id: str) -> str:
+        return f"chat:summary:{request_id}"
+
+    @staticmethod
+    def _version_key(request_id: str) -> str:
+        # 历史或摘要每次变更时递增，用于校验进程内缓存
+        return f"chat:ver:{request_id}"
+
+    @staticmethod
+    def _parse_version(value: Optional[bytes]) -> Optional[int]:
+        return int(value) if value is not None else None
+
+    async def _migrate_legacy_history(self, client: "aioredis.Redis", request_id: str, legacy: bytes) -> List[Dict]:
+        """把旧版整段JSON历史一次性迁移为追加式列表"""
+        messages = [m for m in json.loads(legacy) if m.get("role") != "system"]
+        key = self._history_key(request_id)
+        async with client.pipeline(transaction=True) as pipe:
+            if messages:
+                pipe.rpush(key, *[history_codec.encode_message(m) for m in messages])
+                pipe.ltrim(key, -settings.CHAT_HISTORY_MAX_TURNS * 2, -1)
+                pipe.expire(key, settings.CHAT_HISTORY_EXPIRE)
+            pipe.delete(self._legacy_history_key(request_id))
+            await pipe.execute()
+        return messages
+
+    async def append_chat_history(self, request_id: str, messages: List[Dict]) -> bool:
+        """追加本轮新增的对话消息（不含系统提示语）"""
         if not settings.REDIS_ENABLED:
-            logger.debug("Redis is disabled, skipping save_chat_history")
+            logger.debug("Redis is disabled, skipping append_chat_history")
             return False
-            
-        if not self.redis:
-            logger.warning("Redis not available, skipping save_chat_history")
+
+        client = self.redis
+        if not client:
+            logger.warning("Redis not available, skipping append_chat_history")
             return False
-            
+
+        messages = [m for m in messages if m.get("role") != "system"]
+        if not messages:
+            return True
+
         try:
-            key = f"chat:history:{request_id}"
-            self.redis.set(
-                key,
-                json.dumps(messages, ensure_ascii=False),
-                ex=settings.CHAT_HISTORY_EXPIRE
-            )
+            key = self._history_key(request_id)
+            max_messages = settings.CHAT_HISTORY_MAX_TURNS * 2
+            # 追加、裁剪和续期在同一次往返中完成
+            with redis_timer("append_history"):
+                async with client.pipeline(transaction=True) as pipe:
+                    pipe.rpush(key, *[history_codec.encode_message(m) for m in messages])
+                    pipe.ltrim(key, -max_messages, -1)
+                    pipe.expire(key, settings.CHAT_HISTORY_EXPIRE)
+                    pipe.expire(self._summary_key(request_id), settings.CHAT_HISTORY_EXPIRE)
+                    pipe.incr(self._version_key(request_id))
+                    pipe.expire(self._version_key(request_id), settings.CHAT_HISTORY_EXPIRE)
+                    results = await pipe.execute()
+            if settings.HISTORY_CACHE_ENABLED:
+                history_cache.append(request_id, messages, results[4], max_messages)
             return True
+        except _connection_errors() as e:
+            self._mark_unavailable(e)
+            return False
         except Exception as e:
-            logger.error(f"Error saving chat history: {str(e)}")
+            logger.error(f"Error appending chat history: {str(e)}")
             return False
 
     async def get_chat_history(self, request_id: str) -> Optional[List[Dict]]:
         """获取对话历史"""
+        history, _ = await self.get_conversation(request_id)
+        return history
+
+    async def get_conversation(self, request_id: str) -> Tuple[Optional[List[Dict]], Optional[Dict]]:
+        """在同一次往返中获取对话历史和滚动摘要"""
         if not settings.REDIS_ENABLED:
-            logger.debug("Redis is disabled, skipping get_chat_history")
-            return None
-            
-        if not self.redis:
-            logger.warning("Redis not available, skipping get_chat_history")
+            logger.debug("Redis is disabled, skipping get_conversation")
+            return None, None
+
+        client = self.redis
+        if not client:
+            logger.warning("Redis not available, skipping get_conversation")
+            return None, None
+
+        try:
+            if settings.HISTORY_CACHE_ENABLED:
+                # 本地有副本时只读版本号，一致即可直接使用
+                version = None
+                if history_cache.peek(request_id) is not None:
+                    with redis_timer("get_version"):
+                        version = self._parse_version(await client.get(self._version_key(request_id)))
+                cached = history_cache.get(request_id, version)
+                if cached is not None:
+                    return cached
+
+            with redis_timer("get_conversation"):
+                # 事务保证历史、摘要和版本号来自同一时刻
+                async with client.pipeline(transaction=True) as pipe:
+                    pipe.lrange(self._history_key(request_id), 0, -1)
+                    pipe.get(self._summary_key(request_id))
+                    pipe.get(self._legacy_history_key(request_id))
+                    pipe.get(self._version_key(request_id))
+                    items, summary, legacy, version = await pipe.execute()
+            # 新旧格式的值都由 history_codec 透明解码
+            summary = history_codec.decode(summary) if summary else None
+            history = None
+            if items:
+                history = [history_codec.decode_message(item) for item in items]
+            elif legacy:
+                history = await self._migrate_legacy_history(client, request_id, legacy)
+            if settings.HISTORY_CACHE_ENABLED and (history or summary):
+                history_cache.put(request_id, history or [], summary, self._parse_version(version))
+            return history, summary
+        except _connection_errors() as e:
+            self._mark_unavailable(e)
+            return None, None
+        except Exception as e:
+            logger.error(f"Error getting conversation: {str(e)}")
+            return None, None
+
+    async def save_summary(self, request_id: str, summary: Dict) -> bool:
+        """保存对话的滚动摘要"""
+        client = self.redis
+        if not client:
+            return False
+
+        try:
+            with redis_timer("save_summary"):
+                async with client.pipeline(transaction=True) as pipe:
+                    pipe.set(
+                        self._summary_key(request_id),
+                        history_codec.encode(summary),
+                        ex=settings.CHAT_HISTORY_EXPIRE
+                    )
+                    pipe.incr(self._version_key(request_id))
+                    pipe.expire(self._version_key(request_id), settings.CHAT_HISTORY_EXPIRE)
+                    results = await pipe.execute()
+            if settings.HISTORY_CACHE_ENABLED:
+                history_cache.update_summary(request_id, summary, results[1])
+            return True
+        except _connection_errors() as e:
+            self._mark_unavailable(e)
+            return False
+        except Exception as e:
+            logger.error(f"Error saving summary: {str(e)}")
+            return False
+
+    async def get_value(self, key: str) -> Optional[str]:
+        """读取普通字符串键"""
+        value = await self.get_bytes(key)
+        return value.decode("utf-8") if value is not None else None
+
+    async def get_bytes(self, key: str) -> Optional[bytes]:
+        """读取二进制值"""
+        client = self.redis
+        if not client:
             return None
-            
+
         try:
-            key = f"chat:history:{request_id}"
-            data = self.redis.get(key)
-            if data and isinstance(data, str):
-                return json.loads(data)
+            with redis_timer("get"):
+                return await client.get(key)
+        except _connection_errors() as e:
+            self._mark_unavailable(e)
             return None
         except Exception as e:
-            logger.error(f"Error getting chat history: {str(e)}")
+            logger.error(f"Error getting {key}: {str(e)}")
             return None
 
+    async def set_value(self, key: str, value: Union[str, bytes], expire: int) -> bool:
+        """写入带过期时间的字符串或二进制键"""
+        client = self.redis
+        if not client:
+            return False
+
+        try:
+            with redis_timer("set"):
+                await client.set(key, value, ex=expire)
+            return True
+        except _connection_errors() as e:
+            self._mark_unavailable(e)
+            return False
+        except Exception as e:
+            logger.error(f"Error setting {key}: {str(e)}")
+            return False
+
 # 创建全局 Redis 客户端实例
-redis_client = RedisClient() 
\ No newline at end of file
+redis_client = RedisClient()
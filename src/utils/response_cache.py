@@ -0,0 +1,78 @@
+import hashlib
+import json
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+from ..core.config import settings
+from ..core.model_config import ModelMapping
+from .redis_helper import redis_client
+
+logger = logging.getLogger(__name__)
+
+class LRUCache:
+    """带TTL的进程内LRU缓存"""
+
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._data: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[Any]:
+        item = self._data.get(key)
+        if item is None:
+            return None
+        expires_at, value = item
+        if expires_at < time.monotonic():
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        self._data[key] = (time.monotonic() + (ttl if ttl is not None else self.ttl), value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+class ResponseCache:
+    """两级响应缓存：进程内LRU + 共享Redis"""
+
+    KEY_PREFIX = "chat:cache:"
+
+    def __init__(self):
+        self.local = LRUCache(settings.RESPONSE_CACHE_MAX_ENTRIES, settings.RESPONSE_CACHE_TTL)
+
+    def enabled_for(self, internal_id: str) -> bool:
+        """全局开关和模型开关同时打开时才缓存"""
+        return settings.RESPONSE_CACHE_ENABLED and ModelMapping.is_cacheable(internal_id)
+
+    @staticmethod
+    def make_key(internal_id: str, params: Dict[str, Any], messages: List[Dict[str, str]]) -> str:
+        """由内部模型ID、模型参数和规范化后的消息生成缓存键"""
+        normalized = [(m.get("role", ""), (m.get("content") or "").strip()) for m in messages]
+        payload = json.dumps([internal_id, params, normalized], ensure_ascii=False, sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    async def get(self, key: str) -> Optional[str]:
+        value = self.local.get(key)
+        if value is not None:
+            return value
+
+        value = await redis_client.get_value(self.KEY_PREFIX + key)
+        if value is not None:
+            self.local.set(key, value)
+        return value
+
+    async def set(self, key: str, value: str) -> None:
+        self.local.set(key, value)
+        await redis_client.set_value(self.KEY_PREFIX + key, value, settings.RESPONSE_CACHE_TTL)
+
+# 全局响应缓存实例
+response_cache = ResponseCache()
@@ -0,0 +1,146 @@
+import asyncio
+import logging
+import random
+import time
+from email.utils import parsedate_to_datetime
+from typing import AsyncIterator, Awaitable, Callable, Optional, TypeVar
+import httpx
+from fastapi import HTTPException
+from ..core.config import settings
+from .metrics import UPSTREAM_RETRIES
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+class RetryBudget:
+    """全局重试预算：每个请求存入 ratio 个令牌，每次重试消耗一个
+
+    另按时间补充少量令牌，保证低流量时也能重试；上游整体故障时重试量被限制在请求量的 ratio 倍以内。
+    """
+
+    def __init__(self, ratio: float, min_per_second: float, burst: float):
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        self.burst = burst
+        self._balance = burst
+        self._updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._balance = min(self.burst, self._balance + (now - self._updated) * self.min_per_second)
+        self._updated = now
+
+    def record_request(self) -> None:
+        self._refill()
+        self._balance = min(self.burst, self._balance + self.ratio)
+
+    def try_spend(self) -> bool:
+        self._refill()
+        if self._balance < 1:
+            return False
+        self._balance -= 1
+        return True
+
+def upstream_cause(exc: BaseException) -> BaseException:
+    """提供商把 httpx 异常包装为 HTTPException 时（raise ... from e），取回原始异常"""
+    return exc.__cause__ if isinstance(exc, HTTPException) and exc.__cause__ is not None else exc
+
+def is_retryable(exc: BaseException) -> bool:
+    """网络错误（含超时）、429 和 5xx 视为可重试"""
+    exc = upstream_cause(exc)
+    if isinstance(exc, httpx.HTTPStatusError):
+        status = exc.response.status_code
+        return status == 429 or status >= 500
+    return isinstance(exc, httpx.TransportError)
+
+def is_client_error(exc: BaseException) -> bool:
+    """上游返回了 4xx（429 除外）：请求本身有问题，提供商仍在正常响应"""
+    cause = upstream_cause(exc)
+    if isinstance(cause, httpx.HTTPStatusError):
+        status = cause.response.status_code
+    elif cause is exc and isinstance(exc, HTTPException):
+        status = exc.status_code
+    else:
+        return False
+    return 400 <= status < 500 and status != 429
+
+def retry_after_seconds(exc: BaseException) -> Optional[float]:
+    """解析上游返回的 Retry-After（秒数或HTTP日期）"""
+    if not isinstance(exc, httpx.HTTPStatusError):
+        return None
+    value = exc.response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+def backoff_delay(attempt: int, retry_after: Optional[float] = None) -> float:
+    """指数退避加全抖动；上游给出 Retry-After 时以其为准"""
+    if retry_after is not None:
+        return retry_after
+    return random.uniform(0, min(settings.RETRY_MAX_DELAY, settings.RETRY_BASE_DELAY * 2 ** attempt))
+
+def _next_delay(exc: BaseException, attempt: int) -> Optional[float]:
+    """返回下次重试前的等待时间，不应重试时返回 None"""
+    if attempt + 1 >= settings.RETRY_MAX_ATTEMPTS or not is_retryable(exc):
+        return None
+    delay = backoff_delay(attempt, retry_after_seconds(exc))
+    if delay > settings.RETRY_MAX_DELAY:
+        # 上游要求等待的时间过长，直接失败交给降级链处理
+        return None
+    if not retry_budget.try_spend():
+        UPSTREAM_RETRIES.labels("budget_exhausted").inc()
+        logger.warning("Retry budget exhausted, not retrying: %s", exc)
+        return None
+    UPSTREAM_RETRIES.labels("retried").inc()
+    logger.warning("Retrying upstream call in %.2fs (attempt %d): %s", delay, attempt + 2, exc)
+    return delay
+
+async def call_with_retry(fn: Callable[[], Awaitable[T]]) -> T:
+    """调用上游，遇到暂时性错误时退避重试"""
+    retry_budget.record_request()
+    attempt = 0
+    while True:
+        try:
+            return await fn()
+        except Exception as e:
+            delay = _next_delay(e, attempt)
+            if delay is None:
+                raise
+        await asyncio.sleep(delay)
+        attempt += 1
+
+async def stream_with_retry(factory: Callable[[], AsyncIterator[T]]) -> AsyncIterator[T]:
+    """流式版本：只在首块之前重试，已经输出内容后出错直接抛出"""
+    retry_budget.record_request()
+    attempt = 0
+    while True:
+        started = False
+        stream = factory()
+        try:
+            async for item in stream:
+                started = True
+                yield item
+            return
+        except Exception as e:
+            delay = None if started else _next_delay(e, attempt)
+            if delay is None:
+                raise
+        finally:
+            await stream.aclose()
+        await asyncio.sleep(delay)
+        attempt += 1
+
+# 进程内共享的重试预算
+retry_budget = RetryBudget(
+    ratio=settings.RETRY_BUDGET_RATIO,
+    min_per_second=settings.RETRY_BUDGET_MIN_PER_SECOND,
+    burst=settings.RETRY_BUDGET_BURST
+)
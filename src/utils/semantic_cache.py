@@ -0,0 +1,282 @@
+"""近似重复问题的语义缓存（可选，默认关闭）
+
+只用于单轮请求（除系统提示语外没有历史）。问题文本用哈希字符 n-gram 编码为定长向量，
+在每个模型各自的向量矩阵中求余弦相似度，超过阈值即直接返回缓存的回复。
+n-gram 只反映字面相似，数字或否定词不同的问题也可能很接近，阈值应保守设置。
+numpy 为可选依赖，首次使用时才导入；未安装时该功能不生效。
+"""
+import functools
+import importlib.util
+import io
+import logging
+import os
+import re
+import time
+import zlib
+from typing import Dict, List, Optional, Tuple
+from ..core.config import settings
+from ..core.model_config import ModelMapping
+from .metrics import SEMANTIC_CACHE_LATENCY, SEMANTIC_CACHE_LOOKUPS
+from .redis_helper import redis_client
+
+logger = logging.getLogger(__name__)
+
+HAS_NUMPY = importlib.util.find_spec("numpy") is not None
+
+NGRAM_SIZES = (2, 3)
+# 索引矩阵的初始行数，写满后按倍数扩容直到容量上限
+INITIAL_ROWS = 64
+# 相似度达到该值视为同一个问题，覆盖原条目而不是新增
+DUPLICATE_SCORE = 0.999
+
+_SEPARATORS = re.compile(r"[\W_]+")
+
+@functools.lru_cache(maxsize=None)
+def _numpy():
+    import numpy
+    return numpy
+
+def normalize(text: str) -> str:
+    """小写化，标点和连续空白折叠为单个空格"""
+    return _SEPARATORS.sub(" ", text.lower()).strip()
+
+def embed(text: str, dim: int):
+    """哈希字符 n-gram 向量（带符号哈希，L2归一化，float32）"""
+    np = _numpy()
+    text = normalize(text)
+    grams = [text[i:i + n] for n in NGRAM_SIZES for i in range(len(text) - n + 1)] or [text]
+    hashes = np.fromiter((zlib.crc32(g.encode("utf-8")) for g in grams), dtype=np.uint32, count=len(grams))
+    signs = np.where(hashes & 0x80000000, -1.0, 1.0)
+    vector = np.bincount(hashes % dim, weights=signs, minlength=dim).astype(np.float32)
+    norm = float(np.linalg.norm(vector))
+    if norm:
+        vector /= norm
+    return vector
+
+class VectorIndex:
+    """单个模型的向量索引：按需扩容的矩阵，写满后优先淘汰过期条目，其次淘汰最久未命中的条目
+
+    矩阵按维度存放（dim × 行数）。n-gram 向量是稀疏的，查询时只取查询向量非零维对应的几十行参与计算，
+    读取的数据量远小于整个矩阵。
+    """
+
+    def __init__(self, dim: int, capacity: int):
+        np = _numpy()
+        self.dim = dim
+        self.capacity = capacity
+        rows = min(INITIAL_ROWS, capacity)
+        self.vectors = np.zeros((dim, rows), dtype=np.float32)
+        self.expires = np.zeros(rows, dtype=np.float64)
+        self.last_used = np.zeros(rows, dtype=np.int64)
+        self.values: List[Optional[str]] = []
+        self.size = 0
+        self._tick = 0
+
+    def __len__(self) -> int:
+        return sum(1 for v in self.values if v is not None)
+
+    def _scores(self, vector):
+        dims = vector.nonzero()[0]
+        return vector[dims] @ self.vectors[dims, :self.size]
+
+    def search(self, vector, threshold: float, now: float) -> Tuple[Optional[str], Optional[int]]:
+        """返回 (超过阈值且未过期的最相似条目, 可被同一问题覆盖的槽位)"""
+        if not self.size:
+            return None, None
+        scores = self._scores(vector)
+        # 通常只有极少数行超过阈值，在这些行里排除过期条目，过期的最佳匹配不会挡住次佳的有效条目
+        candidates = (scores >= threshold).nonzero()[0]
+        if not len(candidates):
+            return None, None
+        duplicate = candidates[scores[candidates] >= DUPLICATE_SCORE]
+        duplicate = int(duplicate[0]) if len(duplicate) else None
+        candidates = candidates[self.expires[candidates] > now]
+        if not len(candidates):
+            return None, duplicate
+        slot = int(candidates[scores[candidates].argmax()])
+        self._tick += 1
+        self.last_used[slot] = self._tick
+        return self.values[slot], duplicate
+
+    def _grow(self) -> None:
+        np = _numpy()
+        rows = min(self.vectors.shape[1] * 2, self.capacity)
+        extra = rows - self.vectors.shape[1]
+        self.vectors = np.hstack([self.vectors, np.zeros((self.dim, extra), dtype=np.float32)])
+        self.expires = np.concatenate([self.expires, np.zeros(extra)])
+        self.last_used = np.concatenate([self.last_used, np.zeros(extra, dtype=np.int64)])
+
+    def _free_slot(self, now: float) -> int:
+        np = _numpy()
+        if self.size < self.capacity:
+            if self.size == self.vectors.shape[1]:
+                self._grow()
+            self.values.append(None)
+            self.size += 1
+            return self.size - 1
+        expired = np.flatnonzero(self.expires[:self.size] <= now)
+        if len(expired):
+            return int(expired[0])
+        return int(self.last_used[:self.size].argmin())
+
+    def add(self, vector, value: str, expires_at: float, now: float, slot: Optional[int] = None) -> None:
+        """写入条目；slot 为 search() 找到的同一问题的槽位，仍是该问题时覆盖，不再扫描整个矩阵"""
+        if slot is None or slot >= self.size or float(self.vectors[:, slot] @ vector) < DUPLICATE_SCORE:
+            slot = self._free_slot(now)
+        self._tick += 1
+        self.vectors[:, slot] = vector
+        self.expires[slot] = expires_at
+        self.last_used[slot] = self._tick
+        self.values[slot] = value
+
+    def dump(self) -> bytes:
+        """序列化为 npz（不使用 pickle）；回复按 UTF-8 拼接并记录偏移，避免定长字符串数组按最长回复补齐"""
+        np = _numpy()
+        encoded = [(v or "").encode("utf-8") for v in self.values]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(e) for e in encoded], out=offsets[1:])
+        buffer = io.BytesIO()
+        np.savez_compressed(
+            buffer,
+            vectors=self.vectors[:, :self.size].T,
+            expires=self.expires[:self.size],
+            values=np.frombuffer(b"".join(encoded), dtype=np.uint8),
+            offsets=offsets,
+        )
+        return buffer.getvalue()
+
+    def restore(self, data: bytes, now: float) -> int:
+        """用 dump() 的数据替换索引内容，跳过过期条目，维度不一致时忽略；返回载入条数"""
+        np = _numpy()
+        with np.load(io.BytesIO(data), allow_pickle=False) as archive:
+            vectors, expires = archive["vectors"], archive["expires"]
+            blob, offsets = archive["values"].tobytes(), archive["offsets"]
+        if vectors.ndim != 2 or vectors.shape[1] != self.dim:
+            logger.warning("Semantic cache snapshot has dim %s, expected %d, ignored", vectors.shape[1:], self.dim)
+            return 0
+        keep = ((expires > now) & (offsets[1:] > offsets[:-1])).nonzero()[0][-self.capacity:]
+        count = len(keep)
+        while self.vectors.shape[1] < count:
+            self._grow()
+        self.vectors[:] = 0
+        self.vectors[:, :count] = vectors[keep].T
+        self.expires[:count] = expires[keep]
+        self.last_used[:] = 0
+        self.values = [blob[offsets[i]:offsets[i + 1]].decode("utf-8") for i in keep]
+        self.size = count
+        return count
+
+class SemanticLookup:
+    """一次查询的结果；未命中时由 store() 复用已计算的向量和找到的槽位写入回复"""
+
+    __slots__ = ("internal_id", "vector", "value", "slot")
+
+    def __init__(self, internal_id: str, vector, value: Optional[str], slot: Optional[int]):
+        self.internal_id = internal_id
+        self.vector = vector
+        self.value = value
+        self.slot = slot
+
+class SemanticCache:
+    """按内部模型ID划分命名空间的进程内语义缓存，可选快照到磁盘或Redis"""
+
+    KEY_PREFIX = "chat:semantic:"
+
+    def __init__(self):
+        self._indexes: Dict[str, VectorIndex] = {}
+        self._warned = False
+
+    def enabled_for(self, internal_id: str) -> bool:
+        if not settings.SEMANTIC_CACHE_ENABLED or not ModelMapping.is_cacheable(internal_id):
+            return False
+        if not HAS_NUMPY:
+            if not self._warned:
+                logger.warning("SEMANTIC_CACHE_ENABLED is set but numpy is not installed, semantic cache disabled")
+                self._warned = True
+            return False
+        return True
+
+    @staticmethod
+    def is_single_turn(messages: List[Dict[str, str]]) -> bool:
+        """除最后一条用户消息外只有系统提示语"""
+        return all(m.get("role") == "system" for m in messages[:-1])
+
+    def _index(self, internal_id: str) -> VectorIndex:
+        index = self._indexes.get(internal_id)
+        if index is None:
+            index = self._indexes[internal_id] = VectorIndex(
+                settings.SEMANTIC_CACHE_DIM, settings.SEMANTIC_CACHE_MAX_ENTRIES
+            )
+        return index
+
+    def lookup(self, internal_id: str, text: str) -> SemanticLookup:
+        started = time.perf_counter()
+        vector = embed(text, settings.SEMANTIC_CACHE_DIM)
+        value, slot = self._index(internal_id).search(vector, settings.SEMANTIC_CACHE_THRESHOLD, time.time())
+        SEMANTIC_CACHE_LATENCY.labels(internal_id).observe(time.perf_counter() - started)
+        SEMANTIC_CACHE_LOOKUPS.labels(internal_id, "hit" if value is not None else "miss").inc()
+        return SemanticLookup(internal_id, vector, value, slot)
+
+    def store(self, lookup: SemanticLookup, value: str) -> None:
+        now = time.time()
+        self._index(lookup.internal_id).add(
+            lookup.vector, value, now + settings.SEMANTIC_CACHE_TTL, now, lookup.slot
+        )
+
+    def clear(self) -> None:
+        self._indexes.clear()
+
+    def _snapshot_path(self, internal_id: str) -> str:
+        return os.path.join(settings.SEMANTIC_CACHE_PERSIST_PATH, f"{internal_id}.npz")
+
+    async def _read_snapshot(self, internal_id: str) -> Optional[bytes]:
+        if settings.SEMANTIC_CACHE_PERSIST == "redis":
+            return await redis_client.get_bytes(self.KEY_PREFIX + internal_id)
+        path = self._snapshot_path(internal_id)
+        if not os.path.exists(path):
+            return None
+        with open(path, "rb") as f:
+            return f.read()
+
+    async def _write_snapshot(self, internal_id: str, data: bytes) -> None:
+        if settings.SEMANTIC_CACHE_PERSIST == "redis":
+            await redis_client.set_value(self.KEY_PREFIX + internal_id, data, settings.SEMANTIC_CACHE_TTL)
+            return
+        path = self._snapshot_path(internal_id)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # 先写临时文件再替换，避免进程中途退出留下半个快照
+        tmp = f"{path}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+    async def load(self) -> None:
+        """启动时载入快照（SEMANTIC_CACHE_PERSIST 为 disk 或 redis 时）"""
+        if not settings.SEMANTIC_CACHE_ENABLED or not settings.SEMANTIC_CACHE_PERSIST or not HAS_NUMPY:
+            return
+        now = time.time()
+        for internal_id in ModelMapping.MODEL_MAP:
+            if not ModelMapping.is_cacheable(internal_id):
+                continue
+            try:
+                data = await self._read_snapshot(internal_id)
+                if data:
+                    loaded = self._index(internal_id).restore(data, now)
+                    logger.info("Loaded %d semantic cache entries for %s", loaded, internal_id)
+            except Exception as e:
+                logger.warning("Failed to load semantic cache for %s: %s", internal_id, e)
+
+    async def save(self) -> None:
+        """关闭时写出快照"""
+        if not settings.SEMANTIC_CACHE_PERSIST:
+            return
+        for internal_id, index in self._indexes.items():
+            if not index.size:
+                continue
+            try:
+                await self._write_snapshot(internal_id, index.dump())
+            except Exception as e:
+                logger.warning("Failed to save semantic cache for %s: %s", internal_id, e)
+
+# 全局语义缓存实例
+semantic_cache = SemanticCache()
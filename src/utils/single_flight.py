@@ -0,0 +1,123 @@
+import asyncio
+import logging
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+class _Call:
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+class SingleFlight:
+    """合并相同key的并发调用：同一时刻只有一个上游调用，其余请求等待并共享结果"""
+
+    def __init__(self):
+        self._calls: Dict[str, _Call] = {}
+
+    def in_flight(self, key: str) -> bool:
+        return key in self._calls
+
+    def _forget(self, key: str, call: _Call) -> None:
+        if self._calls.get(key) is call:
+            del self._calls[key]
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[T]], timeout: Optional[float] = None) -> T:
+        """执行或加入key对应的调用；超时只影响当前等待者"""
+        call = self._calls.get(key)
+        if call is None:
+            call = _Call(asyncio.create_task(fn()))
+            self._calls[key] = call
+            call.task.add_done_callback(lambda _: self._forget(key, call))
+        else:
+            logger.debug("Joined in-flight call %s", key)
+
+        call.waiters += 1
+        try:
+            # shield 保证单个等待者超时或取消时不会取消共享的上游调用
+            return await asyncio.wait_for(asyncio.shield(call.task), timeout)
+        finally:
+            call.waiters -= 1
+            if call.waiters == 0 and not call.task.done():
+                # 最后一个等待者离开，上游结果已无人需要
+                call.task.cancel()
+                self._forget(key, call)
+
+class _Stream:
+    __slots__ = ("buffer", "done", "error", "changed", "task", "subscribers")
+
+    def __init__(self):
+        self.buffer: List[Any] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.changed = asyncio.Event()
+        self.task: Optional[asyncio.Task] = None
+        self.subscribers = 0
+
+    def notify(self) -> None:
+        changed, self.changed = self.changed, asyncio.Event()
+        changed.set()
+
+class StreamFlight:
+    """合并相同key的并发流：首个请求驱动上游，后加入者先回放已缓冲的块再跟随新块"""
+
+    def __init__(self):
+        self._streams: Dict[str, _Stream] = {}
+
+    def in_flight(self, key: str) -> bool:
+        return key in self._streams
+
+    def _forget(self, key: str, stream: _Stream) -> None:
+        if self._streams.get(key) is stream:
+            del self._streams[key]
+
+    async def _pump(self, key: str, stream: _Stream, factory: Callable[[], AsyncIterator[T]]) -> None:
+        try:
+            async for item in factory():
+                stream.buffer.append(item)
+                stream.notify()
+        except asyncio.CancelledError:
+            stream.error = asyncio.CancelledError()
+            raise
+        except Exception as e:
+            stream.error = e
+        finally:
+            stream.done = True
+            self._forget(key, stream)
+            stream.notify()
+
+    async def subscribe(self, key: str, factory: Callable[[], AsyncIterator[T]]) -> AsyncIterator[T]:
+        """订阅key对应的流，必要时启动上游"""
+        stream = self._streams.get(key)
+        if stream is None:
+            stream = _Stream()
+            self._streams[key] = stream
+            stream.task = asyncio.create_task(self._pump(key, stream, factory))
+        else:
+            logger.debug("Joined in-flight stream %s with %d buffered chunks", key, len(stream.buffer))
+
+        stream.subscribers += 1
+        index = 0
+        try:
+            while True:
+                while index < len(stream.buffer):
+                    yield stream.buffer[index]
+                    index += 1
+                if stream.done:
+                    if stream.error is not None:
+                        raise stream.error
+                    return
+                await stream.changed.wait()
+        finally:
+            stream.subscribers -= 1
+            if stream.subscribers == 0 and not stream.done:
+                stream.task.cancel()
+                self._forget(key, stream)
+
+# 全局实例
+single_flight = SingleFlight()
+stream_flight = StreamFlight()
@@ -1,13 +1,50 @@
+import json
 import os
 import sys
+import httpx
 import pytest
+from unittest.mock import AsyncMock
 
 # 获取项目根目录的绝对路径
 PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
 sys.path.insert(0, PROJECT_ROOT)
 
 @pytest.fixture(autouse=True)
-def env_setup():
+def env_setup(monkeypatch):
     """设置测试环境变量"""
     os.environ["DASHSCOPE_API_KEY"] = "test_api_key"
-    os.environ["SECRET_KEY"] = "test_secret_key" 
\ No newline at end of file
+    os.environ["SECRET_KEY"] = "test_secret_key"
+
+    # settings 在导入时已经实例化，需要同步更新到实例上
+    from src.core.config import settings
+    monkeypatch.setattr(settings, "DASHSCOPE_API_KEY", "test_api_key")
+    monkeypatch.setattr(settings, "BAICHUAN_API_KEY", "test_baichuan_key")
+    monkeypatch.setattr(settings, "BAICHUAN_SECRET_KEY", "test_baichuan_secret")
+    monkeypatch.setattr(settings, "REDIS_ENABLED", False)
+
+def sse(tokens) -> bytes:
+    """OpenAI 兼容格式的流式事件（不含结尾的 [DONE]）"""
+    events = [{"choices": [{"delta": {"content": t}, "finish_reason": None}]} for t in tokens]
+    return "".join(f"data: {json.dumps(e, ensure_ascii=False)}\n\n" for e in events).encode()
+
+@pytest.fixture
+def mock_provider():
+    """在HTTP层模拟上游：mock_provider(handler, "tongyi") 用 MockTransport 替换提供商单例的客户端"""
+    from src.providers.factory import ProviderFactory
+
+    def install(handler, provider_type: str = "tongyi"):
+        provider = ProviderFactory.create(provider_type)
+        provider._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        return provider
+
+    ProviderFactory._instances.clear()
+    yield install
+    ProviderFactory._instances.clear()
+
+@pytest.fixture
+def saved(monkeypatch):
+    """替换对话历史写入，返回记录调用参数的 AsyncMock"""
+    from src.utils.redis_helper import redis_client
+    append = AsyncMock(return_value=True)
+    monkeypatch.setattr(redis_client, "append_chat_history", append)
+    return append
@@ -1,5 +1,8 @@
+import asyncio
+import json
 import pytest
-from unittest.mock import AsyncMock, patch
+import pytest_asyncio
+from unittest.mock import AsyncMock, MagicMock, patch
 from src.providers.baichuan import BaichuanProvider
 
 @pytest.fixture
@@ -18,17 +21,71 @@ def mock_baichuan_response():
         }
     }
 
+@pytest_asyncio.fixture
+async def sse_server():
+    """本地模拟 SSE 服务，返回 (base_url, 收到的请求体列表)"""
+    tokens = ["你好", "，我是", "百川"]
+    requests = []
+
+    async def handle(reader, writer):
+        head = await reader.readuntil(b"\r\n\r\n")
+        length = 0
+        for line in head.decode().split("\r\n"):
+            if line.lower().startswith("content-length:"):
+                length = int(line.split(":", 1)[1])
+        requests.append(json.loads(await reader.readexactly(length)))
+
+        writer.write(
+            b"HTTP/1.1 200 OK\r\n"
+            b"Content-Type: text/event-stream\r\n"
+            b"Connection: close\r\n\r\n"
+        )
+        for i, token in enumerate(tokens):
+            event = {"choices": [{
+                "delta": {"content": token},
+                "finish_reason": "stop" if i == len(tokens) - 1 else None
+            }]}
+            writer.write(f"data: {json.dumps(event, ensure_ascii=False)}\n\n".encode())
+            await writer.drain()
+        writer.write(b"data: [DONE]\n\n")
+        await writer.drain()
+        writer.close()
+
+    server = await asyncio.start_server(handle, "127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+    yield f"http://127.0.0.1:{port}", requests
+    server.close()
+    await server.wait_closed()
+
 @pytest.mark.asyncio
-async def test_baichuan_chat():
+async def test_baichuan_chat(mock_baichuan_response):
     provider = BaichuanProvider()
     with patch('httpx.AsyncClient.post', new_callable=AsyncMock) as mock_post:
+        mock_post.return_value = MagicMock()
         mock_post.return_value.json.return_value = mock_baichuan_response
-        mock_post.return_value.raise_for_status = AsyncMock()
-        
+
         response = await provider.chat([{
             "role": "user",
             "content": "你好"
         }], "Baichuan2-53B")
-        
+
         assert response.content == "这是百川的测试回复"
-        assert response.raw_response == mock_baichuan_response 
\ No newline at end of file
+        assert response.raw_response == mock_baichuan_response
+    await provider.aclose()
+
+@pytest.mark.asyncio
+async def test_baichuan_stream_chat(sse_server):
+    base_url, requests = sse_server
+    provider = BaichuanProvider()
+    provider.base_url = base_url
+
+    chunks = [chunk async for chunk in provider.stream_chat([{
+        "role": "user",
+        "content": "你好"
+    }], "Baichuan2-Turbo")]
+    await provider.aclose()
+
+    assert [chunk.content for chunk in chunks] == ["你好", "，我是", "百川"]
+    assert [chunk.done for chunk in chunks] == [False, False, True]
+    assert requests[0]["stream"] is True
+    assert requests[0]["model"] == "Baichuan2-Turbo"
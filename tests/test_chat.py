@@ -1,8 +1,9 @@
+import json
+import httpx
 import pytest
 from fastapi.testclient import TestClient
 from src.main import app
-from src.providers.tongyi import TongyiProvider
-from unittest.mock import AsyncMock, patch
+from .conftest import sse
 
 client = TestClient(app)
 
@@ -10,7 +11,13 @@ client = TestClient(app)
 def mock_tongyi_response():
     return {
         "output": {
-            "text": "这是一个测试回复"
+            "choices": [{
+                "finish_reason": "stop",
+                "message": {
+                    "role": "assistant",
+                    "content": "这是一个测试回复"
+                }
+            }]
         },
         "request_id": "test_request_id",
         "usage": {
@@ -18,32 +25,69 @@ def mock_tongyi_response():
         }
     }
 
-@pytest.mark.asyncio
-async def test_chat_endpoint(mock_tongyi_response):
-    with patch.object(
-        TongyiProvider,
-        'chat',
-        new_callable=AsyncMock,
-        return_value=mock_tongyi_response
-    ) as mock_chat:
-        response = client.post(
-            "/api/v1/chat",
-            json={
-                "messages": [
-                    {
-                        "role": "user",
-                        "content": "你好"
-                    }
-                ]
-            }
-        )
-        
-        assert response.status_code == 200
-        data = response.json()
-        assert data["response"] == "这是一个测试回复"
-        assert data["request_id"] == "test_request_id"
-        assert "usage" in data
-        mock_chat.assert_called_once()
+@pytest.fixture
+def upstream(mock_provider, mock_tongyi_response):
+    """在HTTP层模拟通义千问上游，返回收到的请求列表"""
+    requests = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        body = json.loads(request.content)
+        requests.append((request.url.path, body))
+        if body.get("stream"):
+            return httpx.Response(200, content=sse(["你", "好"]) + b"data: [DONE]\n\n")
+        return httpx.Response(200, json=mock_tongyi_response)
+
+    mock_provider(handler)
+    return requests
+
+def test_chat_endpoint(upstream):
+    response = client.post(
+        "/api/v1/chat",
+        json={
+            "content": "你好",
+            "provider_id": "model_001"
+        }
+    )
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["code"] == 200
+    assert data["response"] == "这是一个测试回复"
+    assert data["request_id"]
+    assert data["model"] == "model_001"
+
+    path, body = upstream[0]
+    assert path.endswith("/services/aigc/text-generation/generation")
+    assert body["model"] == "qwen-plus"
+    assert body["input"]["messages"][0]["role"] == "system"
+    assert body["input"]["messages"][-1] == {"role": "user", "content": "你好"}
+
+def test_stream_endpoint(upstream):
+    response = client.post(
+        "/api/v1/chat/stream",
+        json={
+            "content": "你好",
+            "provider_id": "model_001"
+        }
+    )
+
+    assert response.status_code == 200
+    events = [line[6:] for line in response.text.split("\n") if line.startswith("data: ")]
+    assert events[-1] == "[DONE]"
+    payloads = [json.loads(e) for e in events[:-1]]
+    assert payloads[0]["request_id"]
+    assert payloads[1] == {"model": "model_001"}
+    assert "".join(p.get("content", "") for p in payloads[1:]) == "你好"
+
+def test_invalid_model():
+    response = client.post(
+        "/api/v1/chat",
+        json={
+            "content": "你好",
+            "provider_id": "unknown"
+        }
+    )
+    assert response.status_code == 400
 
 def test_list_models():
     response = client.get("/api/v1/models")
@@ -51,4 +95,28 @@ def test_list_models():
     data = response.json()
     assert "models" in data
     assert len(data["models"]) > 0
-    assert data["models"][0]["id"] == "qwen-plus" 
\ No newline at end of file
+    assert data["models"][0]["id"] == "model_001"
+
+def test_batch_endpoint(upstream):
+    response = client.post(
+        "/api/v1/chat/batch",
+        json={"items": [
+            {"content": "你好", "provider_id": "model_001"},
+            {"content": "你好", "provider_id": "unknown"},
+            {"content": "再见", "provider_id": "model_001"},
+        ]}
+    )
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    results = {r["index"]: r for r in map(json.loads, response.text.splitlines())}
+    assert sorted(results) == [0, 1, 2]
+    assert results[0]["code"] == 200
+    assert results[0]["response"] == "这是一个测试回复"
+    assert results[1]["code"] == 400
+    assert results[2]["code"] == 200
+    assert len(upstream) == 2
+
+def test_batch_rejects_empty():
+    response = client.post("/api/v1/chat/batch", json={"items": []})
+    assert response.status_code == 422
@@ -0,0 +1,117 @@
+import asyncio
+import json
+import pytest
+from fastapi.testclient import TestClient
+from src.main import app
+from src.utils import concurrency
+from src.utils.concurrency import ConcurrencyLimiter, LimiterRegistry, OverloadedError, background_queueing
+
+client = TestClient(app)
+
+@pytest.mark.asyncio
+async def test_waiters_get_slot_after_release():
+    limiter = ConcurrencyLimiter("test", limit=1, max_queue=1, queue_timeout=1.0)
+    await limiter.acquire()
+    waiter = asyncio.create_task(limiter.acquire())
+    await asyncio.sleep(0)
+    assert limiter.waiting == 1
+
+    limiter.release()
+    await waiter
+    assert limiter.active == 1
+    assert limiter.waiting == 0
+
+@pytest.mark.asyncio
+async def test_full_queue_fails_fast():
+    limiter = ConcurrencyLimiter("test", limit=1, max_queue=1, queue_timeout=1.0)
+    await limiter.acquire()
+    waiter = asyncio.create_task(limiter.acquire())
+    await asyncio.sleep(0)
+
+    with pytest.raises(OverloadedError):
+        await limiter.acquire()
+    waiter.cancel()
+
+@pytest.mark.asyncio
+async def test_background_waiters_bypass_queue_limit():
+    limiter = ConcurrencyLimiter("test", limit=1, max_queue=0, queue_timeout=0.01)
+    await limiter.acquire()
+    with pytest.raises(OverloadedError):
+        await limiter.acquire()
+
+    with background_queueing(1.0):
+        waiter = asyncio.create_task(limiter.acquire())
+    await asyncio.sleep(0.05)
+    # 超过交互请求的排队时间后仍在等待
+    assert not waiter.done()
+    assert limiter.waiting == 1
+    limiter.release()
+    await waiter
+    assert limiter.active == 1
+
+    with background_queueing(0.01), pytest.raises(OverloadedError):
+        await limiter.acquire()
+    assert limiter.waiting == 0
+
+@pytest.mark.asyncio
+async def test_queue_deadline():
+    limiter = ConcurrencyLimiter("test", limit=1, max_queue=10, queue_timeout=0.01)
+    await limiter.acquire()
+    with pytest.raises(OverloadedError):
+        await limiter.acquire()
+    assert limiter.waiting == 0
+
+@pytest.mark.asyncio
+async def test_registry_applies_model_and_provider_limits(monkeypatch):
+    monkeypatch.setattr(concurrency.settings, "PROVIDER_MAX_CONCURRENCY", {"tongyi": 1})
+    monkeypatch.setattr(concurrency.settings, "UPSTREAM_QUEUE_TIMEOUT", 0.01)
+    registry = LimiterRegistry()
+
+    permit = await registry.acquire("tongyi", "model_002")
+    # 另一个模型同样受提供商上限约束
+    with pytest.raises(OverloadedError):
+        await registry.acquire("tongyi", "model_001")
+    stats = registry.stats()
+    assert stats["model:model_002"]["active"] == 1
+    assert "model:model_001" not in stats
+
+    permit.release()
+    permit.release()
+    assert registry.stats()["provider:tongyi"]["active"] == 0
+
+def test_overloaded_returns_429(monkeypatch):
+    async def overloaded(provider_type, internal_id):
+        raise OverloadedError(f"provider:{provider_type}", 3)
+
+    monkeypatch.setattr(concurrency.limiters, "acquire", overloaded)
+    for path in ("/api/v1/chat", "/api/v1/chat/stream"):
+        response = client.post(path, json={"content": "你好", "provider_id": "model_001"})
+        assert response.status_code == 429
+        assert response.headers["Retry-After"] == "3"
+
+def test_concurrent_batches_queue_for_provider_slots(monkeypatch, mock_provider):
+    import httpx
+    from concurrent.futures import ThreadPoolExecutor
+
+    monkeypatch.setattr(concurrency.settings, "PROVIDER_MAX_CONCURRENCY", {"tongyi": 1})
+    monkeypatch.setattr(concurrency.settings, "UPSTREAM_MAX_QUEUE", 0)
+    monkeypatch.setattr(concurrency.settings, "UPSTREAM_QUEUE_TIMEOUT", 0.01)
+    monkeypatch.setattr(concurrency.limiters, "_limiters", {})
+
+    async def handler(request):
+        await asyncio.sleep(0.02)
+        return httpx.Response(200, json={
+            "output": {"choices": [{"message": {"role": "assistant", "content": "好的"}}]}
+        })
+
+    mock_provider(handler)
+
+    def batch(n):
+        items = [{"content": f"批次{n}问题{i}", "provider_id": "model_001"} for i in range(3)]
+        return client.post("/api/v1/chat/batch", json={"items": items})
+
+    # 两个批量请求同时进行，总并行度超过提供商上限，条目排队而不是返回429
+    with ThreadPoolExecutor(2) as pool:
+        responses = list(pool.map(batch, range(2)))
+    codes = [json.loads(line)["code"] for r in responses for line in r.text.splitlines()]
+    assert codes == [200] * 6
@@ -0,0 +1,107 @@
+import asyncio
+import pytest
+from unittest.mock import AsyncMock
+from src.core.model_config import ModelMapping
+from src.providers.base import ProviderResponse
+from src.providers.factory import ProviderFactory
+from src.utils import context_manager as cm
+from src.utils.context_manager import (
+    ContextManager,
+    estimate_tokens,
+    message_fingerprint,
+    select_window,
+)
+
+def make_history(turns: int, size: int = 200) -> list:
+    history = []
+    for i in range(turns):
+        history.append({"role": "user", "content": f"问题{i}" + "问" * size})
+        history.append({"role": "assistant", "content": f"回答{i}" + "答" * size})
+    return history
+
+def test_estimate_tokens():
+    assert estimate_tokens("") == 0
+    assert estimate_tokens("你好") == 2
+    assert estimate_tokens("hello world") == 3
+    assert estimate_tokens("你好 world") == 4
+
+def test_select_window_keeps_newest_turns():
+    history = make_history(10)
+    start = select_window(history, 500)
+    assert 0 < start < len(history)
+    assert history[start]["role"] == "user"
+    assert history[-1] in history[start:]
+    assert select_window(history, 10 ** 6) == 0
+
+@pytest.mark.asyncio
+async def test_build_messages_trims_and_compacts(monkeypatch):
+    history = make_history(30)
+    monkeypatch.setattr(cm.redis_client, "get_conversation", AsyncMock(return_value=(history, None)))
+    save_summary = AsyncMock(return_value=True)
+    monkeypatch.setattr(cm.redis_client, "save_summary", save_summary)
+
+    summarizer = AsyncMock()
+    summarizer.chat = AsyncMock(return_value=ProviderResponse(content="摘要", raw_response={}))
+    summary_provider = ModelMapping.get_model_info(ModelMapping.SUMMARY_MODEL)["provider"]
+    monkeypatch.setitem(ProviderFactory._instances, summary_provider, summarizer)
+
+    manager = ContextManager()
+    messages = await manager.build_messages("model_001", "conv-1", "新问题")
+
+    assert messages[0]["role"] == "system"
+    assert messages[-1] == {"role": "user", "content": "新问题"}
+    assert len(messages) - 2 < len(history)
+    assert sum(estimate_tokens(m["content"]) for m in messages) <= ModelMapping.get_context_budget("model_001")
+
+    await asyncio.gather(*manager._tasks)
+    summarizer.chat.assert_awaited_once()
+    saved = save_summary.await_args.args[1]
+    assert saved["text"] == "摘要"
+    dropped = len(history) - (len(messages) - 2)
+    assert saved["last"] == message_fingerprint(history[dropped - 1])
+
+@pytest.mark.asyncio
+async def test_build_messages_uses_existing_summary(monkeypatch):
+    history = make_history(30)
+    # 与 assemble 相同的预算计算，得到拼接摘要后的窗口起点
+    budget = (
+        ModelMapping.get_context_budget("model_001")
+        - estimate_tokens((ModelMapping.get_system_prompt("model_001") or "") + cm.SUMMARY_PREFIX + "旧摘要")
+        - estimate_tokens("继续") - cm.MESSAGE_OVERHEAD_TOKENS
+    )
+    start = select_window(history, budget)
+    summary = {"text": "旧摘要", "last": message_fingerprint(history[start - 1])}
+    monkeypatch.setattr(cm.redis_client, "get_conversation", AsyncMock(return_value=(history, summary)))
+
+    manager = ContextManager()
+    messages = await manager.build_messages("model_001", "conv-2", "继续")
+
+    assert "旧摘要" in messages[0]["content"]
+    # 摘要已覆盖全部被裁掉的消息，不再触发压缩
+    assert not manager._tasks
+
+def test_uncovered_ignores_matches_inside_window():
+    a, b, c = ({"role": "user", "content": t} for t in ("甲", "乙", "丙"))
+    history = [a, b, c, {"role": "assistant", "content": "丁"}, b]
+    manager = ContextManager()
+    # 窗口内重复出现的消息不能当作摘要的覆盖位置
+    assert manager._uncovered(history, 3, {"text": "摘要", "last": message_fingerprint(b)}) == [c]
+    assert manager._uncovered(history, 3, {"text": "摘要", "last": message_fingerprint(c)}) == []
+
+@pytest.mark.asyncio
+async def test_compaction_respects_circuit_breaker(monkeypatch):
+    summary_provider = ModelMapping.get_model_info(ModelMapping.SUMMARY_MODEL)["provider"]
+    breaker = cm.breakers.get(summary_provider)
+    monkeypatch.setattr(breaker, "state", "open")
+    monkeypatch.setattr(breaker, "_opened_at", float("inf"))
+    summarizer = AsyncMock()
+    monkeypatch.setitem(ProviderFactory._instances, summary_provider, summarizer)
+    save_summary = AsyncMock(return_value=True)
+    monkeypatch.setattr(cm.redis_client, "save_summary", save_summary)
+
+    manager = ContextManager()
+    await manager._compact("conv-3", make_history(2), None)
+
+    summarizer.chat.assert_not_awaited()
+    save_summary.assert_not_awaited()
+    assert "conv-3" not in manager._compacting
@@ -0,0 +1,149 @@
+import asyncio
+import httpx
+import pytest
+from fastapi import HTTPException
+from src.core.model_config import ModelMapping
+from src.utils import fallback
+from src.utils.concurrency import OverloadedError
+from src.utils.fallback import hedged_call, hedged_stream
+
+def test_fallback_chain():
+    assert ModelMapping.get_fallback_chain("model_002") == ["model_002", "model_001", "model_004"]
+    assert ModelMapping.get_fallback_chain("model_001") == ["model_001"]
+
+@pytest.mark.asyncio
+async def test_falls_back_on_error():
+    calls = []
+
+    async def call(internal_id):
+        calls.append(internal_id)
+        if internal_id == "a":
+            raise httpx.ConnectError("down")
+        return f"reply from {internal_id}"
+
+    served, result = await hedged_call(["a", "b", "c"], call)
+    assert served == "b"
+    assert result == "reply from b"
+    assert calls == ["a", "b"]
+
+@pytest.mark.asyncio
+async def test_all_candidates_fail():
+    async def call(internal_id):
+        raise OverloadedError(internal_id, 1)
+
+    with pytest.raises(OverloadedError, match="b"):
+        await hedged_call(["a", "b"], call)
+
+@pytest.mark.asyncio
+async def test_hedge_cancels_slow_primary():
+    cancelled = asyncio.Event()
+
+    async def call(internal_id):
+        if internal_id == "slow":
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+        return internal_id
+
+    served, result = await hedged_call(["slow", "fast"], call, hedge_after=0.01)
+    assert (served, result) == ("fast", "fast")
+    assert cancelled.is_set()
+
+@pytest.mark.asyncio
+async def test_primary_within_threshold_is_not_hedged():
+    calls = []
+
+    async def call(internal_id):
+        calls.append(internal_id)
+        await asyncio.sleep(0.01)
+        return internal_id
+
+    served, _ = await hedged_call(["a", "b"], call, hedge_after=1.0)
+    assert served == "a"
+    assert calls == ["a"]
+
+@pytest.mark.asyncio
+async def test_stream_hedges_on_first_token():
+    closed = []
+
+    async def factory(internal_id):
+        try:
+            if internal_id == "slow":
+                await asyncio.sleep(10)
+            for token in ("你", "好"):
+                yield token
+        finally:
+            closed.append(internal_id)
+
+    chunks = [item async for item in hedged_stream(["slow", "fast"], factory, hedge_after=0.01)]
+    assert chunks == [("fast", "你"), ("fast", "好")]
+    assert sorted(closed) == ["fast", "slow"]
+
+@pytest.mark.asyncio
+async def test_stream_errors_after_first_token_are_not_retried():
+    async def factory(internal_id):
+        yield "部分"
+        raise RuntimeError("broken")
+
+    received = []
+    with pytest.raises(RuntimeError):
+        async for item in hedged_stream(["a", "b"], factory):
+            received.append(item)
+    assert received == [("a", "部分")]
+
+@pytest.mark.asyncio
+async def test_stream_falls_back_before_first_token():
+    async def factory(internal_id):
+        if internal_id == "a":
+            raise httpx.ConnectError("down")
+        yield "ok"
+
+    chunks = [item async for item in hedged_stream(["a", "b"], factory)]
+    assert chunks == [("b", "ok")]
+
+def upstream_error(status: int) -> HTTPException:
+    request = httpx.Request("POST", "http://upstream")
+    error = httpx.HTTPStatusError("error", request=request, response=httpx.Response(status, request=request))
+    try:
+        raise HTTPException(status_code=500) from error
+    except HTTPException as e:
+        return e
+
+@pytest.mark.asyncio
+async def test_client_errors_are_not_sent_to_fallbacks():
+    calls = []
+
+    async def call(internal_id):
+        calls.append(internal_id)
+        raise upstream_error(400)
+
+    with pytest.raises(HTTPException):
+        await hedged_call(["a", "b", "c"], call)
+    assert calls == ["a"]
+
+    async def factory(internal_id):
+        calls.append(internal_id)
+        request = httpx.Request("POST", "http://upstream")
+        raise httpx.HTTPStatusError("rejected", request=request, response=httpx.Response(400, request=request))
+        yield
+
+    calls.clear()
+    with pytest.raises(httpx.HTTPStatusError):
+        async for _ in hedged_stream(["a", "b"], factory):
+            pass
+    assert calls == ["a"]
+
+@pytest.mark.asyncio
+async def test_server_errors_fall_back():
+    async def call(internal_id):
+        if internal_id == "a":
+            raise upstream_error(503)
+        return internal_id
+
+    assert await hedged_call(["a", "b"], call) == ("b", "b")
+
+def test_chat_hedges_only_with_its_own_threshold():
+    assert fallback.plan("model_002") == (["model_002", "model_001", "model_004"], 3.0)
+    assert fallback.plan("model_002", streaming=False) == (["model_002", "model_001", "model_004"], None)
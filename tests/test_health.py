@@ -0,0 +1,180 @@
+import json
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+from src.main import app
+from src.utils import circuit_breaker
+from src.utils.circuit_breaker import CircuitBreaker, CircuitOpenError
+from src.utils.health import HealthProber
+
+client = TestClient(app)
+
+def make_breaker(**kwargs) -> CircuitBreaker:
+    options = dict(window=4, min_calls=4, failure_rate=0.5, slow_call_seconds=1.0, open_seconds=30.0)
+    options.update(kwargs)
+    return CircuitBreaker("test", **options)
+
+def test_breaker_opens_on_error_rate():
+    breaker = make_breaker()
+    breaker.record_success(0.1)
+    breaker.record_success(0.1)
+    breaker.record_failure()
+    assert breaker.state == circuit_breaker.CLOSED
+    breaker.record_failure()
+    assert breaker.state == circuit_breaker.OPEN
+    with pytest.raises(CircuitOpenError) as info:
+        breaker.allow()
+    assert info.value.retry_after == 30
+
+def test_slow_calls_count_as_failures():
+    breaker = make_breaker()
+    for _ in range(4):
+        breaker.record_success(5.0)
+    assert breaker.state == circuit_breaker.OPEN
+
+def test_half_open_allows_single_trial():
+    breaker = make_breaker(open_seconds=0)
+    for _ in range(4):
+        breaker.record_failure()
+    assert breaker.state == circuit_breaker.OPEN
+
+    breaker.allow()
+    assert breaker.state == circuit_breaker.HALF_OPEN
+    breaker.record_failure()
+    assert breaker.state == circuit_breaker.OPEN
+
+    breaker.allow()
+    breaker.record_success(0.1)
+    assert breaker.state == circuit_breaker.CLOSED
+    breaker.allow()
+
+def test_probe_recovery_moves_to_half_open():
+    breaker = make_breaker()
+    for _ in range(4):
+        breaker.record_failure()
+    breaker.record_probe(False)
+    assert breaker.state == circuit_breaker.OPEN
+    breaker.record_probe(True)
+    assert breaker.state == circuit_breaker.HALF_OPEN
+
+@pytest.mark.asyncio
+async def test_prober_uses_models_endpoint(mock_provider):
+    requests = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append((request.method, request.url.path))
+        return httpx.Response(200, json={"data": []})
+
+    mock_provider(handler)
+    result = await HealthProber().probe("tongyi")
+
+    assert result["healthy"] is True
+    assert requests == [("GET", "/compatible-mode/v1/models")]
+
+def test_provider_health_endpoint_serves_cache():
+    response = client.get("/health/providers")
+    assert response.status_code == 200
+    data = response.json()
+    assert set(data["providers"]) == {"tongyi", "baichuan"}
+    assert "circuit" in data["providers"]["tongyi"]
+
+def test_open_circuit_returns_503(monkeypatch):
+    breaker = make_breaker()
+    for _ in range(4):
+        breaker.record_failure()
+    monkeypatch.setattr(circuit_breaker.breakers, "_breakers", {"tongyi": breaker})
+
+    response = client.post("/api/v1/chat", json={"content": "你好", "provider_id": "model_001"})
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "30"
+
+def test_record_error_ignores_client_errors():
+    from fastapi import HTTPException
+    request = httpx.Request("POST", "http://upstream")
+
+    def wrapped(status: int) -> HTTPException:
+        # 提供商以 raise HTTPException(...) from e 包装 httpx 异常
+        error = httpx.HTTPStatusError("error", request=request, response=httpx.Response(status, request=request))
+        try:
+            raise HTTPException(status_code=500) from error
+        except HTTPException as e:
+            return e
+
+    breaker = make_breaker()
+    for _ in range(4):
+        breaker.record_error(wrapped(400))
+    assert breaker.state == circuit_breaker.CLOSED
+    breaker.record_error(wrapped(503))
+    breaker.record_error(httpx.ReadTimeout("timeout"))
+    assert breaker.state == circuit_breaker.OPEN
+
+def test_record_error_counts_malformed_responses():
+    from fastapi import HTTPException
+    breaker = make_breaker()
+    for error in (ValueError("Invalid response format"), KeyError("output")):
+        try:
+            raise HTTPException(status_code=500) from error
+        except HTTPException as e:
+            breaker.record_error(e)
+        breaker.record_error(error)
+    assert breaker.state == circuit_breaker.OPEN
+
+def test_cancelled_trial_is_released():
+    breaker = make_breaker(open_seconds=30)
+    for _ in range(4):
+        breaker.record_failure()
+    breaker.record_probe(True)
+    breaker.allow()
+    with pytest.raises(CircuitOpenError):
+        breaker.allow()
+    breaker.release_trial()
+    breaker.allow()
+    assert breaker.state == circuit_breaker.HALF_OPEN
+
+@pytest.mark.asyncio
+async def test_queued_request_does_not_hold_trial(monkeypatch):
+    from src.api import chat
+    from src.utils import concurrency
+    from src.utils.concurrency import OverloadedError
+
+    breaker = make_breaker()
+    for _ in range(4):
+        breaker.record_failure()
+    breaker.record_probe(True)
+    monkeypatch.setattr(circuit_breaker.breakers, "_breakers", {"tongyi": breaker})
+
+    async def overloaded(provider_type, internal_id):
+        raise OverloadedError(f"provider:{provider_type}", 3)
+
+    monkeypatch.setattr(concurrency.limiters, "acquire", overloaded)
+    with pytest.raises(OverloadedError):
+        await chat.timed_chat("model_001", [{"role": "user", "content": "你好"}])
+    with pytest.raises(OverloadedError):
+        async for _ in chat.limited_stream("model_001", [{"role": "user", "content": "你好"}]):
+            pass
+    # 排队失败的请求没有占用 half_open 的试探名额
+    breaker.allow()
+
+def test_upstream_client_errors_do_not_open_circuit(monkeypatch, mock_provider):
+    monkeypatch.setattr(circuit_breaker.breakers, "_breakers", {})
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        if json.loads(request.content)["input"]["messages"][-1]["content"] == "违规内容":
+            return httpx.Response(400, json={"code": "DataInspectionFailed"})
+        return httpx.Response(200, json={
+            "output": {"choices": [{"message": {"role": "assistant", "content": "好的"}}]}
+        })
+
+    mock_provider(handler)
+    for _ in range(12):
+        assert client.post("/api/v1/chat", json={"content": "违规内容", "provider_id": "model_001"}).status_code == 500
+    response = client.post("/api/v1/chat", json={"content": "你好", "provider_id": "model_001"})
+
+    assert response.status_code == 200
+    assert circuit_breaker.breakers.get("tongyi").state == circuit_breaker.CLOSED
+
+def test_non_streaming_latency_is_not_a_slow_call():
+    breaker = make_breaker()
+    for _ in range(4):
+        breaker.record_success()
+    assert breaker.state == circuit_breaker.CLOSED
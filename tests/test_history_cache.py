@@ -0,0 +1,64 @@
+import time
+from src.utils import history_cache as hc
+from src.utils.history_cache import HistoryCache
+
+def turn(question: str, answer: str):
+    return [{"role": "user", "content": question}, {"role": "assistant", "content": answer}]
+
+def test_hit_requires_matching_version():
+    cache = HistoryCache(max_entries=10, max_bytes=1 << 20)
+    cache.put("c1", turn("你好", "你好！"), None, 3)
+    history, summary = cache.get("c1", 3)
+    assert history == turn("你好", "你好！")
+    assert summary is None
+    # 其他 worker 写过之后版本号变化，本地副本作废
+    assert cache.get("c1", 4) is None
+    assert len(cache) == 0
+
+def test_returns_copies():
+    cache = HistoryCache(max_entries=10, max_bytes=1 << 20)
+    cache.put("c1", turn("a", "b"), None, 1)
+    history, _ = cache.get("c1", 1)
+    history.append({"role": "user", "content": "c"})
+    assert len(cache.get("c1", 1)[0]) == 2
+
+def test_write_through_only_when_versions_are_consecutive():
+    cache = HistoryCache(max_entries=10, max_bytes=1 << 20)
+    cache.put("c1", turn("1", "1"), None, 1)
+    cache.append("c1", turn("2", "2"), 2, max_messages=3)
+    history, _ = cache.get("c1", 2)
+    assert [m["content"] for m in history] == ["1", "2", "2"]
+    # 跳过了一个版本：中间有其他写入，不能直接追加
+    cache.append("c1", turn("4", "4"), 4, max_messages=10)
+    assert cache.peek("c1") is None
+
+def test_summary_update_bumps_version():
+    cache = HistoryCache(max_entries=10, max_bytes=1 << 20)
+    cache.put("c1", turn("1", "1"), None, 5)
+    cache.update_summary("c1", {"text": "摘要"}, 6)
+    assert cache.get("c1", 6)[1] == {"text": "摘要"}
+
+def test_evicts_by_memory_and_count():
+    cache = HistoryCache(max_entries=2, max_bytes=1 << 20)
+    cache.put("a", turn("1", "1"), None, 1)
+    cache.put("b", turn("1", "1"), None, 1)
+    cache.get("a", 1)
+    cache.put("c", turn("1", "1"), None, 1)
+    assert cache.peek("b") is None
+    assert cache.peek("a") is not None
+
+    small = HistoryCache(max_entries=100, max_bytes=1000)
+    small.put("a", turn("x" * 100, "y" * 100), None, 1)
+    small.put("b", turn("x" * 100, "y" * 100), None, 1)
+    assert small.peek("a") is None
+    assert small.size <= 1000
+    small.put("huge", turn("x" * 10000, "y"), None, 1)
+    assert small.peek("huge") is None
+
+def test_entries_expire(monkeypatch):
+    cache = HistoryCache(max_entries=10, max_bytes=1 << 20)
+    cache.put("c1", turn("1", "1"), None, 1)
+    now = time.monotonic()
+    monkeypatch.setattr(hc.time, "monotonic", lambda: now + hc.settings.HISTORY_CACHE_TTL + 1)
+    assert cache.get("c1", 1) is None
+    assert cache.size == 0
@@ -0,0 +1,41 @@
+import json
+from src.utils import history_codec
+
+def test_round_trip_compact_message():
+    message = {"role": "assistant", "content": "你好"}
+    data = history_codec.encode_message(message)
+    assert data[0] == history_codec.FORMAT_VERSION
+    assert data[1] == history_codec.CODEC_NONE
+    assert len(data) < len(json.dumps(message, ensure_ascii=False).encode("utf-8"))
+    assert history_codec.decode_message(data) == message
+
+def test_large_values_are_compressed():
+    message = {"role": "user", "content": "重复的内容" * 200}
+    data = history_codec.encode_message(message)
+    assert data[1] != history_codec.CODEC_NONE
+    assert len(data) < len(message["content"].encode("utf-8")) / 10
+    assert history_codec.decode_message(data) == message
+
+def test_compression_disabled(monkeypatch):
+    monkeypatch.setattr(history_codec.settings, "HISTORY_COMPRESSION", "none")
+    data = history_codec.encode({"text": "摘要" * 500})
+    assert data[1] == history_codec.CODEC_NONE
+
+def test_reads_legacy_plain_json():
+    legacy = json.dumps({"role": "user", "content": "旧消息"}, ensure_ascii=False)
+    assert history_codec.decode_message(legacy) == {"role": "user", "content": "旧消息"}
+    assert history_codec.decode_message(legacy.encode("utf-8"))["content"] == "旧消息"
+
+def test_unusual_messages_keep_all_fields():
+    message = {"role": "tool", "content": "结果", "name": "search"}
+    assert history_codec.decode_message(history_codec.encode_message(message)) == message
+
+def test_missing_zstd_falls_back_without_touching_settings(monkeypatch):
+    monkeypatch.setattr(history_codec, "zstandard", None)
+    monkeypatch.setattr(history_codec.settings, "HISTORY_COMPRESSION", "zstd")
+    history_codec._codec_for.cache_clear()
+    try:
+        assert history_codec._preferred_codec() == history_codec.CODEC_ZLIB
+        assert history_codec.settings.HISTORY_COMPRESSION == "zstd"
+    finally:
+        history_codec._codec_for.cache_clear()
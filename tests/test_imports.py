@@ -9,4 +9,23 @@ def test_imports():
     
     # 测试 pydantic_settings 导入
     from pydantic_settings import BaseSettings
-    assert BaseSettings is not None 
\ No newline at end of file
+    assert BaseSettings is not None 
+def test_vercel_entry_has_no_eager_provider_imports():
+    # 冷启动路径不应加载 httpx、redis 和提供商适配器
+    import os
+    import subprocess
+    import sys
+    code = (
+        "import sys; from api.index import app; "
+        "print(','.join(m for m in ('httpx', 'redis', 'src.providers.tongyi') if m in sys.modules))"
+    )
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    output = subprocess.check_output(
+        [sys.executable, "-c", code], cwd=root, env={**os.environ, "ENVIRONMENT": "vercel"}
+    )
+    assert output.decode().strip() == ""
+
+def test_providers_load_on_first_use():
+    from src.providers import TongyiProvider
+    from src.providers.factory import ProviderFactory
+    assert ProviderFactory._load_class("tongyi") is TongyiProvider
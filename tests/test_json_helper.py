@@ -0,0 +1,19 @@
+import json
+from src.utils.json_helper import SSE_DONE, FastJSONResponse, dumps, sse_frame
+
+def test_dumps_is_compact_utf8():
+    data = dumps({"content": "你好", "done": False})
+    assert isinstance(data, bytes)
+    assert json.loads(data) == {"content": "你好", "done": False}
+    assert "你好".encode("utf-8") in data
+
+def test_sse_frame():
+    assert sse_frame({"model": "model_001"}).startswith(b"data: {")
+    assert sse_frame({"model": "model_001"}).endswith(b"\n\n")
+    assert json.loads(sse_frame({"a": 1})[6:]) == {"a": 1}
+    assert SSE_DONE == b"data: [DONE]\n\n"
+
+def test_fast_json_response():
+    response = FastJSONResponse({"response": "回复"})
+    assert json.loads(response.body) == {"response": "回复"}
+    assert response.headers["content-type"] == "application/json"
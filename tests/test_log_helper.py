@@ -0,0 +1,34 @@
+import logging
+from src.core.config import EnvironmentType
+from src.utils import log_helper
+from src.utils.log_helper import LazyJson, is_sampled, payload_logging, chunk_logging
+
+def test_lazy_json_truncates():
+    text = str(LazyJson({"content": "你" * 100}, limit=20))
+    assert text.startswith('{"content": "你')
+    assert "truncated" in text
+
+def test_lazy_json_is_not_serialized_when_filtered(monkeypatch):
+    calls = []
+    monkeypatch.setattr(log_helper.json, "dumps", lambda *a, **k: calls.append(a) or "")
+    logger = logging.getLogger("test.lazy")
+    logger.setLevel(logging.WARNING)
+    logger.info("payload: %s", LazyJson({"a": 1}))
+    assert calls == []
+
+def test_sampling_is_deterministic(monkeypatch):
+    monkeypatch.setattr(log_helper.settings, "LOG_SAMPLE_RATE", 0.5)
+    ids = [f"req-{i}" for i in range(1000)]
+    sampled = [i for i in ids if is_sampled(i)]
+    assert 300 < len(sampled) < 700
+    assert sampled == [i for i in ids if is_sampled(i)]
+
+def test_production_profile_disables_payloads(monkeypatch):
+    logger = logging.getLogger("test.profile")
+    logger.setLevel(logging.DEBUG)
+    monkeypatch.setattr(log_helper.settings, "ENVIRONMENT", EnvironmentType.PRODUCTION)
+    assert not payload_logging(logger, "req")
+    assert not chunk_logging(logger)
+
+    monkeypatch.setattr(log_helper.settings, "LOG_PAYLOADS", True)
+    assert payload_logging(logger, "req")
@@ -0,0 +1,30 @@
+from fastapi.testclient import TestClient
+from src.main import app
+from src.utils import metrics
+
+client = TestClient(app)
+
+def sample(name: str, **labels) -> float:
+    return metrics.REGISTRY.get_sample_value(name, labels) or 0.0
+
+def test_metrics_endpoint_exposes_route_metrics():
+    before = sample("http_requests_total", route="/api/v1/models", method="GET", status="200")
+    assert client.get("/api/v1/models").status_code == 200
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == metrics.CONTENT_TYPE_LATEST
+    assert "upstream_time_to_first_token_seconds" in response.text
+    assert "active_streams" in response.text
+    assert sample("http_requests_total", route="/api/v1/models", method="GET", status="200") == before + 1
+
+def test_invalid_model_is_counted_as_error_under_unknown():
+    before = sample("chat_requests_total", model="unknown", endpoint="chat")
+    errors_before = sample("errors_total", type="HTTPException")
+    client.post("/api/v1/chat", json={"content": "你好", "provider_id": "nope"})
+    assert sample("chat_requests_total", model="unknown", endpoint="chat") == before + 1
+    assert sample("errors_total", type="HTTPException") == errors_before + 1
+
+def test_model_metrics_are_prebound():
+    assert metrics.for_model("model_001") is metrics.for_model("model_001")
+    assert metrics.for_model("not-a-model") is metrics.for_model("other")
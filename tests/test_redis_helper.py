@@ -0,0 +1,106 @@
+import json
+import pytest
+
+fakeredis = pytest.importorskip("fakeredis")
+
+from src.utils import redis_helper
+from src.utils.history_cache import history_cache
+from src.utils.redis_helper import RedisClient, redis_client
+
+def turn(question: str, answer: str):
+    return [{"role": "user", "content": question}, {"role": "assistant", "content": answer}]
+
+@pytest.fixture
+def fake(monkeypatch):
+    """用 fakeredis 替换连接池中的客户端"""
+    monkeypatch.setattr(redis_helper.settings, "REDIS_ENABLED", True)
+    monkeypatch.setattr(RedisClient, "_unavailable_until", 0.0)
+    server = fakeredis.aioredis.FakeRedis()
+    monkeypatch.setattr(RedisClient, "_redis", server)
+    history_cache.clear()
+    yield server
+    history_cache.clear()
+
+@pytest.mark.asyncio
+async def test_append_trims_to_max_turns(fake, monkeypatch):
+    monkeypatch.setattr(redis_helper.settings, "CHAT_HISTORY_MAX_TURNS", 2)
+    for i in range(3):
+        assert await redis_client.append_chat_history("c1", turn(f"问{i}", f"答{i}"))
+
+    history, summary = await redis_client.get_conversation("c1")
+    assert [m["content"] for m in history] == ["问1", "答1", "问2", "答2"]
+    assert summary is None
+    assert await fake.llen("chat:turns:c1") == 4
+
+@pytest.mark.asyncio
+async def test_append_skips_system_prompt(fake):
+    await redis_client.append_chat_history("c1", [{"role": "system", "content": "提示"}] + turn("问", "答"))
+    history, _ = await redis_client.get_conversation("c1")
+    assert [m["role"] for m in history] == ["user", "assistant"]
+
+@pytest.mark.asyncio
+async def test_append_refreshes_ttl_and_bumps_version(fake, monkeypatch):
+    monkeypatch.setattr(redis_helper.settings, "CHAT_HISTORY_EXPIRE", 100)
+    await redis_client.save_summary("c1", {"text": "摘要"})
+    await fake.expire("chat:summary:c1", 5)
+    assert await fake.get("chat:ver:c1") == b"1"
+
+    await redis_client.append_chat_history("c1", turn("问", "答"))
+    # 追加时历史和摘要一起续期
+    assert 95 < await fake.ttl("chat:turns:c1") <= 100
+    assert 95 < await fake.ttl("chat:summary:c1") <= 100
+    assert await fake.get("chat:ver:c1") == b"2"
+
+    history, summary = await redis_client.get_conversation("c1")
+    assert summary == {"text": "摘要"}
+    assert len(history) == 2
+
+@pytest.mark.asyncio
+async def test_legacy_history_is_migrated_on_read(fake):
+    legacy = [{"role": "system", "content": "提示"}] + turn("旧问题", "旧回答")
+    await fake.set("chat:history:c1", json.dumps(legacy, ensure_ascii=False))
+
+    history, _ = await redis_client.get_conversation("c1")
+    assert history == turn("旧问题", "旧回答")
+    assert await fake.exists("chat:history:c1") == 0
+    assert await fake.llen("chat:turns:c1") == 2
+    assert await fake.ttl("chat:turns:c1") > 0
+
+    # 迁移后继续以追加方式写入
+    await redis_client.append_chat_history("c1", turn("新问题", "新回答"))
+    history, _ = await redis_client.get_conversation("c1")
+    assert [m["content"] for m in history] == ["旧问题", "旧回答", "新问题", "新回答"]
+
+def test_pool_is_created_lazily_from_settings(monkeypatch):
+    monkeypatch.setattr(redis_helper.settings, "REDIS_ENABLED", True)
+    monkeypatch.setattr(redis_helper.settings, "REDIS_MAX_CONNECTIONS", 7)
+    monkeypatch.setattr(RedisClient, "_unavailable_until", 0.0)
+    monkeypatch.setattr(RedisClient, "_redis", None)
+    client = redis_client.redis
+    # 只建立连接池对象，不做网络I/O；重复访问复用同一个客户端
+    assert client is redis_client.redis
+    pool = client.connection_pool
+    assert pool.max_connections == 7
+    assert pool.connection_kwargs["decode_responses"] is False
+
+@pytest.mark.asyncio
+async def test_value_round_trip(fake):
+    assert await redis_client.set_value("k:text", "你好", 60)
+    assert await redis_client.get_value("k:text") == "你好"
+    assert await redis_client.set_value("k:bytes", b"\x00\xff", 60)
+    assert await redis_client.get_bytes("k:bytes") == b"\x00\xff"
+    assert 0 < await fake.ttl("k:bytes") <= 60
+    assert await redis_client.get_value("k:missing") is None
+
+@pytest.mark.asyncio
+async def test_shutdown_closes_pool(fake, monkeypatch):
+    from src import main
+    closed = []
+
+    async def aclose(close_connection_pool=None):
+        closed.append(close_connection_pool)
+
+    monkeypatch.setattr(fake, "aclose", aclose)
+    await main.shutdown_event()
+    assert closed == [True]
+    assert RedisClient._redis is None
@@ -0,0 +1,43 @@
+import time
+import pytest
+from unittest.mock import AsyncMock
+from src.utils import response_cache as rc
+from src.utils.response_cache import LRUCache, ResponseCache
+
+def test_lru_evicts_least_recently_used():
+    cache = LRUCache(max_entries=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+
+def test_lru_expires_entries(monkeypatch):
+    cache = LRUCache(max_entries=2, ttl=10)
+    cache.set("a", 1)
+    now = time.monotonic()
+    monkeypatch.setattr(rc.time, "monotonic", lambda: now + 11)
+    assert cache.get("a") is None
+    assert len(cache) == 0
+
+def test_make_key_normalizes_messages():
+    params = {"temperature": 0.7}
+    key = ResponseCache.make_key("model_001", params, [{"role": "user", "content": " 你好 "}])
+    assert key == ResponseCache.make_key("model_001", params, [{"role": "user", "content": "你好"}])
+    assert key != ResponseCache.make_key("model_004", params, [{"role": "user", "content": "你好"}])
+    assert key != ResponseCache.make_key("model_001", {"temperature": 0.1}, [{"role": "user", "content": "你好"}])
+
+@pytest.mark.asyncio
+async def test_redis_tier_fills_local_tier(monkeypatch):
+    monkeypatch.setattr(rc.redis_client, "get_value", AsyncMock(return_value="缓存回复"))
+    cache = ResponseCache()
+    assert await cache.get("k") == "缓存回复"
+    assert cache.local.get("k") == "缓存回复"
+
+def test_enabled_for_respects_model_flag(monkeypatch):
+    monkeypatch.setattr(rc.settings, "RESPONSE_CACHE_ENABLED", True)
+    cache = ResponseCache()
+    assert cache.enabled_for("model_001")
+    assert not cache.enabled_for("model_002")
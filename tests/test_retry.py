@@ -0,0 +1,104 @@
+import httpx
+import pytest
+from fastapi import HTTPException
+from src.utils import retry
+from src.utils.retry import RetryBudget, retry_after_seconds
+from .conftest import sse
+
+@pytest.fixture(autouse=True)
+def fast_retries(monkeypatch):
+    monkeypatch.setattr(retry.settings, "RETRY_BASE_DELAY", 0.0)
+    monkeypatch.setattr(retry, "retry_budget", RetryBudget(ratio=0.1, min_per_second=0, burst=10))
+
+def tongyi_reply(content: str) -> httpx.Response:
+    return httpx.Response(200, json={
+        "output": {"choices": [{"message": {"role": "assistant", "content": content}}]}
+    })
+
+def test_budget_limits_retries():
+    budget = RetryBudget(ratio=0.5, min_per_second=0, burst=2)
+    assert budget.try_spend()
+    assert budget.try_spend()
+    assert not budget.try_spend()
+    budget.record_request()
+    budget.record_request()
+    assert budget.try_spend()
+
+def test_retry_after_parsing():
+    request = httpx.Request("POST", "http://upstream")
+    response = httpx.Response(429, headers={"Retry-After": "2"}, request=request)
+    error = httpx.HTTPStatusError("throttled", request=request, response=response)
+    assert retry_after_seconds(error) == 2.0
+
+@pytest.mark.asyncio
+async def test_chat_retries_transient_errors(mock_provider):
+    attempts = []
+
+    def handler(request):
+        attempts.append(request)
+        if len(attempts) == 1:
+            return httpx.Response(503)
+        if len(attempts) == 2:
+            return httpx.Response(429, headers={"Retry-After": "0"})
+        return tongyi_reply("好的")
+
+    result = await mock_provider(handler).chat([{"role": "user", "content": "你好"}], "qwen-plus")
+    assert result.content == "好的"
+    assert len(attempts) == 3
+
+@pytest.mark.asyncio
+async def test_client_errors_are_not_retried(mock_provider):
+    attempts = []
+
+    def handler(request):
+        attempts.append(request)
+        return httpx.Response(400)
+
+    with pytest.raises(HTTPException):
+        await mock_provider(handler).chat([{"role": "user", "content": "你好"}], "qwen-plus")
+    assert len(attempts) == 1
+
+@pytest.mark.asyncio
+async def test_exhausted_budget_stops_retries(monkeypatch, mock_provider):
+    monkeypatch.setattr(retry, "retry_budget", RetryBudget(ratio=0, min_per_second=0, burst=0))
+    attempts = []
+
+    def handler(request):
+        attempts.append(request)
+        return httpx.Response(503)
+
+    with pytest.raises(HTTPException):
+        await mock_provider(handler).chat([{"role": "user", "content": "你好"}], "qwen-plus")
+    assert len(attempts) == 1
+
+@pytest.mark.asyncio
+async def test_stream_retried_only_before_first_token(mock_provider):
+    attempts = []
+
+    def handler(request):
+        attempts.append(request)
+        if len(attempts) == 1:
+            return httpx.Response(502)
+        return httpx.Response(200, content=sse(["你"]) + b"data: [DONE]\n\n")
+
+    provider = mock_provider(handler)
+    chunks = [c.content async for c in provider.stream_chat([{"role": "user", "content": "你好"}], "qwen-plus")]
+    assert chunks == ["你"]
+    assert len(attempts) == 2
+
+@pytest.mark.asyncio
+async def test_stream_error_after_first_token_is_not_retried():
+    calls = 0
+
+    async def factory():
+        nonlocal calls
+        calls += 1
+        yield "部分"
+        raise httpx.ReadError("connection reset")
+
+    received = []
+    with pytest.raises(httpx.ReadError):
+        async for item in retry.stream_with_retry(factory):
+            received.append(item)
+    assert received == ["部分"]
+    assert calls == 1
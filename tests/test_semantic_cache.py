@@ -0,0 +1,129 @@
+import io
+import time
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+np = pytest.importorskip("numpy")
+
+from src.main import app
+from src.utils import semantic_cache as sc
+from src.utils.semantic_cache import SemanticCache, VectorIndex, embed
+
+DIM = 256
+
+def found(index, text, now):
+    return index.search(embed(text, DIM), 0.9, now)[0]
+
+def test_near_duplicates_are_similar():
+    base = embed("你好，请介绍一下你自己", DIM)
+    assert float(base @ embed("你好!请介绍一下你自己。", DIM)) > 0.99
+    assert float(base @ embed("今天北京的天气怎么样", DIM)) < 0.5
+
+def test_index_hits_above_threshold():
+    index = VectorIndex(DIM, capacity=8)
+    now = time.time()
+    index.add(embed("如何重置密码", DIM), "点击忘记密码", now + 60, now)
+    assert found(index, "如何重置密码？", now) == "点击忘记密码"
+    assert found(index, "如何注销账号", now) is None
+
+def test_index_evicts_expired_then_least_recently_used():
+    index = VectorIndex(DIM, capacity=2)
+    now = time.time()
+    index.add(embed("问题一", DIM), "a", now + 60, now)
+    index.add(embed("问题二", DIM), "b", now + 60, now)
+    assert found(index, "问题一", now) == "a"
+    index.add(embed("问题三", DIM), "c", now + 60, now)
+    assert found(index, "问题二", now) is None
+    assert found(index, "问题一", now) == "a"
+    assert found(index, "问题一", now + 61) is None
+
+def test_index_grows_and_overwrites_duplicates():
+    index = VectorIndex(DIM, capacity=1000)
+    now = time.time()
+    for i in range(200):
+        index.add(embed(f"第{i}个问题", DIM), str(i), now + 60, now)
+    vector = embed("第7个问题", DIM)
+    _, slot = index.search(vector, 0.9, now)
+    index.add(vector, "新回复", now + 60, now, slot)
+    assert len(index) == 200
+    assert found(index, "第7个问题", now) == "新回复"
+
+def test_expired_best_match_does_not_hide_valid_one():
+    index = VectorIndex(DIM, capacity=8)
+    now = time.time()
+    index.add(embed("如何重置密码", DIM), "旧回复", now + 1, now)
+    index.add(embed("如何重置密码呢", DIM), "新回复", now + 60, now)
+    value, slot = index.search(embed("如何重置密码", DIM), 0.8, now + 10)
+    assert value == "新回复"
+    # 过期的同一问题槽位仍可被覆盖
+    assert slot == 0
+
+def test_dump_and_restore_skip_expired():
+    index = VectorIndex(DIM, capacity=8)
+    now = time.time()
+    index.add(embed("保留的问题", DIM), "保留", now + 60, now)
+    index.add(embed("过期的问题", DIM), "过期", now + 1, now)
+    restored = VectorIndex(DIM, capacity=8)
+    assert restored.restore(index.dump(), now + 10) == 1
+    assert found(restored, "保留的问题", now + 10) == "保留"
+    assert VectorIndex(128, capacity=8).restore(index.dump(), now) == 0
+
+def test_dump_stores_values_as_utf8_bytes():
+    index = VectorIndex(DIM, capacity=8)
+    now = time.time()
+    index.add(embed("短", DIM), "a", now + 60, now)
+    index.add(embed("长", DIM), "回复" * 1000, now + 60, now)
+    data = index.dump()
+    with np.load(io.BytesIO(data)) as archive:
+        assert archive["values"].dtype == np.uint8
+        assert list(archive["offsets"]) == [0, 1, 6001]
+    restored = VectorIndex(DIM, capacity=8)
+    assert restored.restore(data, now) == 2
+    assert found(restored, "长", now) == "回复" * 1000
+
+@pytest.mark.asyncio
+async def test_disk_persistence(monkeypatch, tmp_path):
+    monkeypatch.setattr(sc.settings, "SEMANTIC_CACHE_ENABLED", True)
+    monkeypatch.setattr(sc.settings, "SEMANTIC_CACHE_PERSIST", "disk")
+    monkeypatch.setattr(sc.settings, "SEMANTIC_CACHE_PERSIST_PATH", str(tmp_path))
+    cache = SemanticCache()
+    cache.store(cache.lookup("model_001", "你好"), "你好！")
+    await cache.save()
+    assert (tmp_path / "model_001.npz").exists()
+
+    reloaded = SemanticCache()
+    await reloaded.load()
+    assert reloaded.lookup("model_001", "你好").value == "你好！"
+
+def test_single_turn_only():
+    assert SemanticCache.is_single_turn([{"role": "system", "content": "s"}, {"role": "user", "content": "q"}])
+    assert not SemanticCache.is_single_turn([
+        {"role": "user", "content": "q1"}, {"role": "assistant", "content": "a1"}, {"role": "user", "content": "q2"}
+    ])
+
+def test_chat_endpoint_serves_near_duplicates(monkeypatch, mock_provider):
+    monkeypatch.setattr(sc.settings, "SEMANTIC_CACHE_ENABLED", True)
+    monkeypatch.setattr(sc, "semantic_cache", SemanticCache())
+    monkeypatch.setattr("src.api.chat.semantic_cache", sc.semantic_cache)
+    calls = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request)
+        return httpx.Response(200, json={
+            "output": {"choices": [{"message": {"role": "assistant", "content": "我是助手"}}]}
+        })
+
+    mock_provider(handler)
+    client = TestClient(app)
+    first = client.post("/api/v1/chat", json={"content": "请介绍一下你自己", "provider_id": "model_001"})
+    second = client.post("/api/v1/chat", json={"content": "请介绍一下你自己！", "provider_id": "model_001"})
+    bypass = client.post(
+        "/api/v1/chat", json={"content": "请介绍一下你自己！", "provider_id": "model_001", "no_cache": True}
+    )
+
+    assert first.json()["response"] == "我是助手"
+    assert second.headers["X-Cache"] == "SEMANTIC-HIT"
+    assert second.json()["response"] == "我是助手"
+    assert bypass.headers["X-Cache"] != "SEMANTIC-HIT"
+    assert len(calls) == 2
@@ -0,0 +1,94 @@
+import asyncio
+import pytest
+from src.utils.single_flight import SingleFlight, StreamFlight
+
+@pytest.mark.asyncio
+async def test_concurrent_calls_share_one_upstream():
+    flight = SingleFlight()
+    calls = 0
+
+    async def upstream():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        return "结果"
+
+    results = await asyncio.gather(*[flight.do("k", upstream) for _ in range(10)])
+    assert results == ["结果"] * 10
+    assert calls == 1
+    assert not flight.in_flight("k")
+
+@pytest.mark.asyncio
+async def test_errors_are_shared():
+    flight = SingleFlight()
+
+    async def upstream():
+        await asyncio.sleep(0.01)
+        raise ValueError("boom")
+
+    results = await asyncio.gather(*[flight.do("k", upstream) for _ in range(3)], return_exceptions=True)
+    assert all(isinstance(r, ValueError) for r in results)
+
+@pytest.mark.asyncio
+async def test_waiter_timeout_keeps_shared_call_alive():
+    flight = SingleFlight()
+    finished = asyncio.Event()
+
+    async def upstream():
+        await asyncio.sleep(0.1)
+        finished.set()
+        return "ok"
+
+    patient = asyncio.create_task(flight.do("k", upstream))
+    await asyncio.sleep(0)
+    with pytest.raises(asyncio.TimeoutError):
+        await flight.do("k", upstream, timeout=0.01)
+    assert await patient == "ok"
+    assert finished.is_set()
+
+@pytest.mark.asyncio
+async def test_last_waiter_leaving_cancels_upstream():
+    flight = SingleFlight()
+    cancelled = asyncio.Event()
+
+    async def upstream():
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    with pytest.raises(asyncio.TimeoutError):
+        await flight.do("k", upstream, timeout=0.01)
+    await asyncio.sleep(0)
+    assert cancelled.is_set()
+    assert not flight.in_flight("k")
+
+@pytest.mark.asyncio
+async def test_late_stream_joiner_replays_buffer():
+    flight = StreamFlight()
+    starts = 0
+    first_sent = asyncio.Event()
+    release = asyncio.Event()
+
+    async def upstream():
+        nonlocal starts
+        starts += 1
+        yield "a"
+        first_sent.set()
+        await release.wait()
+        yield "b"
+        yield "c"
+
+    async def consume():
+        return [item async for item in flight.subscribe("k", upstream)]
+
+    leader = asyncio.create_task(consume())
+    await first_sent.wait()
+    joiner = asyncio.create_task(consume())
+    await asyncio.sleep(0)
+    release.set()
+
+    assert await leader == ["a", "b", "c"]
+    assert await joiner == ["a", "b", "c"]
+    assert starts == 1
@@ -0,0 +1,46 @@
+import json
+import httpx
+import pytest
+from src.providers.base import StreamResponse
+from src.providers.sse import SSEDecoder, iter_chat_chunks
+
+def feed_all(decoder: SSEDecoder, chunks) -> list:
+    events = []
+    for chunk in chunks:
+        events.extend(decoder.feed(chunk))
+    return events + decoder.flush()
+
+def test_decoder_handles_partial_frames():
+    stream = b'data: {"a": 1}\n\ndata: {"b": 2}\n\n'
+    # 逐字节输入，模拟最坏情况的分块边界
+    events = feed_all(SSEDecoder(), [stream[i:i + 1] for i in range(len(stream))])
+    assert events == [b'{"a": 1}', b'{"b": 2}']
+
+def test_decoder_joins_multiline_data_and_skips_comments():
+    stream = b": keep-alive\n\nevent: message\ndata: line1\ndata: line2\nid: 7\n\n"
+    assert feed_all(SSEDecoder(), [stream]) == [b"line1\nline2"]
+
+def test_decoder_handles_crlf_split_across_chunks():
+    events = feed_all(SSEDecoder(), [b"data: x\r", b"\n\r", b"\ndata: y\r\n\r\n"])
+    assert events == [b"x", b"y"]
+
+def test_decoder_flushes_unterminated_event():
+    assert feed_all(SSEDecoder(), [b"data: tail"]) == [b"tail"]
+
+@pytest.mark.asyncio
+async def test_iter_chat_chunks_parses_openai_stream():
+    events = [
+        {"choices": [{"delta": {"role": "assistant"}, "finish_reason": None}]},
+        {"choices": [{"delta": {"content": "你"}, "finish_reason": None}]},
+        {"choices": [{"delta": {"content": "好"}, "finish_reason": "stop"}]},
+        {"choices": [], "usage": {"total_tokens": 3}},
+    ]
+    body = "".join(f"data: {json.dumps(e, ensure_ascii=False)}\n\n" for e in events)
+    body += "data: not-json\n\ndata: [DONE]\n\n"
+
+    transport = httpx.MockTransport(lambda request: httpx.Response(200, content=body.encode()))
+    async with httpx.AsyncClient(transport=transport) as client:
+        async with client.stream("POST", "http://upstream/chat") as response:
+            chunks = [chunk async for chunk in iter_chat_chunks(response)]
+
+    assert chunks == [StreamResponse("你"), StreamResponse("好", True)]
@@ -0,0 +1,78 @@
+import asyncio
+import json
+import httpx
+import pytest
+from src.main import app
+from src.utils import metrics
+from .conftest import sse
+
+class EndlessStream(httpx.AsyncByteStream):
+    """持续输出token直到被关闭，记录上游响应是否被关闭"""
+
+    def __init__(self, produced: list, closed: asyncio.Event, delay: float):
+        self.produced = produced
+        self.closed = closed
+        self.delay = delay
+
+    async def __aiter__(self):
+        while True:
+            self.produced.append(1)
+            yield sse([f"块{len(self.produced)}"])
+            await asyncio.sleep(self.delay)
+
+    async def aclose(self):
+        self.closed.set()
+
+async def stream_until_disconnect(mock_provider, delay: float, disconnect_after: int):
+    """直接以ASGI方式调用 /chat/stream，收到若干内容块后模拟客户端断开"""
+    produced, closed = [], asyncio.Event()
+    mock_provider(lambda request: httpx.Response(200, stream=EndlessStream(produced, closed, delay)))
+
+    body = json.dumps({"content": "讲个很长的故事", "provider_id": "model_001"}).encode()
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "POST",
+        "scheme": "http", "path": "/api/v1/chat/stream", "raw_path": b"/api/v1/chat/stream",
+        "query_string": b"", "root_path": "", "client": ("127.0.0.1", 1), "server": ("test", 80),
+        "headers": [(b"host", b"test"), (b"content-type", b"application/json")],
+    }
+    received = []
+    enough = asyncio.Event()
+    requested = False
+
+    async def receive():
+        nonlocal requested
+        if not requested:
+            requested = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        await enough.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        if message["type"] == "http.response.body" and "块".encode() in message.get("body", b""):
+            received.append(message["body"])
+            if len(received) >= disconnect_after:
+                enough.set()
+
+    await asyncio.wait_for(app(scope, receive, send), timeout=5)
+    await asyncio.wait_for(closed.wait(), timeout=1)
+    produced_at_disconnect = len(produced)
+    await asyncio.sleep(delay * 5 + 0.05)
+    return produced, produced_at_disconnect
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("delay", [0.01, 0])
+async def test_disconnect_cancels_upstream_and_saves_partial_reply(mock_provider, saved, delay):
+    # delay>0：断开时生成器在等待上游；delay=0：生成器多停在 yield 上
+    abandoned = metrics.STREAMS_ABANDONED.labels("model_001")
+    before = abandoned._value.get()
+
+    produced, produced_at_disconnect = await stream_until_disconnect(mock_provider, delay, disconnect_after=3)
+
+    # 上游响应已关闭，断开后不再继续读取
+    assert len(produced) == produced_at_disconnect
+    assert abandoned._value.get() == before + 1
+    saved.assert_awaited_once()
+    user_message, reply = saved.await_args.args[1]
+    assert user_message == {"role": "user", "content": "讲个很长的故事"}
+    assert reply["role"] == "assistant"
+    assert reply["content"].startswith("块1块2")
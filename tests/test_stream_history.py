@@ -0,0 +1,88 @@
+import asyncio
+import json
+import httpx
+import pytest
+from src.main import app
+from src.utils import retry
+from .conftest import sse
+
+class FailingStream(httpx.AsyncByteStream):
+    """输出若干token后连接中断"""
+
+    def __init__(self, tokens):
+        self.tokens = tokens
+
+    async def __aiter__(self):
+        yield sse(self.tokens)
+        raise httpx.ReadError("connection reset")
+
+async def post_stream(content: str, events: list) -> list:
+    """以ASGI方式完整调用 /chat/stream（含后台任务），响应块按发出顺序记入 events"""
+    body = json.dumps({"content": content, "provider_id": "model_001", "request_id": "conv-1"}).encode()
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "POST",
+        "scheme": "http", "path": "/api/v1/chat/stream", "raw_path": b"/api/v1/chat/stream",
+        "query_string": b"", "root_path": "", "client": ("127.0.0.1", 1), "server": ("test", 80),
+        "headers": [(b"host", b"test"), (b"content-type", b"application/json")],
+    }
+    requested = False
+
+    async def receive():
+        nonlocal requested
+        if not requested:
+            requested = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        await asyncio.Event().wait()
+
+    async def send(message):
+        if message["type"] == "http.response.body":
+            events.append((message.get("body", b""), message.get("more_body", False)))
+
+    await asyncio.wait_for(app(scope, receive, send), timeout=5)
+    return events
+
+@pytest.fixture
+def history(monkeypatch, saved):
+    """没有历史的会话，上游重试不等待，熔断器互不影响；返回记录历史写入的 AsyncMock"""
+    from src.utils.circuit_breaker import breakers
+    from src.utils.redis_helper import redis_client
+
+    async def no_history(request_id):
+        return None, None
+
+    monkeypatch.setattr(redis_client, "get_conversation", no_history)
+    monkeypatch.setattr(retry.settings, "RETRY_BASE_DELAY", 0.0)
+    monkeypatch.setattr(breakers, "_breakers", {})
+    return saved
+
+@pytest.mark.asyncio
+async def test_history_is_saved_after_stream_ends(mock_provider, history):
+    events = []
+    history.side_effect = lambda *args: events.append("saved")
+    mock_provider(lambda request: httpx.Response(200, content=sse(["你", "好"]) + b"data: [DONE]\n\n"))
+
+    await post_stream("你好", events)
+
+    # 写入发生在最后一个响应块（more_body=False）发出之后
+    assert events[-1] == "saved"
+    assert events[-2] == (b"", False)
+    assert events[-3] == (b"data: [DONE]\n\n", True)
+    history.assert_awaited_once()
+    request_id, messages = history.await_args.args
+    assert request_id == "conv-1"
+    assert messages == [{"role": "user", "content": "你好"}, {"role": "assistant", "content": "你好"}]
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("response", [
+    lambda request: httpx.Response(200, stream=FailingStream(["半句"])),
+    lambda request: httpx.Response(500),
+])
+async def test_history_is_not_saved_on_upstream_error(mock_provider, history, response):
+    mock_provider(response)
+
+    events = await post_stream("你好", [])
+
+    payload = b"".join(chunk for chunk, _ in events)
+    assert b'"error"' in payload
+    # 上游出错时不写入不完整的回复，用户可以重新提问
+    history.assert_not_awaited()
@@ -0,0 +1,86 @@
+import asyncio
+import json
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+from src.main import app
+from .conftest import sse
+
+client = TestClient(app)
+
+class SlowStream(httpx.AsyncByteStream):
+    """先返回一个token，然后一直等待，模拟仍在生成的上游"""
+
+    async def __aiter__(self):
+        yield sse(["第一"])
+        await asyncio.sleep(30)
+        yield b"data: [DONE]\n\n"
+
+@pytest.fixture
+def upstream(mock_provider):
+    requests = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        body = json.loads(request.content)
+        requests.append(body)
+        if body["messages"][-1]["content"] == "慢一点":
+            return httpx.Response(200, stream=SlowStream())
+        return httpx.Response(200, content=sse(["你", "好"]) + b"data: [DONE]\n\n")
+
+    mock_provider(handler)
+    return requests
+
+def receive_until(ws, kind):
+    events = []
+    while True:
+        event = ws.receive_json()
+        events.append(event)
+        if event["type"] == kind:
+            return events
+
+def test_websocket_keeps_history_in_memory(upstream, saved):
+    with client.websocket_connect("/api/v1/chat/ws?provider_id=model_001") as ws:
+        request_id = ws.receive_json()["request_id"]
+        ws.send_json({"type": "message", "content": "你好"})
+        events = receive_until(ws, "done")
+        assert [e["content"] for e in events if e["type"] == "token"] == ["你", "好"]
+        assert events[0] == {"type": "model", "model": "model_001"}
+
+        ws.send_json({"type": "message", "content": "再说一次"})
+        receive_until(ws, "done")
+
+    # 第二轮的上游请求带上了内存中的第一轮对话
+    second = upstream[1]["messages"]
+    assert second[-3:] == [
+        {"role": "user", "content": "你好"},
+        {"role": "assistant", "content": "你好"},
+        {"role": "user", "content": "再说一次"},
+    ]
+    # 断开时一次性写入两轮对话
+    saved.assert_awaited_once()
+    assert saved.await_args.args[0] == request_id
+    assert len(saved.await_args.args[1]) == 4
+
+def test_websocket_cancel_keeps_partial_reply(upstream, saved):
+    with client.websocket_connect("/api/v1/chat/ws?provider_id=model_001") as ws:
+        ws.receive_json()
+        ws.send_json({"type": "message", "content": "慢一点"})
+        receive_until(ws, "token")
+        ws.send_json({"type": "cancel"})
+        assert ws.receive_json() == {"type": "cancelled"}
+
+    messages = saved.await_args.args[1]
+    assert messages[-1] == {"role": "assistant", "content": "第一"}
+
+def test_websocket_rejects_bad_input(upstream, saved):
+    with client.websocket_connect("/api/v1/chat/ws?provider_id=model_001") as ws:
+        ws.receive_json()
+        ws.send_text("not json")
+        assert ws.receive_json()["code"] == 400
+        ws.send_json({"type": "unknown"})
+        assert ws.receive_json()["code"] == 400
+    saved.assert_not_awaited()
+
+def test_websocket_invalid_model():
+    with client.websocket_connect("/api/v1/chat/ws?provider_id=invalid_model") as ws:
+        assert ws.receive_json() == {"type": "error", "code": 400, "error": "Invalid model ID"}